@@ -1,9 +1,14 @@
 # backend/agent.py
 import time
 import json
+import random
 import math
 import re
-from typing import List, Dict
+import itertools
+from typing import List
+from memory_index import MemoryIndex
+from memory_store import MemoryRecord, MemoryRing
+from vocab import VOCAB, TokenCache, sorted_overlap
 
 # Minimal stopwords list for tokenization
 _STOPWORDS = {
@@ -12,6 +17,35 @@ _STOPWORDS = {
     "you","he","she","they","we","my","your","their","our","but","not"
 }
 
+# Daily schedules by agent type: hour -> goals
+DEFAULT_SCHEDULES = {
+    "student": {9: ["library"], 13: ["canteen"], 16: ["ground"]},
+    "professor": {9: ["lab"], 12: ["canteen"], 15: ["office"]},
+    "vendor": {10: ["canteen"], 14: ["ground"]},
+}
+
+# Random-walk moves: every (dx, dy) in {-1, 0, 1}², equally likely
+RANDOM_STEPS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+class ChangeClock:
+    """
+    Process-wide change counter. Every agent mutation takes the next value,
+    so "what changed since version V" is a single comparison per agent.
+    """
+
+    def __init__(self):
+        self._counter = itertools.count(1)
+        self.current = 0
+
+    def next(self):
+        self.current = next(self._counter)
+        return self.current
+
+
+CHANGE_CLOCK = ChangeClock()
+
+
 def tokenize(text: str) -> List[str]:
     """Lowercase, remove non-alphanum, split, remove stopwords."""
     text = text.lower()
@@ -19,7 +53,112 @@ def tokenize(text: str) -> List[str]:
     return [t for t in tokens if t not in _STOPWORDS]
 
 
+# Shared tokenization of recent memory texts (see vocab.py)
+TOKEN_CACHE = TokenCache(tokenize, VOCAB)
+
+# Consolidated records the world writes (see Agent.consolidate_memories)
+_TRAIL_RE = re.compile(r"^Walked from (-?\d+),(-?\d+) to (-?\d+),(-?\d+) (?:at tick (\d+)|over ticks (\d+)–(\d+))$")
+_MEETING_RE = re.compile(r"^Met (\S+) (?:at tick (\d+)|(\d+) times over ticks (\d+)–(\d+))$")
+
+
+# non-numeric tokens of a trail text ("at tick t" / "over ticks t1–t2")
+_TRAIL_WORDS = (("walked", "tick"), ("walked", "over", "ticks"))
+_TRAIL_WORD_IDS = tuple(tuple(VOCAB.id(w) for w in words) for words in _TRAIL_WORDS)
+
+
+def _tick_span(first, last):
+    return f"at tick {first}" if first == last else f"over ticks {first}–{last}"
+
+
+def _parse_meeting(text):
+    """(partner, count, first tick, last tick) of a "Met ..." record, or None."""
+    m = _MEETING_RE.match(text)
+    if m is None:
+        return None
+    if m[2] is not None:
+        return m[1], 1, int(m[2]), int(m[2])
+    return m[1], int(m[3]), int(m[4]), int(m[5])
+
+
+def memory_importance(text: str, tokens, source: str) -> float:
+    """Importance from length and token count, boosted for interaction/LLM memories."""
+    length_score = min(1.0, len(text) / 200.0)
+    token_score = min(1.0, len(tokens) / 30.0)
+    recency_boost = 1.0
+
+    # Boost LLM/Gemini/interaction-based memories
+    source_boost = 1.0
+    if source in ["interaction", "llm_interaction", "llm_dialogue", "gemini"]:
+        source_boost += 0.15
+
+    importance = (0.5 * length_score + 0.4 * token_score + 0.1 * recency_boost)
+    return round(float(importance * source_boost), 4)
+
+
+class TrailRecord(MemoryRecord):
+    """
+    "Walked from A to B ..." memory. It is replaced on every step of a
+    walk and mostly not read in between, so text, tokens and importance
+    are only built (from the numbers, without tokenize()) when read.
+    """
+
+    __slots__ = ("start", "end", "first", "last", "_built")
+
+    def __init__(self, start, end, first, last, ts: int):
+        self.start = start
+        self.end = end
+        self.first = first
+        self.last = last
+        self.ts = ts
+        self.source = "movement"
+        self._built = None
+
+    def _build(self):
+        start, end, first, last = self.start, self.end, self.first, self.last
+        if first == last:
+            text = f"Walked from {start[0]},{start[1]} to {end[0]},{end[1]} at tick {first}"
+            words, word_ids, ticks = _TRAIL_WORDS[0], _TRAIL_WORD_IDS[0], (first,)
+        else:
+            text = f"Walked from {start[0]},{start[1]} to {end[0]},{end[1]} over ticks {first}–{last}"
+            words, word_ids, ticks = _TRAIL_WORDS[1], _TRAIL_WORD_IDS[1], (first, last)
+        # single digits are not tokens; numbers map to ids without the vocabulary
+        coords = [n for n in (abs(start[0]), abs(start[1]), abs(end[0]), abs(end[1])) if n >= 10]
+        ticks = [t for t in ticks if t >= 10]
+        tokens = (words[0], *map(str, coords), *words[1:], *map(str, ticks))
+        ids = tuple(sorted(set(word_ids).union([-1 - n for n in coords], [-1 - t for t in ticks])))
+        self._built = (text, tokens, ids, memory_importance(text, tokens, "movement"))
+        return self._built
+
+    text = property(lambda self: (self._built or self._build())[0])
+    tokens = property(lambda self: (self._built or self._build())[1])
+    token_ids = property(lambda self: (self._built or self._build())[2])
+    importance = property(lambda self: (self._built or self._build())[3])
+
+
+def _world_record(text: str, ts: int, source: str) -> MemoryRecord:
+    # consolidated texts are mostly unique, so they bypass TOKEN_CACHE
+    tokens = tuple(tokenize(text))
+    return MemoryRecord(text, ts, memory_importance(text, tokens, source), tokens, source, VOCAB.ids(tokens))
+
+
 class Agent:
+    # Recent memories included in API snapshots
+    SNAPSHOT_MEMORIES = 8
+
+    # Memory consolidation, for agents with a clock (their World): steps
+    # extend one "Walked from A to B over ticks t1–t2" record of at most
+    # TRAIL_TICKS ticks instead of logging every position, and every
+    # CONSOLIDATE_EVERY new memories consolidate_memories() merges repeated
+    # meetings into one counted record per partner and drops trails whose
+    # importance, decayed as importance × DECAY_TICKS / (DECAY_TICKS + age
+    # in ticks), is below DECAY_FLOOR. CONSOLIDATE_EVERY = 0 keeps the raw
+    # "Moved to" log.
+    CONSOLIDATE_EVERY = 16
+    TRAIL_TICKS = 12
+    DECAY_TICKS = 48
+    DECAY_FLOOR = 0.1
+    MEETING_BOOST = 0.05  # importance added per repeat of a merged meeting
+
     def __init__(
         self,
         id,
@@ -28,22 +167,64 @@ class Agent:
         y=0,
         goals=None,
         traits=None,
-        personality=None
+        personality=None,
+        schedule_overrides=None
     ):
         self.id = id
         self.type = type
         self.x = int(x)
         self.y = int(y)
-        self.goals = goals or []
+        self._goals = goals or []
+        # Optional CrowdTracker told about leading-goal changes (see the goals setter)
+        self.crowd = None
         self.traits = traits or {}
         self.personality = personality or self.traits.get("personality", "")
-        self.memory: List[Dict] = []
-        self.created_at = int(time.time())
-        self.schedule = self.generate_schedule()
         self.MEMORY_CAP = 500
+        self.memory = MemoryRing(self.MEMORY_CAP)
+        self._memory_index = MemoryIndex()
+        # Optional MemoryJournal holding the full history; self.memory is then its hot window
+        self.journal = None
+        # Optional EventLog told about every memory but movement (positions are logged as moves)
+        self.events = None
+        self.created_at = int(time.time())
+        # Hours where this agent leaves its type's shared schedule (see ScheduleEngine)
+        self.schedule_overrides = schedule_overrides or None
 
         # Track previous movement to reduce spam
         self._last_logged_position = None
+        # Anything with a tick_count (the World, see attach_agents); enables consolidation
+        self.clock = None
+        # memories added since the last consolidate_memories()
+        self._unconsolidated = 0
+
+        # Change version of the last position/goals/memory update (see mark_dirty)
+        self.version = CHANGE_CLOCK.next()
+        # (added, last changed) versions of the newest SNAPSHOT_MEMORIES memories,
+        # so deltas send only new or updated ones
+        self._memory_versions = []
+        # version of the last consolidate_memories() that changed the list
+        self._memory_rewritten = 0
+
+    def mark_dirty(self):
+        """
+        Record that position, goals or memory changed. add_memory, the
+        move methods and the goals setter do this themselves; call it
+        after assigning x or y directly.
+        """
+        self.version = CHANGE_CLOCK.next()
+
+    @property
+    def goals(self):
+        return self._goals
+
+    @goals.setter
+    def goals(self, goals):
+        old = self._goals
+        self._goals = goals
+        if goals != old:
+            self.mark_dirty()
+            if self.crowd is not None:
+                self.crowd.retarget(old[0] if old else None, goals[0] if goals else None)
 
 
     # ------------------------------------------------------------------------
@@ -56,43 +237,101 @@ class Agent:
         if not text:
             return
 
-        tokens = tokenize(text)
-
-        length_score = min(1.0, len(text) / 200.0)
-        token_score = min(1.0, len(tokens) / 30.0)
-        recency_boost = 1.0
-
-        # Boost LLM/Gemini/interaction-based memories
-        source_boost = 1.0
-        if source in ["interaction", "llm_interaction", "llm_dialogue", "gemini"]:
-            source_boost += 0.15
-
-        importance = (0.5 * length_score + 0.4 * token_score + 0.1 * recency_boost)
-        importance *= source_boost
-
-        mem = {
-            "text": text,
-            "ts": ts,
-            "importance": round(float(importance), 4),
-            "tokens": tokens,
-            "source": source
-        }
-
-        self.memory.append(mem)
-
-        if len(self.memory) > self.MEMORY_CAP:
-            self.memory = self.memory[-self.MEMORY_CAP:]
+        text, tokens, token_ids = TOKEN_CACHE.get(text)
+        mem = MemoryRecord(text, ts, memory_importance(text, tokens, source), tokens, source, token_ids)
+        if self.journal is not None:
+            self.journal.append(self.id, mem)
+        if self.events is not None and source != "movement":
+            self.events.memory(self.id, text, source)
+        self._append_memory(mem)
+
+    def _append_memory(self, mem: MemoryRecord):
+        if self.memory.capacity != self.MEMORY_CAP:
+            self._memory_index.evict_oldest(self.memory.resize(self.MEMORY_CAP))
+
+        evicted = self.memory.append(mem)
+        self._memory_index.add(mem)
+
+        if evicted is not None:
+            self._memory_index.evict_oldest(1)
+
+        self.version = CHANGE_CLOCK.next()
+        versions = self._memory_versions
+        versions.append((self.version, self.version))
+        if len(versions) > self.SNAPSHOT_MEMORIES:
+            del versions[0]
+
+        self._unconsolidated += 1
+        if self.clock is not None and self.CONSOLIDATE_EVERY and self._unconsolidated >= self.CONSOLIDATE_EVERY:
+            self.consolidate_memories()
+
+    def _replace_newest_memory(self, mem: MemoryRecord):
+        self.memory.replace_last(mem)
+        self._memory_index.replace_last(mem)
+        self.version = CHANGE_CLOCK.next()
+        if self._memory_versions:
+            self._memory_versions[-1] = (self._memory_versions[-1][0], self.version)
+
+    def consolidate_memories(self):
+        """
+        Merge every partner's "Met X" records into one counted record (at
+        the newest meeting's place) and drop trails that have decayed below
+        DECAY_FLOOR. Other memories are kept as they are. Runs every
+        CONSOLIDATE_EVERY added memories.
+        """
+        self._unconsolidated = 0
+        if self.clock is None:
+            return
+        now = self.clock.tick_count
+
+        kept = []
+        meetings = {}  # partner -> (index in kept, count, first tick)
+        changed = False
+        for rec in self.memory:
+            if rec.source == "interaction":
+                meeting = _parse_meeting(rec.text)
+                if meeting is not None:
+                    partner, count, first, last = meeting
+                    prev = meetings.get(partner)
+                    if prev is not None:
+                        kept[prev[0]] = None
+                        count += prev[1]
+                        first = min(first, prev[2])
+                        text = f"Met {partner} {count} times {_tick_span(first, last)}"
+                        rec = _world_record(text, rec.ts, rec.source)
+                        rec.importance = round(min(1.0, rec.importance + self.MEETING_BOOST * (count - 1)), 4)
+                        changed = True
+                    meetings[partner] = (len(kept), count, first)
+            elif rec.source == "movement":
+                if type(rec) is TrailRecord:
+                    last = rec.last
+                else:
+                    m = _TRAIL_RE.match(rec.text)
+                    last = int(m[5] or m[7]) if m else None
+                if last is not None:
+                    age = max(0, now - last)
+                    if rec.importance * self.DECAY_TICKS / (self.DECAY_TICKS + age) < self.DECAY_FLOOR:
+                        changed = True
+                        continue
+            kept.append(rec)
+
+        if not changed:
+            return
+        self.memory = MemoryRing(self.MEMORY_CAP, [r for r in kept if r is not None])
+        self._memory_index.rebuild(self.memory)
+        self.version = self._memory_rewritten = CHANGE_CLOCK.next()
+        self._memory_versions = [(self.version, self.version)] * min(len(self.memory), self.SNAPSHOT_MEMORIES)
 
 
-    def get_recent_memories(self, n=5) -> List[Dict]:
+    def get_recent_memories(self, n=5) -> List[MemoryRecord]:
         return list(reversed(self.memory[-n:]))
 
 
-    def score_memory_for_query(self, mem: Dict, query_tokens: List[str], now_ts: int) -> float:
+    def score_memory_for_query(self, mem: MemoryRecord, query_tokens: List[str], now_ts: int) -> float:
         """Relevance score = overlap × importance × recency."""
-        mem_tokens = set(mem.get("tokens", []))
-        overlap = len(mem_tokens.intersection(query_tokens))
-        token_score = overlap / (1 + math.log(1 + len(mem_tokens))) if overlap else 0.0
+        mem_ids = mem.token_ids
+        overlap = sorted_overlap(mem_ids, VOCAB.known_ids(query_tokens))
+        token_score = overlap / (1 + math.log(1 + len(mem_ids))) if overlap else 0.0
 
         importance = float(mem.get("importance", 0.0))
 
@@ -104,21 +343,23 @@ class Agent:
         return float(score * recency)
 
 
-    def retrieve_memories(self, query: str, top_n: int = 5) -> List[Dict]:
+    def retrieve_memories(self, query: str, top_n: int = 5) -> List[MemoryRecord]:
         query_tokens = tokenize(query)
         if not query_tokens:
             return self.get_recent_memories(top_n)
 
         now_ts = int(time.time())
-        scored = []
 
-        for mem in self.memory:
-            sc = self.score_memory_for_query(mem, query_tokens, now_ts)
-            if sc > 0:
-                scored.append((sc, mem))
+        if self.journal is not None:
+            # whole history, not just the MEMORY_CAP window
+            top = self.journal.top(self.id, query_tokens, top_n, now_ts)
+        else:
+            # Index is kept in step by add_memory/load_memories; rebuild if
+            # self.memory was replaced from outside.
+            if len(self._memory_index) != len(self.memory):
+                self._memory_index.rebuild(self.memory)
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        top = [m for _, m in scored[:top_n]]
+            top = self._memory_index.top(query_tokens, top_n, now_ts)
 
         if len(top) < top_n:
             for r in self.get_recent_memories(top_n):
@@ -134,7 +375,7 @@ class Agent:
     # ------------------------------------------------------------------------
     def save_memories(self, path: str):
         with open(path, "w", encoding="utf-8") as f:
-            json.dump(self.memory, f, ensure_ascii=False, indent=2)
+            json.dump([m.to_dict() for m in self.memory], f, ensure_ascii=False, indent=2)
 
     def load_memories(self, path: str):
         with open(path, "r", encoding="utf-8") as f:
@@ -143,19 +384,22 @@ class Agent:
         loaded = []
         for item in data:
             if isinstance(item, dict) and "text" in item:
-                item["tokens"] = tokenize(item.get("text", ""))
-                item["ts"] = int(item.get("ts", int(time.time())))
-                item["importance"] = float(item.get("importance", 0.0))
-                loaded.append(item)
+                text, tokens, token_ids = TOKEN_CACHE.get(item.get("text", ""))
+                loaded.append(MemoryRecord(text, int(item.get("ts", int(time.time()))),
+                                           float(item.get("importance", 0.0)), tokens,
+                                           item.get("source", "self"), token_ids))
 
-        self.memory = loaded[-self.MEMORY_CAP:]
+        self.memory = MemoryRing(self.MEMORY_CAP, loaded[-self.MEMORY_CAP:])
+        self._memory_index.rebuild(self.memory)
+        self.mark_dirty()
+        self._memory_versions = [(self.version, self.version)] * min(len(self.memory), self.SNAPSHOT_MEMORIES)
 
 
     # ------------------------------------------------------------------------
     # Dictionary for frontend
     # ------------------------------------------------------------------------
     def to_dict(self):
-        mem_texts = [m["text"] for m in self.get_recent_memories(8)]
+        mem_texts = [m["text"] for m in self.get_recent_memories(self.SNAPSHOT_MEMORIES)]
         return {
             "id": self.id,
             "type": self.type,
@@ -167,6 +411,32 @@ class Agent:
             "memory": mem_texts
         }
 
+    def to_delta_dict(self, since):
+        """
+        What changed after version `since`: position, goals and the memories
+        added or updated since (newest first, like to_dict's "memory"; an
+        updated one replaces the client's newest "memory_replaced" entries),
+        or the whole "memory" list after a consolidation. Type, traits
+        and personality never change, so they are only sent by to_dict.
+        """
+        out = {
+            "id": self.id,
+            "x": self.x,
+            "y": self.y,
+            "goals": self.goals,
+        }
+        if self._memory_rewritten > since:
+            # records were rewritten in place: send the whole recent list
+            out["memory"] = [m["text"] for m in self.get_recent_memories(self.SNAPSHOT_MEMORIES)]
+        else:
+            changed = [added for added, updated in self._memory_versions if updated > since]
+            out["memory_new"] = [m["text"] for m in self.get_recent_memories(len(changed))] if changed else []
+            # an updated trail the client already has replaces its newest entry
+            replaced = sum(1 for added in changed if added <= since)
+            if replaced:
+                out["memory_replaced"] = replaced
+        return out
+
 
     # ------------------------------------------------------------------------
     # Movement (with spam reduction)
@@ -175,21 +445,60 @@ class Agent:
         """Log movement only if position changed significantly."""
         pos = (self.x, self.y)
         if pos != self._last_logged_position:
-            self.add_memory(f"Moved to {self.x},{self.y}", source="movement")
+            if self.clock is not None and self.CONSOLIDATE_EVERY:
+                self._extend_trail(pos)
+            else:
+                self.add_memory(f"Moved to {self.x},{self.y}", source="movement")
             self._last_logged_position = pos
 
-    def random_walk(self, bounds=(0, 0, 24, 24)):
-        import random
-        minx, miny, maxx, maxy = bounds
-        dx = random.choice([-1, 0, 1])
-        dy = random.choice([-1, 0, 1])
+    def _extend_trail(self, pos):
+        """
+        Fold a step into the newest memory while it is a trail spanning
+        under TRAIL_TICKS ticks, else start a new trail. The journal (full
+        history) still gets every position.
+        """
+        tick = self.clock.tick_count
+        if self.journal is not None:
+            text, tokens, token_ids = TOKEN_CACHE.get(f"Moved to {pos[0]},{pos[1]}")
+            self.journal.append(self.id, MemoryRecord(text, int(time.time()),
+                                                      memory_importance(text, tokens, "movement"),
+                                                      tokens, "movement", token_ids))
+
+        trail = self.memory[-1] if len(self.memory) else None
+        if trail is not None and type(trail) is not TrailRecord:
+            # e.g. restored from a checkpoint: a plain record, parse it
+            m = _TRAIL_RE.match(trail.text) if trail.source == "movement" else None
+            trail = TrailRecord((int(m[1]), int(m[2])), None, int(m[5] or m[6]), None, 0) if m else None
+
+        if trail is not None and tick - trail.first < self.TRAIL_TICKS:
+            self._replace_newest_memory(TrailRecord(trail.start, pos, trail.first, tick, int(time.time())))
+        else:
+            self._append_memory(TrailRecord(self._last_logged_position or pos, pos, tick, tick, int(time.time())))
 
-        self.x = max(min(self.x + dx, maxx), minx)
-        self.y = max(min(self.y + dy, maxy), miny)
+    def random_walk(self, bounds=(0, 0, 24, 24), step=None, nav=None):
+        """Take one random step; `step` is a pre-drawn (dx, dy) from the world RNG."""
+        dx, dy = step if step is not None else random.choice(RANDOM_STEPS)
+        self.move_by(dx, dy, bounds, nav)
+
+    def move_by(self, dx, dy, bounds=(0, 0, 24, 24), nav=None):
+        """Step by (dx, dy), clamped to bounds. With a NavGrid, blocked steps are skipped."""
+        minx, miny, maxx, maxy = bounds
+        nx = max(min(self.x + dx, maxx), minx)
+        ny = max(min(self.y + dy, maxy), miny)
+        if nav is not None and not nav.can_step(self.x, self.y, nx, ny):
+            return
+        self.x, self.y = nx, ny
 
         self._log_position_if_changed()
 
-    def move_towards(self, tx, ty, speed=1):
+    def move_towards(self, tx, ty, speed=1, nav=None):
+        """Step towards (tx, ty); with a NavGrid, along its shortest path around obstacles."""
+        if nav is not None:
+            for _ in range(speed):
+                self.x, self.y = nav.next_step(self.x, self.y, tx, ty)
+            self._log_position_if_changed()
+            return
+
         if self.x < tx:
             self.x += min(speed, tx - self.x)
         elif self.x > tx:
@@ -201,17 +510,3 @@ class Agent:
             self.y -= min(speed, self.y - ty)
 
         self._log_position_if_changed()
-
-
-    # ------------------------------------------------------------------------
-    # Schedules
-    # ------------------------------------------------------------------------
-    def generate_schedule(self):
-        if self.type == "student":
-            return {9: ["library"], 13: ["canteen"], 16: ["ground"]}
-        elif self.type == "professor":
-            return {9: ["lab"], 12: ["canteen"], 15: ["office"]}
-        elif self.type == "vendor":
-            return {10: ["canteen"], 14: ["ground"]}
-        else:
-            return {}
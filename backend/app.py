@@ -1,12 +1,24 @@
 # app.py
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, g, jsonify, request, send_file
 from flask_cors import CORS
-from world import World
+from world import World, PHASES
+from event_log import EventReplay
+import llm
+from llm import call_groq, call_groq_many, build_agent_prompt, agent_cache_key
+from sim_loop import SimulationLoop
+from metrics import REGISTRY
+from profiler import TickProfiler
+from world_registry import WorldRegistry, UnknownWorld, WORLD_ID
+from sim_jobs import JobQueue, UnknownJob, FINISHED as FINISHED_JOB_STATES
+from functools import partial
 import os
-import time
+import re
+import csv
 import json
-import requests
-import traceback
+import itertools
+import time
+import uuid
+import queue
 
 app = Flask(__name__)
 app.debug = True
@@ -17,179 +29,707 @@ WORLD_FILE = os.path.join(os.path.dirname(__file__), "data", "world_seed.json")
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 os.makedirs(DATA_DIR, exist_ok=True)
 
-world = World(WORLD_FILE)
+# Keep this many ticks of stats in memory; older ticks spill to CSV segments
+STATS_RETENTION = 5000
+STATS_SPILL_DIR = os.path.join(DATA_DIR, "stats_spill")
+
+CHECKPOINT_DIR = os.path.join(DATA_DIR, "checkpoints")
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+CHECKPOINT_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Per-world files (seed, stats spill, journal, eviction checkpoint) live under worlds/<id>/
+WORLDS_DIR = os.path.join(DATA_DIR, "worlds")
+
+# Set MEMORY_DB to a SQLite path to keep every memory (not just the last MEMORY_CAP) on disk;
+# the default world uses that path, other worlds a memories.db in their own directory
+MEMORY_DB = os.environ.get("MEMORY_DB") or None
+
+# Every world logs each tick's changes for /api/replay (data/events for the
+# default world, worlds/<id>/events for others); EVENT_LOG=0 turns it off.
+# Only about the last EVENT_LOG_RETENTION ticks stay on disk (0 keeps all).
+EVENT_LOG = os.environ.get("EVENT_LOG", "1") != "0"
+EVENT_LOG_DIR = os.path.join(DATA_DIR, "events")
+EVENT_LOG_RETENTION = int(os.environ.get("EVENT_LOG_RETENTION", 20000)) or None
+EVENTS_PAGE_TICKS = 500  # most ticks one /api/events response covers
+
+# Unscoped /api/... routes act on this world, so single-world clients keep working
+DEFAULT_WORLD = "default"
+
+# Registry limits: worlds in total, worlds kept in memory, and the estimated
+# memory budget of loaded worlds; idle worlds over a limit go to checkpoints
+WORLD_LIMIT = int(os.environ.get("WORLD_LIMIT", 32))
+WORLDS_LOADED = int(os.environ["WORLDS_LOADED"]) if os.environ.get("WORLDS_LOADED") else None
+WORLD_MEMORY_MB = float(os.environ.get("WORLD_MEMORY_MB", 2048))
+
+# Batch runs (run_sim, /api/jobs) go to JOB_WORKERS background processes;
+# each job keeps its result CSV under jobs/<id>/
+JOBS_DIR = os.path.join(DATA_DIR, "jobs")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_RESULT_CHUNK = 1000  # records per /api/jobs/<id>/result page
+# run_sim / run_sim_json answer inline only for jobs finished within this
+# many seconds; longer runs get 202 + the job to follow under /api/jobs
+RUN_SIM_WAIT = float(os.environ.get("RUN_SIM_WAIT", 5))
+PROGRESS_INTERVAL = 1.0  # seconds between job progress events
+
+# ---------------- METRICS ----------------
+TICK_PHASE_SECONDS = REGISTRY.histogram("worldsim_tick_phase_seconds", "World.step time per phase", ["phase"])
+TICKS = REGISTRY.counter("worldsim_ticks_total", "World steps taken")
+HTTP_SECONDS = REGISTRY.histogram(
+    "worldsim_http_request_seconds", "Route handler time (streams: until the response starts)",
+    ["route", "method", "status"])
+SNAPSHOT_SECONDS = REGISTRY.histogram(
+    "worldsim_snapshot_seconds", "Tick payload: building the snapshot dicts, then json encoding",
+    ["stage", "kind"])
+WORLD_GAUGE = REGISTRY.gauge("worldsim_world", "Live size and state of each loaded world", ["world", "what"])
+WORLDS_GAUGE = REGISTRY.gauge("worldsim_worlds", "Registered worlds, loaded or evicted to a checkpoint", ["state"])
+JOBS_GAUGE = REGISTRY.gauge("worldsim_jobs", "Background simulation jobs by state", ["state"])
+
+# opt-in sampling profile of the next N ticks (POST /api/profile)
+profiler = TickProfiler(PROFILE_DIR)
+
+
+def _on_step(w):
+    TICKS.inc()
+    for phase in PHASES:
+        TICK_PHASE_SECONDS.observe(w.phase_times[phase], phase)
+    profiler.tick()
+
+
+def _collect_world_gauges():
+    WORLD_GAUGE.clear()
+    loaded = 0
+    for info in worlds.list():
+        if not info["loaded"]:
+            continue
+        loaded += 1
+        for what in ("tick", "agents", "running", "viewers", "estimated_mb"):
+            WORLD_GAUGE.set(int(info[what]) if what == "running" else info[what], info["id"], what)
+    WORLDS_GAUGE.set(loaded, "loaded")
+    WORLDS_GAUGE.set(len(worlds) - loaded, "evicted")
+    JOBS_GAUGE.clear()
+    for state, n in jobs.counts().items():
+        JOBS_GAUGE.set(n, state)
+
+
+REGISTRY.add_collector(_collect_world_gauges)
+
+
+@app.before_request
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response):
+    start = getattr(g, "request_start", None)
+    if start is not None:
+        rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_SECONDS.observe(time.perf_counter() - start, rule, request.method, str(response.status_code))
+    return response
+
+
+def _tick_payload(session, since=None):
+    """
+    One serialized update per tick, shared by every stream viewer:
+    the agents and stats changed since `since` (everything if None).
+    """
+    start = time.perf_counter()
+    snap = session.world.snapshot(since)
+    snap["running"] = session.loop.running
+    built = time.perf_counter()
+    payload = json.dumps(snap)
+    kind = "full" if snap["full"] else "delta"
+    SNAPSHOT_SECONDS.observe(built - start, "build", kind)
+    SNAPSHOT_SECONDS.observe(time.perf_counter() - built, "encode", kind)
+    return snap["version"], payload
 
-# ---------------- GROQ CONFIG ----------------
-# PUT YOUR NEW KEY HERE (do NOT paste leaked old ones)
-GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
 
-GROQ_MODEL = "openai/gpt-oss-20b"
-GROQ_TIMEOUT = 20
+# ---------------- WORLD REGISTRY ----------------
+# Server-owned tick loop per world; viewers follow it over .../stream
+SIM_INTERVAL = 1.8  # seconds per tick
 
 
-# ---------------- JSON EXTRACTION ----------------
-def _extract_json_from_text(text: str):
-    if not text:
-        return None
+def _build_world(session, seed_file):
+    """A World for `session`; the default world keeps the original data/ file locations."""
+    if session.id == DEFAULT_WORLD:
+        spill_dir, memory_db, events_dir = STATS_SPILL_DIR, MEMORY_DB, EVENT_LOG_DIR
+    else:
+        spill_dir = os.path.join(session.root, "stats_spill")
+        memory_db = os.path.join(session.root, "memories.db") if MEMORY_DB else None
+        events_dir = os.path.join(session.root, "events")
+    return World(seed_file, stats_retention=STATS_RETENTION, stats_spill_dir=spill_dir,
+                 rng_seed=session.rng_seed, memory_db=memory_db,
+                 event_log_dir=events_dir if EVENT_LOG else None, event_log_retention=EVENT_LOG_RETENTION)
 
-    txt = text.strip()
 
-    # code fences
-    if txt.startswith("```"):
-        parts = txt.split("```")
-        for p in parts:
-            p = p.strip()
-            if p.startswith("{") and p.endswith("}"):
-                try:
-                    return json.loads(p)
-                except:
-                    pass
-
-    # raw { ... }
-    s = txt.find("{")
-    e = txt.rfind("}")
-    if s != -1 and e != -1 and e > s:
-        try:
-            return json.loads(txt[s:e+1])
-        except:
-            pass
+def _attach_loop(session):
+    session.world.on_step = _on_step
+    if session.loop is None:
+        session.loop = SimulationLoop(session.world, session.lock, partial(_tick_payload, session),
+                                      interval=SIM_INTERVAL)
+    else:
+        session.loop.world = session.world  # restored after an eviction
+
+
+def _stats_csv_path(session):
+    if session.id == DEFAULT_WORLD:
+        return os.path.join(os.path.dirname(WORLD_FILE), "stats.csv")
+    return os.path.join(session.root, "stats.csv")
+
+
+worlds = WorldRegistry(WORLDS_DIR, _build_world, on_load=_attach_loop, max_worlds=WORLD_LIMIT,
+                       max_loaded=WORLDS_LOADED, memory_budget=WORLD_MEMORY_MB * 2**20)
+worlds.create(DEFAULT_WORLD, WORLD_FILE)
 
-    # whole text fallback
-    try:
-        return json.loads(txt)
-    except:
-        return None
 
+@app.errorhandler(UnknownWorld)
+def _unknown_world(e):
+    return jsonify({"error": f"World {e.args[0]!r} not found"}), 404
 
-# ---------------- GROQ CALL ----------------
-def call_groq(prompt: str):
+
+jobs = JobQueue(JOBS_DIR, workers=JOB_WORKERS)
+
+
+@app.errorhandler(UnknownJob)
+def _unknown_job(e):
+    return jsonify({"error": f"Job {e.args[0]!r} not found"}), 404
+
+
+def world_route(rule, **options):
     """
-    Returns (parsed_json or None, debug_info).
-    Groq is OpenAI-compatible.
+    Register a view at /api<rule> (the default world) and at
+    /api/worlds/<world_id><rule>; the view takes a `world_id` argument.
     """
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0,
-        "max_tokens": 200
-    }
+    def decorator(view):
+        app.add_url_rule(f"/api{rule}", view.__name__, view, **options)
+        app.add_url_rule(f"/api/worlds/<world_id>{rule}", f"{view.__name__}_scoped", view, **options)
+        return view
+    return decorator
+
+
+@app.route("/api/worlds")
+def list_worlds():
+    return jsonify({
+        "worlds": worlds.list(),
+        "limit": worlds.max_worlds,
+        "max_loaded": worlds.max_loaded,
+        "memory_budget_mb": WORLD_MEMORY_MB,
+    })
 
+
+# {"id": "optional", "seed": {...inline world seed...}, "rng_seed": 42}; no seed = data/world_seed.json
+@app.route("/api/worlds", methods=["POST"])
+def create_world():
+    body = request.json or {}
+    world_id = body.get("id") or uuid.uuid4().hex[:12]
+    seed = body.get("seed")
+    if not isinstance(world_id, str) or not WORLD_ID.match(world_id):
+        return jsonify({"error": "id must be 1-64 letters, digits, _ or -"}), 400
+    if seed is not None and not isinstance(seed, dict):
+        return jsonify({"error": "seed must be a world seed object"}), 400
+    if world_id in worlds:
+        return jsonify({"error": f"World {world_id!r} already exists"}), 409
+
+    seed_file = WORLD_FILE
+    root = os.path.join(WORLDS_DIR, world_id)
     try:
-        r = requests.post(GROQ_URL, headers=headers, json=payload, timeout=GROQ_TIMEOUT)
-        r.raise_for_status()
-        raw = r.json()
+        if seed is not None:
+            os.makedirs(root, exist_ok=True)
+            seed_file = os.path.join(root, "seed.json")
+            with open(seed_file, "w", encoding="utf-8") as f:
+                json.dump(seed, f)
+        session = worlds.create(world_id, seed_file, rng_seed=body.get("rng_seed"), root=root)
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(session.info()), 201
+
+
+@app.route("/api/worlds/<world_id>")
+def world_info(world_id):
+    return jsonify(worlds.get(world_id).info())
+
 
-        text = raw["choices"][0]["message"]["content"]
+@app.route("/api/worlds/<world_id>", methods=["DELETE"])
+def delete_world(world_id):
+    if world_id == DEFAULT_WORLD:
+        return jsonify({"error": "the default world cannot be deleted"}), 400
+    worlds.delete(world_id)
+    return jsonify({"status": "ok", "id": world_id})
 
-        parsed = _extract_json_from_text(text)
-        return parsed, {"raw": raw, "text": text}
 
-    except Exception as e:
-        return None, {"error": str(e), "trace": traceback.format_exc()}
+# Checkpoint an idle world to disk now instead of waiting for the budget
+@app.route("/api/worlds/<world_id>/evict", methods=["POST"])
+def evict_world(world_id):
+    session = worlds.get(world_id)
+    if not worlds.evict(session):
+        return jsonify({"error": "world is running, watched, in use or already evicted", **session.info()}), 409
+    return jsonify(session.info())
 
 
 # ---------------- BASIC ROUTES ----------------
-@app.route("/api/agents")
-def get_agents():
-    return jsonify([a.to_dict() for a in world.agents])
+@world_route("/agents")
+def get_agents(world_id=DEFAULT_WORLD):
+    with worlds.use(world_id) as s:
+        return jsonify([a.to_dict() for a in s.world.agents])
 
 
-@app.route("/api/world")
-def get_world():
-    return jsonify({
-        "agents": [a.to_dict() for a in world.agents],
-        "pois": world.pois
-    })
+# ?since=V (a "version" from an earlier response) → only what changed after it
+@world_route("/world")
+def get_world(world_id=DEFAULT_WORLD):
+    with worlds.use(world_id) as s:
+        return jsonify(s.world.snapshot(_int_arg("since")))
 
 
 # ---------------- TICK (NO LLM) ----------------
-@app.route("/api/tick", methods=["POST"])
-def tick():
-    steps = int((request.json or {}).get("steps", 1))
-    for _ in range(steps):
-        world.step()
-    return jsonify({"status": "ok", "agents": [a.to_dict() for a in world.agents]})
+@world_route("/tick", methods=["POST"])
+def tick(world_id=DEFAULT_WORLD):
+    body = request.json or {}
+    steps = int(body.get("steps", 1))
+    since = body.get("since")
+    with worlds.pinned(world_id) as s:
+        s.loop.step_and_publish(steps)
+        with s.lock:
+            return jsonify({"status": "ok", **s.world.snapshot(int(since) if since is not None else None)})
+
+
+# ---------------- LIVE LOOP + PUSH ----------------
+@world_route("/sim/status")
+def sim_status(world_id=DEFAULT_WORLD):
+    with worlds.pinned(world_id) as s:
+        return jsonify(s.loop.status())
+
+
+@world_route("/sim/start", methods=["POST"])
+def sim_start(world_id=DEFAULT_WORLD):
+    with worlds.pinned(world_id) as s:
+        s.loop.start()
+        return jsonify(s.loop.status())
+
+
+@world_route("/sim/stop", methods=["POST"])
+def sim_stop(world_id=DEFAULT_WORLD):
+    with worlds.pinned(world_id) as s:
+        s.loop.stop()
+        return jsonify(s.loop.status())
+
+
+# {"interval": seconds} or {"ticks_per_second": n}
+@world_route("/sim/rate", methods=["POST"])
+def sim_rate(world_id=DEFAULT_WORLD):
+    body = request.json or {}
+    with worlds.pinned(world_id) as s:
+        try:
+            if "ticks_per_second" in body:
+                s.loop.set_interval(1.0 / float(body["ticks_per_second"]))
+            else:
+                s.loop.set_interval(float(body.get("interval", SIM_INTERVAL)))
+        except (TypeError, ValueError, ZeroDivisionError):
+            return jsonify({"error": "invalid rate"}), 400
+        return jsonify(s.loop.status())
+
+
+# Server-Sent Events: one "tick" event per world step. The first event
+# is a full snapshot, the rest are deltas against the previous one.
+# A watched world is never evicted.
+@world_route("/stream")
+def stream(world_id=DEFAULT_WORLD):
+    with worlds.pinned(world_id) as s:
+        sim_loop = s.loop
+        q = sim_loop.subscribe()
+        with s.lock:
+            seen, initial = _tick_payload(s)
+
+    def events():
+        nonlocal seen
+        try:
+            yield f"event: tick\ndata: {initial}\n\n"
+            while True:
+                try:
+                    since, version, payload = q.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if version <= seen:
+                    continue  # already covered by the snapshot we sent
+                if since is not None and since > seen:
+                    # an update was dropped for this viewer: resend everything
+                    with s.lock:
+                        version, payload = _tick_payload(s)
+                seen = version
+                yield f"event: tick\ndata: {payload}\n\n"
+        finally:
+            sim_loop.unsubscribe(q)
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 # ---------------- STATS ----------------
-@app.route("/api/stats")
-def get_stats():
-    last = request.args.get("last")
+def _int_arg(name):
+    value = request.args.get(name)
     try:
-        last = int(last) if last else None
+        return int(value) if value else None
     except:
-        last = None
-    return jsonify({"stats": world.get_stats(last)})
+        return None
+
+
+# ?last=N, and/or ?since_tick=T (exclusive) & ?until_tick=T (inclusive)
+@world_route("/stats")
+def get_stats(world_id=DEFAULT_WORLD):
+    with worlds.use(world_id) as s:
+        return jsonify({"stats": s.world.get_stats(
+            _int_arg("last"),
+            since_tick=_int_arg("since_tick"),
+            until_tick=_int_arg("until_tick")
+        )})
 
 
-@app.route("/api/export_stats")
-def export_stats():
-    f = world.export_stats_csv()
+@world_route("/export_stats")
+def export_stats(world_id=DEFAULT_WORLD):
+    with worlds.use(world_id) as s:
+        f = s.world.export_stats_csv(_stats_csv_path(s))
     return send_file(f, as_attachment=True)
 
 
-# ---------------- RUN SIM ----------------
-@app.route("/api/run_sim", methods=["POST"])
-def run_sim():
-    body = request.json or {}
-    ticks = int(body.get("ticks", 240))
+# ---------------- REPLAY ----------------
+def _replay(s):
+    return EventReplay(s.world.events.root) if s.world.events is not None else None
+
+
+# No ?tick → the logged tick range; ?tick=T → every agent's position and goals after tick T
+@world_route("/replay")
+def replay(world_id=DEFAULT_WORLD):
+    tick = _int_arg("tick")
+    with worlds.use(world_id) as s:
+        log = _replay(s)
+        if log is None:
+            return jsonify({"error": "event log is off (EVENT_LOG=0)"}), 404
+        span = log.range()
+        out = {"first_tick": span[0] if span else None, "last_tick": span[1] if span else None}
+        if tick is None:
+            return jsonify(out)
+        try:
+            state = log.state_at(tick)
+        except ValueError as e:
+            return jsonify({"error": str(e), **out}), 404
+    return jsonify({**out, **state.to_dict()})
+
+
+# Per-tick moves, goal changes, interactions and memories:
+# ?since_tick=T (exclusive) & ?until_tick=T (inclusive), at most EVENTS_PAGE_TICKS ticks
+@world_route("/events")
+def replay_events(world_id=DEFAULT_WORLD):
+    since = _int_arg("since_tick")
+    until = _int_arg("until_tick")
+    with worlds.use(world_id) as s:
+        log = _replay(s)
+        if log is None:
+            return jsonify({"error": "event log is off (EVENT_LOG=0)"}), 404
+        ticks = list(itertools.islice(log.events(since, until), EVENTS_PAGE_TICKS))
+    return jsonify({"events": ticks, "more": len(ticks) == EVENTS_PAGE_TICKS})
+
+
+# ---------------- RUN SIM (BACKGROUND JOBS) ----------------
+def _submit_run(world_id, body):
+    """
+    Queue a batch run of the addressed world: from its seed (reset_seed,
+    the default) or from a checkpoint of its current state. The live
+    world is never reset or advanced. Returns (job, None) or (None, error).
+
+    The checkpoint is written under the world's lock so the job starts
+    from one consistent tick; the world's own ticks and requests wait for
+    that write.
+    """
+    try:
+        ticks = int(body.get("ticks", 240))
+    except (TypeError, ValueError):
+        return None, "ticks must be an integer"
     reset = bool(body.get("reset_seed", True))
+    engine = body.get("engine", "object")
+    # Same rng_seed + reset → identical stats CSV
+    rng_seed = body.get("rng_seed")
+    if ticks < 0:
+        return None, "ticks must be >= 0"
+    if engine not in ("object", "bulk", "sharded"):
+        return None, "engine must be \"object\", \"bulk\" or \"sharded\""
+    if engine != "object" and not reset:
+        return None, f"{engine} runs start from the seed (reset_seed must be true)"
+    # sharded: worker processes (default: one per core)
+    shards = body.get("shards")
+    if shards is not None:
+        try:
+            shards = int(shards)
+        except (TypeError, ValueError):
+            return None, "shards must be an integer"
+        if shards < 1:
+            return None, "shards must be >= 1"
+
+    job_id, root = jobs.new_job()
+    spec = {"engine": engine, "ticks": ticks, "rng_seed": rng_seed, "stats_retention": STATS_RETENTION}
+    if engine == "sharded":
+        spec["shards"] = shards
+    with worlds.use(world_id) as s:
+        if reset:
+            spec["seed_file"] = s.seed_file
+        else:
+            spec["checkpoint"] = os.path.join(root, "start.ckpt")
+            s.world.save_checkpoint(spec["checkpoint"])
+    params = {"world": world_id, "engine": engine, "reset_seed": reset, "rng_seed": rng_seed}
+    if engine == "sharded":
+        params["shards"] = shards
+    return jobs.submit(job_id, root, spec, params), None
+
+
+def _job_rows(job, since_tick=None, until_tick=None):
+    """
+    (header, row iterator) of a finished job's stats CSV. The iterator
+    opens the file itself, so one that is never run, or dropped when a
+    client disconnects, leaves no handle behind.
+    """
+    with open(job.result_csv, newline="", encoding="utf-8") as f:
+        header = next(csv.reader(f))
+
+    def rows():
+        with open(job.result_csv, newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            next(reader)
+            for row in reader:
+                tick = int(row[0])
+                if since_tick is not None and tick <= since_tick:
+                    continue
+                if until_tick is not None and tick > until_tick:
+                    break
+                yield [int(v) for v in row]
+
+    return header, rows()
+
+
+def _job_records(job, since_tick=None, until_tick=None):
+    header, rows = _job_rows(job, since_tick, until_tick)
+    pois = header[2:]
+    for row in rows:
+        yield {"tick": row[0], "hour": row[1], "occupancy": dict(zip(pois, row[2:]))}
+
+
+def _result_error(job):
+    if job.state not in FINISHED_JOB_STATES:
+        return jsonify({"error": "job has not finished", **job.info()}), 409
+    if not os.path.exists(job.result_csv):
+        return jsonify({"error": "job produced no results", **job.info()}), 410
+    return None
+
+
+def _submit_and_wait(world_id):
+    """
+    _submit_run, then wait up to RUN_SIM_WAIT seconds ({"async": true}:
+    not at all). Returns (job, None) once the job has finished, else
+    (None, response): the 400 error or 202 with the job.
+    """
+    body = request.json or {}
+    job, error = _submit_run(world_id, body)
+    if error:
+        return None, (jsonify({"error": error}), 400)
+    if not body.get("async"):
+        jobs.wait(job.id, RUN_SIM_WAIT)
+    if job.state not in FINISHED_JOB_STATES:
+        return None, (jsonify(job.info()), 202)
+    return job, None
+
+
+def _json_records(job):
+    """{"job": ..., "stats": [...]} encoded a chunk of records at a time."""
+    yield '{"job": ' + json.dumps(job.info()) + ', "stats": ['
+    records = _job_records(job)
+    sep = ""
+    while True:
+        chunk = list(itertools.islice(records, JOB_RESULT_CHUNK))
+        if not chunk:
+            break
+        yield sep + ", ".join(json.dumps(r) for r in chunk)
+        sep = ", "
+    yield "]}"
+
+
+# The stats CSV of a run that finishes within RUN_SIM_WAIT seconds;
+# otherwise 202 with the job (follow it under /api/jobs/<id>)
+@world_route("/run_sim", methods=["POST"])
+def run_sim(world_id=DEFAULT_WORLD):
+    job, response = _submit_and_wait(world_id)
+    if response:
+        return response
+    failed = _result_error(job)
+    if failed:
+        return failed
+    return send_file(job.result_csv, as_attachment=True, download_name="stats.csv")
+
+
+# Same as run_sim, with the stats as JSON records, streamed in chunks
+@world_route("/run_sim_json", methods=["POST"])
+def run_sim_json(world_id=DEFAULT_WORLD):
+    job, response = _submit_and_wait(world_id)
+    if response:
+        return response
+    failed = _result_error(job)
+    if failed:
+        return failed
+    return Response(_json_records(job), mimetype="application/json")
+
+
+# {"ticks": 100000, "engine": "object"|"bulk"|"sharded", "shards": 16, "rng_seed": 1, "reset_seed": true} → 202 + job
+# reset_seed false checkpoints the live world first, holding its lock (and so
+# pausing its ticks and requests) for the write: about 0.7 s for 10k agents
+# after one simulated day
+@world_route("/jobs", methods=["POST"])
+def submit_job(world_id=DEFAULT_WORLD):
+    job, error = _submit_run(world_id, request.json or {})
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(job.info()), 202
+
+
+@app.route("/api/jobs")
+def list_jobs():
+    return jsonify({"jobs": jobs.list()})
+
+
+@app.route("/api/jobs/<job_id>")
+def job_status(job_id):
+    return jsonify(jobs.get(job_id).info())
+
+
+# Server-Sent Events: a "progress" event every PROGRESS_INTERVAL until the job finishes
+@app.route("/api/jobs/<job_id>/progress")
+def job_progress(job_id):
+    job = jobs.get(job_id)
+
+    def events():
+        while True:
+            finished = job.done_event.wait(PROGRESS_INTERVAL)
+            yield f"event: progress\ndata: {json.dumps(job.info())}\n\n"
+            if finished:
+                return
+
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def job_cancel(job_id):
+    return jsonify(jobs.cancel(job_id).info())
+
+
+@app.route("/api/jobs/<job_id>", methods=["DELETE"])
+def job_delete(job_id):
+    jobs.delete(job_id)
+    return jsonify({"status": "ok", "id": job_id})
+
+
+# Streamed from the job's CSV file
+@app.route("/api/jobs/<job_id>/result.csv")
+def job_result_csv(job_id):
+    job = jobs.get(job_id)
+    failed = _result_error(job)
+    if failed:
+        return failed
+    return send_file(job.result_csv, as_attachment=True, download_name=f"stats-{job.id}.csv")
+
+
+# One chunk of records: ?since_tick=T (exclusive), ?until_tick=T, ?limit=N (default JOB_RESULT_CHUNK).
+# Pass the returned next_since_tick back as since_tick until it is null.
+@app.route("/api/jobs/<job_id>/result")
+def job_result(job_id):
+    job = jobs.get(job_id)
+    failed = _result_error(job)
+    if failed:
+        return failed
+    limit = max(1, _int_arg("limit") or JOB_RESULT_CHUNK)
+    records = list(itertools.islice(_job_records(job, _int_arg("since_tick"), _int_arg("until_tick")), limit + 1))
+    more = len(records) > limit
+    records = records[:limit]
+    return jsonify({
+        "job": job.id,
+        "stats": records,
+        "next_since_tick": records[-1]["tick"] if more else None,
+    })
 
-    if reset:
-        world.load_seed(WORLD_FILE)
 
-    for _ in range(ticks):
-        world.step()
+# ---------------- CHECKPOINTS ----------------
+def _checkpoint_path(name):
+    """Checkpoints are addressed by name only, never by path."""
+    if not isinstance(name, str) or not CHECKPOINT_NAME.match(name):
+        return None
+    return os.path.join(CHECKPOINT_DIR, f"{name}.ckpt")
+
 
-    return send_file(world.export_stats_csv(), as_attachment=True)
+# Checkpoints are shared by all worlds: save in one, load into another to fork it
+@app.route("/api/checkpoints")
+def list_checkpoints():
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    out = []
+    for fname in sorted(os.listdir(CHECKPOINT_DIR)):
+        if fname.endswith(".ckpt"):
+            st = os.stat(os.path.join(CHECKPOINT_DIR, fname))
+            out.append({"name": fname[:-5], "bytes": st.st_size, "modified": int(st.st_mtime)})
+    return jsonify({"checkpoints": out})
+
+
+# {"name": "latest", "compress": false}
+@world_route("/checkpoint/save", methods=["POST"])
+def checkpoint_save(world_id=DEFAULT_WORLD):
+    body = request.json or {}
+    name = body.get("name", "latest")
+    path = _checkpoint_path(name)
+    if not path:
+        return jsonify({"error": "name must be 1-64 letters, digits, _ or -"}), 400
+
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    with worlds.use(world_id) as s:
+        s.world.save_checkpoint(path, compress=bool(body.get("compress", False)))
+        tick = s.world.tick_count
+    return jsonify({"status": "ok", "name": name, "tick": tick, "bytes": os.path.getsize(path)})
+
+
+# {"name": "latest"}
+@world_route("/checkpoint/load", methods=["POST"])
+def checkpoint_load(world_id=DEFAULT_WORLD):
+    name = (request.json or {}).get("name", "latest")
+    path = _checkpoint_path(name)
+    if not path:
+        return jsonify({"error": "name must be 1-64 letters, digits, _ or -"}), 400
+    if not os.path.exists(path):
+        return jsonify({"error": "Checkpoint not found"}), 404
+
+    with worlds.use(world_id) as s:
+        try:
+            s.world.load_checkpoint(path)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify({"status": "ok", "name": name, "tick": s.world.tick_count, "agents": len(s.world.agents)})
 
 
 # ---------------- SINGLE-AGENT THINK (LLM) ----------------
-@app.route("/api/agent_llm", methods=["POST"])
-def agent_llm():
+@world_route("/agent_llm", methods=["POST"])
+def agent_llm(world_id=DEFAULT_WORLD):
     body = request.json or {}
     agent_id = body.get("agent_id")
 
     if not agent_id:
         return jsonify({"error": "agent_id required"}), 400
 
-    agent = next((a for a in world.agents if a.id == agent_id), None)
-    if not agent:
-        return jsonify({"error": "Agent not found"}), 404
-
-    prompt = f"""
-You are an AI agent inside a 2D grid simulation.
-Return ONLY strict JSON, exactly like:
-
-{{
-  "thought": "short reasoning",
-  "action": "move",
-  "dx": 1,
-  "dy": 0,
-  "memory": "short memory"
-}}
-
-Rules:
-- action must be "move" or "idle".
-- dx, dy must be integers in [-1, 0, 1].
-
-State:
-id: {agent.id}
-type: {agent.type}
-position: ({agent.x}, {agent.y})
-goals: {agent.goals}
-recent_memory: {agent.memory[-5:]}
-pois: {world.pois}
-"""
-
-    parsed, debug = call_groq(prompt)
+    with worlds.pinned(world_id) as s:
+        return _agent_llm(s, agent_id)
+
+
+def _agent_llm(s, agent_id):
+    with s.lock:
+        agent = next((a for a in s.world.agents if a.id == agent_id), None)
+        if not agent:
+            return jsonify({"error": "Agent not found"}), 404
+
+        prompt = build_agent_prompt(agent, s.world.pois)
+        cache_key = agent_cache_key(agent, s.world.pois)
+
+    parsed, debug = call_groq(prompt, cache_key=cache_key)
 
     if not parsed:
         fallback = {
@@ -203,11 +743,131 @@ pois: {world.pois}
 
     # save memory
     if parsed.get("memory"):
-        agent.add_memory(parsed["memory"], source="llm")
+        with s.lock:
+            agent.add_memory(parsed["memory"], source="llm")
 
     return jsonify({"agent_id": agent_id, "llm_result": parsed, "debug": debug})
 
 
+# ---------------- BATCH THINK (LLM) ----------------
+def _llm_step(value):
+    try:
+        return max(-1, min(1, int(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _apply_llm_result(world, agent, parsed):
+    """Apply one parsed LLM decision: an optional one-tile move, then its memory."""
+    if parsed.get("action") == "move":
+        agent.move_by(_llm_step(parsed.get("dx")), _llm_step(parsed.get("dy")), world.bounds, world.nav)
+    if parsed.get("memory"):
+        agent.add_memory(str(parsed["memory"]), source="llm")
+
+
+@world_route("/agents_llm_batch", methods=["POST"])
+def agents_llm_batch(world_id=DEFAULT_WORLD):
+    """
+    Think for many agents at once: {"agent_ids": [...] | "all", "tick": bool}.
+    LLM calls run concurrently (bounded by LLM_CONCURRENCY) outside the
+    world lock; all moves and memories are then applied in one locked
+    pass, optionally followed by world.step(no_movement=True).
+    """
+    body = request.json or {}
+    agent_ids = body.get("agent_ids", "all")
+
+    with worlds.pinned(world_id) as s:
+        return _agents_llm_batch(s, body, agent_ids)
+
+
+def _agents_llm_batch(s, body, agent_ids):
+    world = s.world
+    with s.lock:
+        if agent_ids == "all":
+            agents = list(world.agents)
+            missing = []
+        elif isinstance(agent_ids, list):
+            by_id = {a.id: a for a in world.agents}
+            agents = [by_id[i] for i in agent_ids if i in by_id]
+            missing = [i for i in agent_ids if i not in by_id]
+        else:
+            return jsonify({"error": "agent_ids must be a list or \"all\""}), 400
+
+        prompts = [build_agent_prompt(a, world.pois) for a in agents]
+        cache_keys = [agent_cache_key(a, world.pois) for a in agents]
+
+    outcomes = call_groq_many(prompts, cache_keys)
+
+    results = []
+    with s.lock:
+        for agent, (parsed, debug) in zip(agents, outcomes):
+            if not parsed:
+                results.append({
+                    "agent_id": agent.id,
+                    "llm_result": {"thought": "LLM failed", "action": "idle", "dx": 0, "dy": 0},
+                    "error": debug.get("error", "unparseable response")
+                })
+                continue
+
+            _apply_llm_result(world, agent, parsed)
+            results.append({"agent_id": agent.id, "llm_result": parsed})
+
+        if body.get("tick"):
+            world.step(no_movement=True)
+
+        return jsonify({
+            "results": results,
+            "missing": missing,
+            "tick": world.tick_count,
+            "agents": [a.to_dict() for a in agents]
+        })
+
+
+# ---------------- LLM CACHE ----------------
+@app.route("/api/llm_cache")
+def llm_cache_stats():
+    if llm.response_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **llm.response_cache.stats()})
+
+
+@app.route("/api/llm_cache/clear", methods=["POST"])
+def llm_cache_clear():
+    if llm.response_cache is not None:
+        llm.response_cache.clear()
+    return jsonify({"status": "ok"})
+
+
+# ---------------- METRICS + PROFILING ----------------
+@app.route("/api/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/profile")
+def profile_status():
+    return jsonify(profiler.status())
+
+
+# {"ticks": 50, "interval_ms": 5} → sample the next 50 ticks, then write data/profiles/*.folded
+@app.route("/api/profile", methods=["POST"])
+def profile_start():
+    body = request.json or {}
+    try:
+        ticks = int(body.get("ticks", 50))
+        interval = float(body.get("interval_ms", 5)) / 1000
+    except (TypeError, ValueError):
+        return jsonify({"error": "ticks and interval_ms must be numbers"}), 400
+    if not profiler.start(ticks, interval):
+        return jsonify({"error": "a profile is already running", **profiler.status()}), 409
+    return jsonify(profiler.status())
+
+
+@app.route("/api/profile/stop", methods=["POST"])
+def profile_stop():
+    return jsonify({"active": False, "last": profiler.stop()})
+
+
 # ---------------- RUN SERVER ----------------
 if __name__ == "__main__":
     print("🔥 Groq backend running at http://127.0.0.1:5000")
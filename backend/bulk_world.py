@@ -0,0 +1,395 @@
+import time
+from bisect import bisect_left
+import numpy as np
+from agent import Agent, DEFAULT_SCHEDULES, RANDOM_STEPS
+from world import World, INTERACTION_COOLDOWN_TICKS, DEFAULT_BOUNDS, PHASES
+from crowd import CrowdTracker
+from schedule import ScheduleEngine
+from seed_io import read_seed, agent_records, gc_paused
+from event_log import EventLog
+import checkpoint
+
+NO_GOAL = -1
+
+
+class BulkWorld(World):
+    """
+    Structure-of-arrays engine for headless batch runs.
+
+    Positions, types, leading goals and interaction stamps live in NumPy
+    columns and every phase of World.step is done with array ops. The
+    stats records (and export_stats_csv) are the same as the object
+    engine's. Only the leading goal is tracked, and no memories are
+    written; `agents` builds plain Agent views on demand for the API.
+    """
+
+    def __init__(self, seed_file, stats_retention=None, stats_spill_dir=None, rng_seed=None, event_log_dir=None,
+                 event_log_retention=None):
+        self.pois = {}
+        self.poi_capacity = {}
+        self.bounds = DEFAULT_BOUNDS
+        self.nav = None
+        self.scheduler = ScheduleEngine()
+        self.attach_crowd()
+        self.tick_count = 0
+        self.phase_times = {}
+        self.on_step = None
+        self.stats_retention = stats_retention
+        self.stats_spill_dir = stats_spill_dir
+        self.stats = self._new_stats_recorder()
+        self.seed_file = seed_file
+        self.interaction_count = 0
+        self.set_rng_seed(rng_seed)
+        self.mark_reset()
+        self.memory_journal = None  # no memories are written
+        # EventLog of moves, leading-goal changes and interactions (no memories)
+        self.events = EventLog(event_log_dir, retention=event_log_retention) if event_log_dir else None
+
+        self.ids = []
+        self.traits = []
+        self.schedule_overrides = []
+        self.type_names = list(DEFAULT_SCHEDULES.keys())
+        self._vendor_type = self.type_names.index("vendor")
+        self.goal_names = []
+        self._goal_lookup = {}
+        self._reset_columns(0)
+        self._build_lookup_tables()
+
+        if seed_file:
+            self.load_seed(seed_file)
+
+    def _reset_columns(self, n):
+        self.x = np.zeros(n, dtype=np.int64)
+        self.y = np.zeros(n, dtype=np.int64)
+        self.type = np.zeros(n, dtype=np.int32)
+        self.goal = np.full(n, NO_GOAL, dtype=np.int32)
+        self.last_interaction = np.full(n, -999, dtype=np.int64)
+        self._agent_views = None
+
+    # -------------------------------------------------------------
+    # WORLD STEP
+    # -------------------------------------------------------------
+    def step(self, no_movement=False):
+        """Advance world by one tick (same phases as World.step)."""
+        marks = [time.perf_counter()]
+        self.tick_count += 1
+        current_hour = self.tick_count % 24
+        self._agent_views = None
+
+        n_pois = len(self.pois)
+
+        # -------- SCHEDULE --------
+        for members, goal_id in self._schedule_events[(self.tick_count // 24) % 7][current_hour]:
+            self.goal[members] = goal_id
+
+        marks.append(time.perf_counter())
+
+        # -------- VENDORS --------
+        is_vendor, vendors = self._is_vendor, self._vendors
+        if "canteen" in self.pois:
+            cx, cy = self.pois["canteen"]
+            outside = vendors[(np.abs(self.x[vendors] - cx) > 1) | (np.abs(self.y[vendors] - cy) > 1)]
+            self.x[outside] = cx
+            self.y[outside] = cy
+            self.goal[vendors] = self._goal_lookup["canteen"]
+
+        marks.append(time.perf_counter())
+
+        # -------- MOVEMENT --------
+        if not no_movement:
+            valid = (self.goal >= 0) & (self.goal < n_pois)
+            movers = ~is_vendor
+            seeking = np.flatnonzero(movers & valid)
+            if n_pois:
+                self.crowd.set_counts(np.bincount(self.goal[valid], minlength=n_pois).tolist())
+                self._redirect_crowded(seeking)
+
+            walkers = np.flatnonzero(movers & ~valid)
+            # same draw as World.step, so a shared rng_seed replays identically
+            steps = np.array(self.rng.choices(RANDOM_STEPS, k=walkers.size), dtype=np.int64).reshape(-1, 2)
+            self._move(seeking, walkers, steps)
+
+        marks.append(time.perf_counter())
+
+        # -------- INTERACTIONS --------
+        pairs, occ = self._meet()
+        self.interaction_count += len(pairs)
+
+        marks.append(time.perf_counter())
+
+        # -------- STATS --------
+        self.stats.append(self.tick_count, current_hour, occ.tolist())
+        self._mark_tick()
+        if self.events is not None:
+            self.events.record(self.tick_count, self.x, self.y, self._goal_symbols(), pairs)
+
+        marks.append(time.perf_counter())
+        self.phase_times = {phase: marks[k + 1] - marks[k] for k, phase in enumerate(PHASES)}
+        if self.on_step is not None:
+            self.on_step(self)
+
+    # ---------- movement, interactions and occupancy (ShardedWorld runs them per shard) ----------
+    def _move(self, seeking, walkers, steps):
+        self._seek(seeking)
+        if walkers.size:
+            self._walk(walkers, steps)
+
+    def _meet(self):
+        """(interaction pairs, agents per POI tile) after movement."""
+        ready = np.flatnonzero(self.tick_count - self.last_interaction >= INTERACTION_COOLDOWN_TICKS)
+        return self._pair_up(ready), self._occupancy(self._cell_keys())
+
+    def _seek(self, seeking):
+        """Move the `seeking` agents one step towards the POI of their goal."""
+        poi_x, poi_y = self._poi_xy
+        target = self.goal[seeking]
+        sx, sy = self.x[seeking], self.y[seeking]
+        new_x = sx + np.sign(poi_x[target] - sx)
+        new_y = sy + np.sign(poi_y[target] - sy)
+        if self.nav is not None:
+            # one lookup per agent in the POI's next-tile table (NavGrid.next_step)
+            on_map = self._on_map(sx, sy)
+            w = self.nav.width
+            if self._nav_version != self.nav.version:
+                self._stack_nav_tables()  # set_tile changed the map since they were stacked
+            nxt = self._nav_tables[target[on_map], sy[on_map] * w + sx[on_map]]
+            new_x[on_map] = nxt % w
+            new_y[on_map] = nxt // w
+            # off-map agents go straight, but wait rather than enter a wall
+            wait = ~on_map & self._on_map(new_x, new_y) & ~self._passable(new_x, new_y)
+            new_x[wait] = sx[wait]
+            new_y[wait] = sy[wait]
+        self.x[seeking] = new_x
+        self.y[seeking] = new_y
+
+    def _walk(self, walkers, steps):
+        """Random-walk the `walkers` by `steps` (one (dx, dy) row each) inside the bounds."""
+        min_x, min_y, max_x, max_y = self.bounds
+        wx, wy = self.x[walkers], self.y[walkers]
+        nx = np.clip(wx + steps[:, 0], min_x, max_x)
+        ny = np.clip(wy + steps[:, 1], min_y, max_y)
+        if self.nav is not None:
+            # Agent.move_by: skip blocked steps and diagonal corner cuts
+            ok = self._passable(nx, ny) & (
+                (nx == wx) | (ny == wy) | ~self._on_map(wx, wy)
+                | (self._passable(nx, wy) & self._passable(wx, ny)))
+            nx = np.where(ok, nx, wx)
+            ny = np.where(ok, ny, wy)
+        self.x[walkers] = nx
+        self.y[walkers] = ny
+
+    def _pair_up(self, ready):
+        """
+        Interaction pairs among the `ready` agents (off cooldown, ascending)
+        and stamp them. Within a tile they pair up in list order: 1st with
+        2nd, 3rd with 4th, ... (what the object loop does).
+        """
+        if ready.size < 2:
+            return np.empty((0, 2), dtype=np.int64)
+        ready_keys = (self.x[ready] << 32) + self.y[ready]
+        order = np.lexsort((ready, ready_keys))
+        sorted_keys = ready_keys[order]
+        sorted_idx = ready[order]
+
+        positions = np.arange(sorted_keys.size)
+        group_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        rank = positions - np.maximum.accumulate(np.where(group_start, positions, 0))
+
+        first = positions[:-1][(rank[:-1] % 2 == 0) & ~group_start[1:]]
+        pairs = np.column_stack((sorted_idx[first], sorted_idx[first + 1]))
+        self.last_interaction[pairs.ravel()] = self.tick_count
+        return pairs
+
+    def _occupancy(self, keys):
+        """Agents per POI tile, given the cell keys of the agents to count."""
+        sorted_cells = np.sort(keys)
+        return (np.searchsorted(sorted_cells, self._poi_keys, side="right")
+                - np.searchsorted(sorted_cells, self._poi_keys, side="left"))
+
+    def _redirect_crowded(self, seeking):
+        """
+        World.step's crowd redirect for the `seeking` agents, in agent
+        order: each redirect changes the counts the next agent sees.
+        Counts only change at a redirect, so rather than visiting every
+        agent this jumps to the next one heading for a POI that
+        currently redirects.
+        """
+        crowd = self.crowd
+        if not crowd.redirecting()[0]:
+            return  # the usual case on a roomy campus: skip sorting every seeker
+        goals = self.goal[seeking]
+        # positions in `seeking` of the agents heading for each POI, ascending
+        order = np.argsort(goals, kind="stable")
+        edges = np.searchsorted(goals[order], np.arange(len(self.pois) + 1))
+        queues = [order[edges[p]:edges[p + 1]].tolist() for p in range(len(self.pois))]
+
+        moved, moved_to = [], []
+        cursor = 0
+        while True:
+            sources, dst = crowd.redirecting()
+            nxt = src = None
+            for p in sources:
+                queue = queues[p]
+                k = bisect_left(queue, cursor)
+                if k < len(queue) and (nxt is None or queue[k] < nxt):
+                    nxt, src = queue[k], p
+            if nxt is None:
+                break
+            moved.append(nxt)
+            moved_to.append(dst)
+            crowd.move(src, dst)
+            cursor = nxt + 1
+        if moved:
+            self.goal[seeking[moved]] = moved_to
+
+    def _cell_keys(self):
+        return (self.x << 32) + self.y
+
+    def _on_map(self, xs, ys):
+        return (xs >= 0) & (xs < self.nav.width) & (ys >= 0) & (ys < self.nav.height)
+
+    def _passable(self, xs, ys):
+        on_map = self._on_map(xs, ys)
+        ok = np.zeros(xs.shape, dtype=bool)
+        ok[on_map] = self.nav.cost[ys[on_map] * self.nav.width + xs[on_map]] > 0
+        return ok
+
+    def attach_crowd(self):
+        # counts come from the goal column each tick; agent views stay detached
+        self.crowd = CrowdTracker(self.pois, self.poi_capacity)
+
+    # -------------------------------------------------------------
+    # AGENT VIEWS
+    # -------------------------------------------------------------
+    @property
+    def agents(self):
+        """Agent objects for the current state (read-only snapshot)."""
+        if self._agent_views is None:
+            views = []
+            for i, agent_id in enumerate(self.ids):
+                g = int(self.goal[i])
+                a = Agent(
+                    agent_id,
+                    self.type_names[self.type[i]],
+                    x=int(self.x[i]),
+                    y=int(self.y[i]),
+                    goals=[self.goal_names[g]] if g != NO_GOAL else [],
+                    traits=self.traits[i],
+                    schedule_overrides=self.schedule_overrides[i]
+                )
+                if self.last_interaction[i] != -999:
+                    a.last_interaction_tick = int(self.last_interaction[i])
+                views.append(a)
+            self._agent_views = views
+        return self._agent_views
+
+    # -------------------------------------------------------------
+    # CHECKPOINTS
+    # -------------------------------------------------------------
+    # save_checkpoint is World's: it writes the agent views, so the file
+    # loads into either engine
+    def load_checkpoint(self, path):
+        """Restore a checkpoint from either engine; agents keep only their leading goal."""
+        return checkpoint.load_bulk_checkpoint(self, path)
+
+    # -------------------------------------------------------------
+    # LOAD SEED
+    # -------------------------------------------------------------
+    def _goal_index(self, name):
+        if name not in self._goal_lookup:
+            self._goal_lookup[name] = len(self.goal_names)
+            self.goal_names.append(name)
+        return self._goal_lookup[name]
+
+    def _type_index(self, name):
+        if name not in self.type_names:
+            self.type_names.append(name)
+        return self.type_names.index(name)
+
+    def load_seed(self, seed_file):
+        header, records = read_seed(seed_file)
+
+        self.pois = {k: (int(v[0]), int(v[1])) for k, v in header.get("pois", {}).items()}
+        self.poi_capacity = self._poi_capacities(header.get("poi_capacity"))
+        self._load_map(header.get("map"), header.get("grid"))
+        self.scheduler = ScheduleEngine(header.get("schedules"), header.get("calendar"))
+        self._load_agents(agent_records(header, records))
+
+        self.replace_stats(self._new_stats_recorder())
+        self.tick_count = 0
+        self.interaction_count = 0
+        self.set_rng_seed(self.rng_seed)
+        self.mark_reset()
+        self.attach_events()
+
+    def _load_agents(self, records):
+        """Fill the columns from seed-style agent dicts, after the POIs, map and schedules are set."""
+        self.attach_crowd()
+
+        # POIs take the first goal ids, so `goal < len(pois)` means "valid POI"
+        self.goal_names = list(self.pois.keys())
+        self._goal_lookup = {name: i for i, name in enumerate(self.goal_names)}
+        self.type_names = list(DEFAULT_SCHEDULES.keys())
+
+        ids, traits, overrides = [], [], []
+        xs, ys, types, goals = [], [], [], []
+        with gc_paused():
+            for a in records:
+                goal_names = a.get("goals", [])
+                ids.append(a["id"])
+                traits.append(a.get("traits", {}))
+                overrides.append(a.get("schedule") or None)
+                xs.append(int(a.get("x", 0)))
+                ys.append(int(a.get("y", 0)))
+                types.append(self._type_index(a["type"]))
+                goals.append(self._goal_index(goal_names[0]) if goal_names else NO_GOAL)
+
+        self._reset_columns(len(ids))
+        self.ids, self.traits, self.schedule_overrides = ids, traits, overrides
+        self.x[:] = xs
+        self.y[:] = ys
+        self.type[:] = types
+        self.goal[:] = goals
+
+        self._build_lookup_tables()
+
+    def attach_events(self):
+        """Start the event log (if any) at the current tick; see World.attach_events."""
+        if self.events is not None:
+            self.events.start(self.tick_count, self.ids, self.x, self.y, self._goal_symbols())
+
+    def _goal_symbols(self):
+        """EventLog goal symbol per agent: goal id -> symbol, with NO_GOAL (-1) the last entry."""
+        table = [self.events.goal_symbol([name]) for name in self.goal_names] + [self.events.goal_symbol([])]
+        return np.array(table, dtype=np.uint32)[self.goal]
+
+    def _build_lookup_tables(self):
+        """Schedule events, vendors, POI coordinates and POI next-tile tables."""
+        # ScheduleEngine events as (member indices, goal id), per weekday and hour
+        self.scheduler.assign([self.type_names[t] for t in self.type.tolist()], self.schedule_overrides)
+        members = [np.array(g, dtype=np.int64) for g in self.scheduler.groups]
+        self._schedule_events = [
+            [[(members[g], self._goal_index(goals[0]) if goals else NO_GOAL)
+              for g, goals in self.scheduler.events(day * 24 + hour)]
+             for hour in range(24)]
+            for day in range(7)
+        ]
+
+        self._is_vendor = self.type == self._vendor_type
+        self._vendors = np.flatnonzero(self._is_vendor)
+
+        self._poi_xy = (
+            np.array([p[0] for p in self.pois.values()], dtype=np.int64),
+            np.array([p[1] for p in self.pois.values()], dtype=np.int64),
+        )
+        self._poi_keys = (self._poi_xy[0] << 32) + self._poi_xy[1]
+
+        self._stack_nav_tables()
+
+    def _stack_nav_tables(self):
+        """POI x tile -> next tile, stacked from the NavGrid's per-POI tables at its current version."""
+        self._nav_tables = None
+        self._nav_version = None
+        if self.nav is not None and self.pois:
+            self._nav_tables = np.stack([self.nav.table(x, y) for x, y in self.pois.values()]).astype(np.int64)
+            self._nav_version = self.nav.version
@@ -0,0 +1,279 @@
+# checkpoint.py
+import os
+import sys
+import json
+import zlib
+import struct
+from array import array
+from agent import Agent
+from memory_store import MemoryColumns, MemoryRing
+from stats_store import StatsRecorder
+from navigation import NavGrid
+from schedule import ScheduleEngine
+from seed_io import gc_paused
+
+MAGIC = b"WSIMCKPT"
+FORMAT_VERSION = 1
+
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<8sIQ")
+
+
+# -------------------------------------------------------------
+# FILE LAYOUT
+# -------------------------------------------------------------
+# preamble | JSON header | block | block | ...
+#
+# The header holds the small per-world and per-agent fields; the bulk
+# (positions, memory rows, token ids, stats) is stored as raw typed
+# arrays, each optionally zlib-compressed, listed in header["blocks"].
+# Nothing here is pickled, so loading a file never executes code.
+
+def _write(path, header, blocks, compress):
+    header["blocks"] = []
+    payloads = []
+    for name, data in blocks.items():
+        raw = data if isinstance(data, bytes) else data.tobytes()
+        stored = zlib.compress(raw, 1) if compress else raw
+        header["blocks"].append({
+            "name": name,
+            "type": None if isinstance(data, bytes) else data.typecode,
+            "size": len(stored),
+            "zlib": compress
+        })
+        payloads.append(stored)
+
+    head = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(head)))
+        f.write(head)
+        for stored in payloads:
+            f.write(stored)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise ValueError(f"{path}: not a checkpoint")
+        magic, version, head_len = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a checkpoint")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path}: checkpoint format {version}, expected {FORMAT_VERSION}")
+
+        header = json.loads(f.read(head_len).decode("utf-8"))
+        swap = header["byteorder"] != sys.byteorder
+        blocks = {}
+        for spec in header["blocks"]:
+            stored = f.read(spec["size"])
+            raw = zlib.decompress(stored) if spec["zlib"] else stored
+            if spec["type"] is None:
+                blocks[spec["name"]] = raw
+                continue
+            col = array(spec["type"])
+            col.frombytes(raw)
+            if swap:
+                col.byteswap()
+            blocks[spec["name"]] = col
+    return header, blocks
+
+
+# -------------------------------------------------------------
+# SAVE
+# -------------------------------------------------------------
+def save_checkpoint(world, path, compress=False):
+    """Write the full state of `world` to `path` (a BulkWorld's agent views have no memories)."""
+    agents = world.agents
+
+    # memories: one row per record, texts (+ their tokens) and sources stored once
+    text_ids = array("i")
+    ts = array("q")
+    importance = array("d")
+    source_ids = array("H")
+    memory_counts = array("i")
+    text_lookup, sources, source_lookup = {}, [], {}
+    vocab, vocab_lookup = [], {}
+    blob = bytearray()
+    text_offsets = array("q", [0])
+    token_offsets = array("q", [0])
+    token_ids = array("i")
+
+    for a in agents:
+        memory_counts.append(len(a.memory))
+        for m in a.memory:
+            key = (m.text, m.tokens)
+            t = text_lookup.get(key)
+            if t is None:
+                t = text_lookup[key] = len(text_offsets) - 1
+                blob += m.text.encode("utf-8")
+                text_offsets.append(len(blob))
+                for tok in m.tokens:
+                    v = vocab_lookup.get(tok)
+                    if v is None:
+                        v = vocab_lookup[tok] = len(vocab)
+                        vocab.append(tok)
+                    token_ids.append(v)
+                token_offsets.append(len(token_ids))
+            s = source_lookup.get(m.source)
+            if s is None:
+                s = source_lookup[m.source] = len(sources)
+                sources.append(m.source)
+            text_ids.append(t)
+            ts.append(int(m.ts))
+            importance.append(float(m.importance))
+            source_ids.append(s)
+
+    stat_rows = list(world.stats.iter_rows())
+    stats_cols = list(zip(*stat_rows)) if stat_rows else [()] * (2 + len(world.stats.poi_names))
+
+    header = {
+        "byteorder": sys.byteorder,
+        "tick_count": world.tick_count,
+        "bounds": list(world.bounds),
+        "pois": world.pois,
+        "poi_capacity": world.poi_capacity,
+        "scheduler": world.scheduler.spec(),
+        "rng_seed": world.rng_seed,
+        "rng_state": world.rng.getstate(),
+        "agents": [
+            {
+                "id": a.id,
+                "type": a.type,
+                "goals": a.goals,
+                "traits": a.traits,
+                "personality": a.personality,
+                "schedule_overrides": a.schedule_overrides,
+                "memory_cap": a.MEMORY_CAP,
+                "created_at": a.created_at,
+                "last_logged": a._last_logged_position,
+                "unconsolidated": a._unconsolidated
+            }
+            for a in agents
+        ],
+        "memory_vocab": vocab,
+        "memory_sources": sources,
+        "stats_pois": world.stats.poi_names,
+        "map": {"width": world.nav.width, "height": world.nav.height, "legend": world.nav.legend}
+               if world.nav is not None else None,
+        # journal rows written after this point are dropped on restore
+        "journal_last_id": world.memory_journal.last_id() if world.memory_journal is not None else None
+    }
+
+    blocks = {
+        "agent_x": array("q", (a.x for a in agents)),
+        "agent_y": array("q", (a.y for a in agents)),
+        "agent_last_interaction": array("q", (getattr(a, "last_interaction_tick", -999) for a in agents)),
+        "memory_counts": memory_counts,
+        "memory_text_ids": text_ids,
+        "memory_ts": ts,
+        "memory_importance": importance,
+        "memory_source_ids": source_ids,
+        "text_blob": bytes(blob),
+        "text_offsets": text_offsets,
+        "token_offsets": token_offsets,
+        "token_ids": token_ids,
+        "stats_ticks": array("q", stats_cols[0]),
+        "stats_hours": array("b", stats_cols[1])
+    }
+    for j, col in enumerate(stats_cols[2:]):
+        blocks[f"stats_count_{j}"] = array("i", col)
+    if world.nav is not None:
+        blocks["map_cost"] = array("i", world.nav.cost.tolist())
+
+    _write(path, header, blocks, compress)
+    return path
+
+
+# -------------------------------------------------------------
+# LOAD
+# -------------------------------------------------------------
+def load_checkpoint(world, path):
+    """
+    Replace the state of `world` with a checkpoint. Memory records stay
+    packed until read, and the memory index is built on first query, so
+    restoring does no per-memory work.
+    """
+    header, blocks = _read(path)
+
+    columns = MemoryColumns(
+        blocks["text_blob"], blocks["text_offsets"], blocks["token_offsets"], blocks["token_ids"],
+        header["memory_vocab"], header["memory_sources"],
+        blocks["memory_text_ids"], blocks["memory_ts"], blocks["memory_importance"], blocks["memory_source_ids"]
+    )
+
+    xs, ys = blocks["agent_x"], blocks["agent_y"]
+    last_interaction = blocks["agent_last_interaction"]
+    counts = blocks["memory_counts"]
+
+    agents = []
+    row = 0
+    with gc_paused():
+        for i, rec in enumerate(header["agents"]):
+            a = Agent(rec["id"], rec["type"], x=xs[i], y=ys[i], goals=rec["goals"],
+                      traits=rec["traits"], personality=rec["personality"],
+                      schedule_overrides=rec.get("schedule_overrides"))
+            a.MEMORY_CAP = rec["memory_cap"]
+            a.created_at = rec["created_at"]
+            a._last_logged_position = tuple(rec["last_logged"]) if rec["last_logged"] is not None else None
+            a._unconsolidated = rec.get("unconsolidated", 0)
+            if last_interaction[i] != -999:
+                a.last_interaction_tick = last_interaction[i]
+
+            a.memory = MemoryRing.from_columns(a.MEMORY_CAP, columns, row, counts[i])
+            a._memory_index.attach(a.memory)
+            row += counts[i]
+            agents.append(a)
+
+    _restore_world(world, header, blocks)
+    if world.memory_journal is not None and header.get("journal_last_id") is not None:
+        world.memory_journal.truncate(header["journal_last_id"])
+    world.agents = agents  # attaches them at the restored tick
+    return world
+
+
+def load_bulk_checkpoint(world, path):
+    """
+    load_checkpoint for a BulkWorld: the agent columns come from the
+    records, keeping each agent's leading goal; memories are skipped.
+    """
+    header, blocks = _read(path)
+    _restore_world(world, header, blocks)
+    xs, ys = blocks["agent_x"], blocks["agent_y"]
+    world._load_agents(
+        {"id": rec["id"], "type": rec["type"], "x": xs[i], "y": ys[i], "goals": rec["goals"],
+         "traits": rec["traits"], "schedule": rec.get("schedule_overrides")}
+        for i, rec in enumerate(header["agents"])
+    )
+    world.last_interaction[:] = blocks["agent_last_interaction"]
+    world.interaction_count = 0
+    world.attach_events()
+    return world
+
+
+def _restore_world(world, header, blocks):
+    """Everything but the agents: POIs, schedules, map, stats, tick and RNG state."""
+    poi_names = header["stats_pois"]
+    stats = StatsRecorder.from_columns(
+        poi_names, blocks["stats_ticks"], blocks["stats_hours"],
+        [blocks[f"stats_count_{j}"] for j in range(len(poi_names))],
+        world.stats_retention, world.stats_spill_dir
+    )
+
+    world.pois = {k: tuple(v) for k, v in header["pois"].items()}
+    world.poi_capacity = world._poi_capacities(header.get("poi_capacity"))
+    world.scheduler = ScheduleEngine(**header.get("scheduler", {}))
+    world.nav = None
+    if header.get("map"):
+        spec = header["map"]
+        world.nav = NavGrid(spec["width"], spec["height"], blocks["map_cost"], spec["legend"])
+        world.nav.precompute(world.pois.values())
+    world.bounds = tuple(header["bounds"])
+    world.replace_stats(stats)
+    world.tick_count = header["tick_count"]
+    world.set_rng_seed(header["rng_seed"])
+    version, internal, gauss_next = header["rng_state"]
+    world.rng.setstate((version, tuple(internal), gauss_next))
+    world.mark_reset()
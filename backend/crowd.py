@@ -0,0 +1,94 @@
+import heapq
+
+
+class CrowdTracker:
+    """
+    Live number of agents heading for each POI (by leading goal), for the
+    crowd redirect in World.step.
+
+    Agents report goal changes through retarget() (the Agent.goals setter
+    does this once `crowd` is set), so counts are never rebuilt per tick.
+    A POI's load is count / capacity and it is crowded once the count
+    exceeds its capacity. The least loaded POI comes off a lazy min-heap
+    of (load, POI order), so ties go to the POI listed first.
+    """
+
+    def __init__(self, names, capacity):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.capacity = [int(capacity[name]) for name in self.names]
+        self.counts = [0] * len(self.names)
+        self._heap = []
+
+    def recount(self, goal_lists):
+        """Start over from the agents' current goal lists."""
+        counts = [0] * len(self.names)
+        for goals in goal_lists:
+            i = self.index.get(goals[0]) if goals else None
+            if i is not None:
+                counts[i] += 1
+        self.set_counts(counts)
+
+    def set_counts(self, counts):
+        self.counts = [int(c) for c in counts]
+        self._heap = [(self.load(i), i) for i in range(len(self.names))]
+        heapq.heapify(self._heap)
+
+    def load(self, i):
+        return self.counts[i] / self.capacity[i]
+
+    # -------------------------------------------------------------
+    # UPDATES
+    # -------------------------------------------------------------
+    def retarget(self, old, new):
+        """An agent's leading goal changed from `old` to `new` (names or None)."""
+        i = self.index.get(old)
+        j = self.index.get(new)
+        if i != j:
+            self.move(i, j)
+
+    def move(self, i, j):
+        """Move one agent's count from POI i to POI j (either may be None)."""
+        if i is not None:
+            self.counts[i] -= 1
+            heapq.heappush(self._heap, (self.load(i), i))
+        if j is not None:
+            self.counts[j] += 1
+            heapq.heappush(self._heap, (self.load(j), j))
+        # stale entries pile up behind the live ones; compact now and then
+        if len(self._heap) > 4 * len(self.names) + 32:
+            self.set_counts(self.counts)
+
+    # -------------------------------------------------------------
+    # REDIRECT
+    # -------------------------------------------------------------
+    def least_loaded(self):
+        heap = self._heap
+        while heap:
+            load, i = heap[0]
+            if load == self.load(i):
+                return i
+            heapq.heappop(heap)
+        return None
+
+    def redirect(self, i):
+        """
+        Where an agent heading for POI i should go instead: the least
+        loaded POI, if i is over capacity and that POI stays less loaded
+        than i even with the agent added. None = keep going to i.
+        """
+        if self.counts[i] <= self.capacity[i]:
+            return None
+        j = self.least_loaded()
+        if j is None or self.load(i) <= (self.counts[j] + 1) / self.capacity[j]:
+            return None
+        return j
+
+    def redirecting(self):
+        """(POIs whose agents would redirect right now, where to); redirect() for all POIs at once."""
+        j = self.least_loaded()
+        if j is None:
+            return [], None
+        bar = (self.counts[j] + 1) / self.capacity[j]
+        counts, capacity = self.counts, self.capacity
+        return [i for i in range(len(counts)) if counts[i] > capacity[i] and counts[i] / capacity[i] > bar], j
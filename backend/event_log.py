@@ -0,0 +1,472 @@
+# event_log.py
+import os
+import json
+import zlib
+import struct
+import bisect
+from array import array
+
+import numpy as np
+
+# Segment file: header, then frames. Every segment opens with a keyframe
+# (the full state at its first tick) followed by one delta frame per tick,
+# so seeking to tick T reads one keyframe and at most keyframe_every deltas.
+SEGMENT_HEADER = struct.Struct("<4sHBq")  # magic, version, flags, first tick
+FRAME_HEADER = struct.Struct("<Bqi")      # kind, tick, payload bytes
+MAGIC = b"WEVL"
+VERSION = 1
+FLAG_ZLIB = 1
+KEYFRAME, DELTA = 0, 1
+
+_COUNT = struct.Struct("<I")
+_INT16_MIN, _INT16_MAX = -2 ** 15, 2 ** 15 - 1
+
+
+def _segment_name(tick):
+    return f"{tick:010d}.evl"
+
+
+# -------------------------------------------------------------
+# ENCODING
+# -------------------------------------------------------------
+def _pack_arrays(out, *arrays):
+    """Append a count followed by the raw little-endian bytes of each array."""
+    out += _COUNT.pack(len(arrays[0]))
+    for a in arrays:
+        out += np.ascontiguousarray(a).tobytes()
+
+
+def _gaps(indices):
+    """Ascending agent indices as differences from the previous one: mostly tiny, so they compress well."""
+    return np.diff(indices.astype(np.int64), prepend=0).astype("<u4")
+
+
+def _ungap(gaps):
+    return np.cumsum(gaps, dtype=np.int64)
+
+
+def _pack_strings(out, strings):
+    blobs = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in blobs:
+        offsets.append(offsets[-1] + len(b))
+    out += _COUNT.pack(len(blobs))
+    out += offsets.tobytes()
+    out += b"".join(blobs)
+
+
+class _Reader:
+    """Sequential reads over one frame payload."""
+
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.pos = 0
+
+    def count(self):
+        (n,) = _COUNT.unpack_from(self.data, self.pos)
+        self.pos += 4
+        return n
+
+    def array(self, dtype, n):
+        a = np.frombuffer(self.data, dtype=dtype, count=n, offset=self.pos)
+        self.pos += a.nbytes
+        return a
+
+    def arrays(self, *dtypes_and_widths):
+        n = self.count()
+        return [self.array(dtype, n * width) for dtype, width in dtypes_and_widths]
+
+    def strings(self):
+        n = self.count()
+        offsets = self.array("<u4", n + 1)
+        blob = bytes(self.data[self.pos:self.pos + int(offsets[-1])])
+        self.pos += int(offsets[-1])
+        return [blob[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(n)]
+
+
+# -------------------------------------------------------------
+# WRITER
+# -------------------------------------------------------------
+class EventLog:
+    """
+    Append-only binary log of what every tick changed, under `root`.
+
+    Per tick: agents that moved (index + int16 dx/dy; absolute int32
+    positions for the rare jump that does not fit), goal changes (index +
+    symbol), interaction pairs and added memories. Index columns are
+    ascending and stored as gaps. Goal lists and memory
+    sources are strings in a symbol table that keyframes repeat in full.
+    Every `keyframe_every` ticks a new segment file starts with a keyframe
+    of all positions and goals. Frames are flushed as they are written, so
+    EventReplay can read a live log. With `retention` set, segments that
+    lie wholly more than `retention` ticks back are deleted as new ones
+    open, so the log covers at least the last `retention` ticks.
+
+    The engines feed it columns: start() when a run (re)starts at the
+    world's current tick, record() after every step, memory() from
+    Agent._append_memory.
+    """
+
+    def __init__(self, root, keyframe_every=256, compress=True, retention=None):
+        self.root = root
+        self.keyframe_every = max(1, int(keyframe_every))
+        self.compress = compress
+        self.retention = retention
+        self.ids = []
+        self._index = {}
+        self._symbols = []
+        self._symbol_ids = {}
+        self._new_symbols = []
+        self._goal_keys = {}  # tuple(goals) -> symbol
+        self._goal_objs = []  # per agent: last goals list seen, and its symbol
+        self._goal_syms = []
+        self._x = self._y = self._g = None
+        self._memories = []  # (agent index, text, source symbol) since the last record()
+        self._file = None
+        self._segment_start = None
+        self.bytes_written = 0
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def started(self):
+        return self._file is not None
+
+    # ---------- symbols ----------
+    def symbol(self, text):
+        s = self._symbol_ids.get(text)
+        if s is None:
+            s = self._symbol_ids[text] = len(self._symbols)
+            self._symbols.append(text)
+            self._new_symbols.append(text)
+        return s
+
+    def goal_symbol(self, goals):
+        key = tuple(goals)
+        s = self._goal_keys.get(key)
+        if s is None:
+            s = self._goal_keys[key] = self.symbol(json.dumps(list(key)))
+        return s
+
+    def agent_goal_symbols(self, agents):
+        """Goal symbol per agent; goal lists are shared objects, so unchanged ones cost an `is` check."""
+        objs, syms = self._goal_objs, self._goal_syms
+        for i, a in enumerate(agents):
+            g = a.goals
+            if g is not objs[i]:
+                objs[i] = g
+                syms[i] = self.goal_symbol(g)
+        return np.array(syms, dtype=np.uint32)
+
+    # ---------- writing ----------
+    def start(self, tick, ids, x, y, goal_syms):
+        """
+        The run (re)starts at `tick` with this state: drop whatever the log
+        has after `tick` (a reset or a restore from an earlier point) and
+        open a new segment with a keyframe. The delta that led to `tick`
+        stays; a segment already starting at `tick` is rewritten.
+        """
+        self.close()
+        self.truncate_after(tick)
+        self.ids = list(ids)
+        self._index = {agent_id: i for i, agent_id in enumerate(self.ids)}
+        self._goal_objs = [None] * len(self.ids)
+        self._goal_syms = [0] * len(self.ids)
+        self._memories = []
+        self._open_segment(tick, x, y, goal_syms)
+
+    def start_agents(self, tick, agents):
+        """start() from Agent objects."""
+        n = len(agents)
+        self._goal_objs = [None] * n
+        self._goal_syms = [0] * n
+        goal_syms = self.agent_goal_symbols(agents)
+        objs, syms = self._goal_objs, self._goal_syms
+        self.start(tick, [a.id for a in agents],
+                   np.array([a.x for a in agents], dtype=np.int32),
+                   np.array([a.y for a in agents], dtype=np.int32), goal_syms)
+        self._goal_objs, self._goal_syms = objs, syms
+
+    def record_agents(self, tick, agents, met=()):
+        """record() from Agent objects (in start() order); `met` holds (id, id) pairs."""
+        if self._file is None:
+            return
+        index = self._index
+        pairs = [(index[a], index[b]) for a, b in met]
+        self.record(tick,
+                    np.array([a.x for a in agents], dtype=np.int32),
+                    np.array([a.y for a in agents], dtype=np.int32),
+                    self.agent_goal_symbols(agents), pairs)
+
+    def memory(self, agent_id, text, source):
+        i = self._index.get(agent_id)
+        if i is not None and self._file is not None:
+            self._memories.append((i, text, self.symbol(source)))
+
+    def record(self, tick, x, y, goal_syms, pairs=()):
+        """
+        Log one step: the state after it (positions and goal symbols, one
+        per agent in start() order), its interaction pairs (agent indices)
+        and the memories passed to memory() since the last call.
+        """
+        if self._file is None:
+            return
+        x = np.asarray(x, dtype=np.int32)
+        y = np.asarray(y, dtype=np.int32)
+        goal_syms = np.asarray(goal_syms, dtype=np.uint32)
+
+        moved = np.flatnonzero((x != self._x) | (y != self._y)).astype(np.uint32)
+        dx = x[moved].astype(np.int64) - self._x[moved]
+        dy = y[moved].astype(np.int64) - self._y[moved]
+        fits = (dx >= _INT16_MIN) & (dx <= _INT16_MAX) & (dy >= _INT16_MIN) & (dy <= _INT16_MAX)
+        jumped = moved[~fits]
+        moved, dx, dy = moved[fits], dx[fits], dy[fits]
+        changed = np.flatnonzero(goal_syms != self._g).astype(np.uint32)
+        pairs = np.asarray(pairs, dtype=np.uint32).reshape(-1, 2)
+        memories, self._memories = self._memories, []
+
+        out = bytearray()
+        _pack_strings(out, self._new_symbols)
+        self._new_symbols = []
+        _pack_arrays(out, _gaps(moved), np.column_stack((dx, dy)).astype("<i2").ravel())
+        _pack_arrays(out, _gaps(jumped), np.column_stack((x[jumped], y[jumped])).astype("<i4").ravel())
+        _pack_arrays(out, _gaps(changed), goal_syms[changed].astype("<u4"))
+        _pack_arrays(out, pairs.astype("<u4").ravel()[0::2], pairs.astype("<u4").ravel()[1::2])
+        _pack_arrays(out, np.array([m[0] for m in memories], dtype="<u4"),
+                     np.array([m[2] for m in memories], dtype="<u4"))
+        _pack_strings(out, [m[1] for m in memories])
+        self._write_frame(DELTA, tick, out)
+
+        self._x, self._y, self._g = x.copy(), y.copy(), goal_syms.copy()
+        if tick - self._segment_start >= self.keyframe_every:
+            self._file.close()
+            self._open_segment(tick, self._x, self._y, self._g)
+
+    def prune(self, tick):
+        """Delete segments whose every frame is more than `retention` ticks before `tick`."""
+        if not self.retention:
+            return
+        segments = list_segments(self.root)
+        for (start, path), (next_start, _) in zip(segments, segments[1:]):
+            if next_start > tick - self.retention:
+                break
+            os.remove(path)
+
+    def _open_segment(self, tick, x, y, goal_syms):
+        self._x = np.asarray(x, dtype=np.int32).copy()
+        self._y = np.asarray(y, dtype=np.int32).copy()
+        self._g = np.asarray(goal_syms, dtype=np.uint32).copy()
+        self._segment_start = tick
+        self._file = open(os.path.join(self.root, _segment_name(tick)), "wb")
+        self._file.write(SEGMENT_HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if self.compress else 0, tick))
+
+        out = bytearray()
+        _pack_strings(out, self._symbols)
+        self._new_symbols = []
+        _pack_strings(out, self.ids)
+        _pack_arrays(out, self._x.astype("<i4"), self._y.astype("<i4"), self._g.astype("<u4"))
+        self._write_frame(KEYFRAME, tick, out)
+        self.prune(tick)
+
+    def _write_frame(self, kind, tick, payload):
+        if self.compress:
+            payload = zlib.compress(bytes(payload), 1)
+        self._file.write(FRAME_HEADER.pack(kind, tick, len(payload)))
+        self._file.write(payload)
+        self._file.flush()
+        self.bytes_written += FRAME_HEADER.size + len(payload)
+
+    def truncate_after(self, tick):
+        """Drop frames after `tick` from the files on disk."""
+        for start, path in list_segments(self.root):
+            if start > tick:
+                os.remove(path)
+                continue
+            for kind, t, offset, _ in _frame_index(path):
+                if t > tick:
+                    os.truncate(path, offset)
+                    break
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# -------------------------------------------------------------
+# READER
+# -------------------------------------------------------------
+def list_segments(root):
+    """(first tick, path) of every segment under root, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    out = []
+    for name in os.listdir(root):
+        if name.endswith(".evl") and name[:-4].isdigit():
+            out.append((int(name[:-4]), os.path.join(root, name)))
+    return sorted(out)
+
+
+def _frame_index(path):
+    """(kind, tick, offset, payload size) of every complete frame in a segment."""
+    out = []
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(SEGMENT_HEADER.size)
+        if len(head) < SEGMENT_HEADER.size or head[:4] != MAGIC:
+            return out
+        offset = SEGMENT_HEADER.size
+        while offset + FRAME_HEADER.size <= size:
+            f.seek(offset)
+            kind, tick, n = FRAME_HEADER.unpack(f.read(FRAME_HEADER.size))
+            if offset + FRAME_HEADER.size + n > size:
+                break  # being written
+            out.append((kind, tick, offset, n))
+            offset += FRAME_HEADER.size + n
+    return out
+
+
+def _read_frames(path, until=None):
+    """(kind, tick, payload) of the complete frames in a segment, up to tick `until`."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < SEGMENT_HEADER.size:
+        return
+    magic, version, flags, _ = SEGMENT_HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path}: not an event log segment")
+    offset = SEGMENT_HEADER.size
+    while offset + FRAME_HEADER.size <= len(data):
+        kind, tick, n = FRAME_HEADER.unpack_from(data, offset)
+        start = offset + FRAME_HEADER.size
+        if start + n > len(data) or (until is not None and tick > until):
+            return
+        payload = data[start:start + n]
+        yield kind, tick, zlib.decompress(payload) if flags & FLAG_ZLIB else payload
+        offset = start + n
+
+
+def _decode_delta(payload):
+    r = _Reader(payload)
+    new_symbols = r.strings()
+    moved, dxy = r.arrays(("<u4", 1), ("<i2", 2))
+    jumped, xy = r.arrays(("<u4", 1), ("<i4", 2))
+    changed, goals = r.arrays(("<u4", 1), ("<u4", 1))
+    pair_a, pair_b = r.arrays(("<u4", 1), ("<u4", 1))
+    mem_agents, mem_sources = r.arrays(("<u4", 1), ("<u4", 1))
+    mem_texts = r.strings()
+    return {
+        "symbols": new_symbols,
+        "moved": _ungap(moved), "dx": dxy[0::2], "dy": dxy[1::2],
+        "jumped": _ungap(jumped), "jx": xy[0::2], "jy": xy[1::2],
+        "goal_changed": _ungap(changed), "goals": goals,
+        "pairs": np.column_stack((pair_a, pair_b)),
+        "memory_agents": mem_agents, "memory_sources": mem_sources, "memory_texts": mem_texts,
+    }
+
+
+class ReplayState:
+    """Positions and goals of every agent after one tick."""
+
+    def __init__(self, tick, ids, symbols, x, y, goal_syms):
+        self.tick = tick
+        self.ids = ids
+        self.symbols = symbols
+        self.x = x
+        self.y = y
+        self.goal_syms = goal_syms
+
+    def goals(self, i):
+        return json.loads(self.symbols[self.goal_syms[i]])
+
+    def to_dict(self):
+        goal_lists = {}
+        agents = []
+        for i, agent_id in enumerate(self.ids):
+            s = int(self.goal_syms[i])
+            if s not in goal_lists:
+                goal_lists[s] = json.loads(self.symbols[s])
+            agents.append({"id": agent_id, "x": int(self.x[i]), "y": int(self.y[i]), "goals": goal_lists[s]})
+        return {"tick": self.tick, "agents": agents}
+
+
+class EventReplay:
+    """Reads an EventLog directory: seek to any logged tick, or walk its events."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def range(self):
+        """(first tick, last tick) in the log, or None when it is empty."""
+        segments = list_segments(self.root)
+        if not segments:
+            return None
+        for _, path in reversed(segments):
+            frames = _frame_index(path)
+            if frames:
+                return segments[0][0], frames[-1][1]
+        return None
+
+    def state_at(self, tick):
+        """
+        State after `tick`: the newest keyframe at or before it plus the
+        deltas up to it. Raises ValueError if the log does not cover it.
+        """
+        segments = list_segments(self.root)
+        k = bisect.bisect_right([start for start, _ in segments], tick) - 1
+        if k < 0:
+            raise ValueError(f"tick {tick} is before the start of the event log")
+
+        state = None
+        for kind, t, payload in _read_frames(segments[k][1], until=tick):
+            if kind == KEYFRAME:
+                r = _Reader(payload)
+                symbols = r.strings()
+                ids = r.strings()
+                x, y, g = r.arrays(("<i4", 1), ("<i4", 1), ("<u4", 1))
+                state = ReplayState(t, ids, symbols, x.astype(np.int64), y.astype(np.int64), g.copy())
+                continue
+            d = _decode_delta(payload)
+            state.symbols.extend(d["symbols"])
+            state.x[d["moved"]] += d["dx"]
+            state.y[d["moved"]] += d["dy"]
+            state.x[d["jumped"]] = d["jx"]
+            state.y[d["jumped"]] = d["jy"]
+            state.goal_syms[d["goal_changed"]] = d["goals"]
+            state.tick = t
+        if state is None or state.tick != tick:
+            raise ValueError(f"tick {tick} is not in the event log")
+        return state
+
+    def events(self, since=None, until=None):
+        """
+        Decoded delta frames for ticks in (since, until], oldest first, with
+        agent ids and strings resolved: {"tick", "moves": [[id, dx, dy]],
+        "goals": [[id, goals]], "interactions": [[id, id]], "memories":
+        [[id, text, source]]}. Moves include jumps as absolute [id, x, y, true].
+        """
+        segments = list_segments(self.root)
+        starts = [start for start, _ in segments]
+        first = max(0, bisect.bisect_right(starts, since) - 1) if since is not None else 0
+        ids = symbols = None
+        for start, path in segments[first:]:
+            if until is not None and start > until:
+                return
+            for kind, t, payload in _read_frames(path, until=until):
+                if kind == KEYFRAME:
+                    r = _Reader(payload)
+                    symbols = r.strings()
+                    ids = r.strings()
+                    continue
+                d = _decode_delta(payload)
+                symbols.extend(d["symbols"])
+                if since is not None and t <= since:
+                    continue
+                yield {
+                    "tick": t,
+                    "moves": [[ids[i], int(dx), int(dy)] for i, dx, dy in zip(d["moved"], d["dx"], d["dy"])]
+                             + [[ids[i], int(x), int(y), True] for i, x, y in zip(d["jumped"], d["jx"], d["jy"])],
+                    "goals": [[ids[i], json.loads(symbols[s])] for i, s in zip(d["goal_changed"], d["goals"])],
+                    "interactions": [[ids[a], ids[b]] for a, b in d["pairs"]],
+                    "memories": [[ids[i], text, symbols[s]] for i, s, text
+                                 in zip(d["memory_agents"], d["memory_sources"], d["memory_texts"])],
+                }
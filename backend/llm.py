@@ -0,0 +1,224 @@
+# llm.py
+import os
+import copy
+import time
+import json
+import functools
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from llm_cache import ResponseCache, prompt_key, agent_state_key
+from metrics import REGISTRY
+
+# ---------------- GROQ CONFIG ----------------
+# Set GROQ_API_KEY in the environment (do NOT paste keys into the source)
+GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
+# Any OpenAI-compatible endpoint works, e.g. tools/mock_llm_server.py for local testing
+GROQ_URL = os.environ.get("GROQ_URL", "https://api.groq.com/openai/v1/chat/completions")
+
+GROQ_MODEL = "openai/gpt-oss-20b"
+GROQ_TIMEOUT = 20
+
+# Max LLM requests in flight across the process, and retry policy for 429/5xx/connection errors
+LLM_CONCURRENCY = int(os.environ.get("LLM_CONCURRENCY", "8"))
+LLM_RETRIES = 3
+LLM_BACKOFF = 0.5  # seconds; urllib3 doubles it per retry and honours Retry-After
+
+# Response cache (temperature is 0, so equal inputs give equal answers).
+# LLM_CACHE_SIZE=0 disables it; LLM_CACHE_DB adds a SQLite tier that survives restarts.
+LLM_CACHE_SIZE = int(os.environ.get("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "600"))
+LLM_CACHE_DB = os.environ.get("LLM_CACHE_DB") or None
+LLM_CACHE_POS_QUANTUM = int(os.environ.get("LLM_CACHE_POS_QUANTUM", "1"))
+
+response_cache = ResponseCache(LLM_CACHE_SIZE, LLM_CACHE_TTL, LLM_CACHE_DB) if LLM_CACHE_SIZE > 0 else None
+
+# ---------------- METRICS ----------------
+LLM_REQUESTS = REGISTRY.counter(
+    "worldsim_llm_requests_total", "call_groq outcomes: ok, cached, unparsed or error", ["outcome"])
+LLM_ERRORS = REGISTRY.counter("worldsim_llm_errors_total", "Failed LLM calls by exception type", ["error"])
+LLM_LATENCY = REGISTRY.histogram(
+    "worldsim_llm_request_seconds", "LLM HTTP round trip, retries included",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 60.0))
+LLM_PARSE = REGISTRY.histogram(
+    "worldsim_llm_parse_seconds", "JSON extraction from the response text",
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01))
+LLM_TOKENS = REGISTRY.counter("worldsim_llm_tokens_total", "Token usage reported by the API", ["kind"])
+
+
+# ---------------- JSON EXTRACTION ----------------
+def _extract_json_from_text(text: str):
+    if not text:
+        return None
+
+    txt = text.strip()
+
+    # code fences
+    if txt.startswith("```"):
+        parts = txt.split("```")
+        for p in parts:
+            p = p.strip()
+            if p.startswith("{") and p.endswith("}"):
+                try:
+                    return json.loads(p)
+                except:
+                    pass
+
+    # raw { ... }
+    s = txt.find("{")
+    e = txt.rfind("}")
+    if s != -1 and e != -1 and e > s:
+        try:
+            return json.loads(txt[s:e+1])
+        except:
+            pass
+
+    # whole text fallback
+    try:
+        return json.loads(txt)
+    except:
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_response_text(text: str):
+    """_extract_json_from_text, memoized on the exact response text (callers get copies)."""
+    return _extract_json_from_text(text)
+
+
+# ---------------- HTTP SESSION ----------------
+_session = None
+_session_lock = threading.Lock()
+
+
+# every upstream request holds one slot, whichever batch or route sent it
+_in_flight = threading.BoundedSemaphore(LLM_CONCURRENCY)
+
+
+def _get_session():
+    """Shared keep-alive session, pooled for LLM_CONCURRENCY connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=LLM_RETRIES,
+                backoff_factor=LLM_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=None,  # chat completions are POSTs
+                raise_on_status=False
+            )
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=LLM_CONCURRENCY, max_retries=retry)
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+# ---------------- GROQ CALL ----------------
+def call_groq(prompt: str, cache_key: str = None):
+    """
+    Returns (parsed_json or None, debug_info).
+    Groq is OpenAI-compatible.
+    Parsed responses are cached under `cache_key` (default: the
+    canonicalized prompt); a hit skips both the request and parsing.
+    """
+    key = cache_key or prompt_key(prompt, GROQ_MODEL)
+    if response_cache is not None:
+        hit = response_cache.get(key)
+        if hit is not None:
+            LLM_REQUESTS.inc("cached")
+            return copy.copy(hit["parsed"]), {"cached": True, "text": hit["text"]}
+
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+    payload = {
+        "model": GROQ_MODEL,
+        "messages": [
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0,
+        "max_tokens": 200
+    }
+
+    try:
+        with _in_flight:
+            start = time.perf_counter()
+            try:
+                r = _get_session().post(GROQ_URL, headers=headers, json=payload, timeout=GROQ_TIMEOUT)
+            finally:
+                LLM_LATENCY.observe(time.perf_counter() - start)
+        r.raise_for_status()
+        raw = r.json()
+
+        usage = raw.get("usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if isinstance(usage.get(kind), int):
+                LLM_TOKENS.inc(kind[:-len("_tokens")], amount=usage[kind])
+
+        text = raw["choices"][0]["message"]["content"]
+
+        start = time.perf_counter()
+        parsed = copy.copy(_parse_response_text(text))
+        LLM_PARSE.observe(time.perf_counter() - start)
+        LLM_REQUESTS.inc("ok" if parsed else "unparsed")
+        if parsed and response_cache is not None:
+            response_cache.put(key, {"parsed": copy.copy(parsed), "text": text})
+        return parsed, {"raw": raw, "text": text}
+
+    except Exception as e:
+        LLM_REQUESTS.inc("error")
+        LLM_ERRORS.inc(type(e).__name__)
+        return None, {"error": str(e), "trace": traceback.format_exc()}
+
+
+def call_groq_many(prompts, cache_keys=None, max_workers=None):
+    """
+    call_groq for each prompt on up to `max_workers` threads; results in
+    prompt order. Requests from all batches share the LLM_CONCURRENCY limit.
+    """
+    if not prompts:
+        return []
+    keys = cache_keys or [None] * len(prompts)
+    workers = max(1, min(max_workers or LLM_CONCURRENCY, len(prompts)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(call_groq, prompts, keys))
+
+
+def agent_cache_key(agent, pois):
+    """Cache key for an agent prompt: its state fingerprint, not the raw prompt text."""
+    return agent_state_key(agent, pois, GROQ_MODEL, LLM_CACHE_POS_QUANTUM)
+
+
+# ---------------- PROMPT ----------------
+def build_agent_prompt(agent, pois):
+    return f"""
+You are an AI agent inside a 2D grid simulation.
+Return ONLY strict JSON, exactly like:
+
+{{
+  "thought": "short reasoning",
+  "action": "move",
+  "dx": 1,
+  "dy": 0,
+  "memory": "short memory"
+}}
+
+Rules:
+- action must be "move" or "idle".
+- dx, dy must be integers in [-1, 0, 1].
+
+State:
+id: {agent.id}
+type: {agent.type}
+position: ({agent.x}, {agent.y})
+goals: {agent.goals}
+recent_memory: {agent.memory[-5:]}
+pois: {pois}
+"""
@@ -0,0 +1,121 @@
+# llm_cache.py
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def prompt_key(prompt: str, model: str = "") -> str:
+    """Content address of a prompt, ignoring whitespace differences."""
+    canonical = " ".join(prompt.split())
+    return hashlib.sha256(f"{model}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def agent_state_key(agent, pois, model: str = "", pos_quantum: int = 1) -> str:
+    """
+    Fingerprint of what an agent prompt depends on: type, goals, position
+    quantized to `pos_quantum` tiles, the last 5 memory texts and the POIs.
+    Unlike the prompt itself it ignores memory timestamps/scores, so
+    agents in the same situation share one cached response.
+    """
+    q = max(1, int(pos_quantum))
+    state = [
+        model,
+        agent.type,
+        list(agent.goals),
+        agent.x // q,
+        agent.y // q,
+        [m["text"] for m in agent.memory[-5:]],
+        sorted((k, list(v)) for k, v in pois.items())
+    ]
+    return hashlib.sha256(json.dumps(state, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    LRU cache with TTL for parsed LLM responses, with an optional SQLite
+    second tier that survives restarts. Values must be JSON-serializable.
+    Thread-safe; counters are exposed through stats().
+    """
+
+    def __init__(self, capacity=2048, ttl=600.0, db_path=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._items = OrderedDict()  # key -> (expires_at, value)
+        self._db = None
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "stores": 0}
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > now:
+                    self._items.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self._items[key]
+                self.counters["expirations"] += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.counters["disk_hits"] += 1
+                    return value
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.counters["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), expires_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key, expires_at, value):
+        self._items[key] = (expires_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["disk_hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "size": len(self._items),
+                "capacity": self.capacity,
+                "ttl": self.ttl,
+                "disk": self.db_path,
+                "hit_rate": round((lookups - self.counters["misses"]) / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,176 @@
+import math
+import heapq
+import bisect
+from typing import Dict, List
+
+from vocab import VOCAB
+
+
+def memory_score(overlap: int, norm: float, importance: float, age_seconds: int) -> float:
+    """Same arithmetic as Agent.score_memory_for_query, on precomputed parts."""
+    token_score = overlap / norm if overlap else 0.0
+    age_hours = age_seconds / 3600.0
+    recency = 1.0 / (1.0 + 0.1 * age_hours)
+    score = token_score * 0.6 + importance * 0.3
+    return float(score * recency)
+
+
+class MemoryIndex:
+    """
+    Token id -> memory posting lists for one agent's memory window.
+
+    Memories get increasing sequence numbers as they are added, so the
+    live window is always the contiguous range [first_seq, next_seq) and
+    evicting the oldest k memories is just dropping the first k seqs.
+    Each entry keeps its sorted token ids (shared between memories with
+    the same text), length norm, importance and ts so a query never has
+    to recompute them.
+
+    Adds are only queued and get indexed on the next query, so the
+    per-tick movement log does not pay for postings nobody reads;
+    memories evicted before any query are never indexed at all.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.postings: Dict[int, set] = {}
+        self.entries: Dict[int, tuple] = {}
+        # (-importance, seq), ascending = most important first
+        self.by_importance: List[tuple] = []
+        self.pending = []  # (seq, mem) added but not yet indexed; a list, as an empty deque is ~700 bytes
+        self.first_seq = 0
+        self.next_seq = 0
+        # seqs below _ring_until are read from _ring on the next flush (see attach)
+        self._ring = None
+        self._ring_until = 0
+
+    def __len__(self):
+        return self.next_seq - self.first_seq
+
+    def add(self, mem: Dict) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        self.pending.append((seq, mem))
+        return seq
+
+    def _flush(self):
+        if self._ring_until > self.first_seq:
+            # ring position 0 is always first_seq, since the index mirrors it
+            ring, first = self._ring, self.first_seq
+            for seq in range(first, self._ring_until):
+                self._index(seq, ring[seq - first])
+        self._ring = None
+        self._ring_until = 0
+        pending, self.pending = self.pending, []
+        for seq, mem in pending:
+            self._index(seq, mem)
+
+    def _index(self, seq: int, mem: Dict):
+        ids = mem.token_ids
+        norm = 1 + math.log(1 + len(ids))
+        importance = float(mem.get("importance", 0.0))
+        ts = mem.get("ts")
+        self.entries[seq] = (mem, ids, norm, importance, None if ts is None else int(ts))
+
+        for t in ids:
+            self.postings.setdefault(t, set()).add(seq)
+        bisect.insort(self.by_importance, (-importance, seq))
+
+    def evict_oldest(self, k: int = 1):
+        for _ in range(min(k, len(self))):
+            seq = self.first_seq
+            self.first_seq += 1
+
+            if seq not in self.entries:
+                # not indexed yet: either still in the attached ring or queued,
+                # and everything older has already been evicted
+                if seq >= self._ring_until:
+                    del self.pending[0]
+                continue
+
+            self._unindex(seq)
+
+    def _unindex(self, seq: int):
+        _, ids, _, importance, _ = self.entries.pop(seq)
+        for t in ids:
+            posting = self.postings[t]
+            posting.discard(seq)
+            if not posting:
+                del self.postings[t]
+        i = bisect.bisect_left(self.by_importance, (-importance, seq))
+        del self.by_importance[i]
+
+    def replace_last(self, mem: Dict):
+        """
+        Swap the newest memory for `mem`, keeping its seq. An attached ring
+        must already hold `mem` (MemoryRing.replace_last) before this runs.
+        """
+        seq = self.next_seq - 1
+        if seq < self.first_seq:
+            return
+        if self.pending and self.pending[-1][0] == seq:
+            self.pending[-1] = (seq, mem)
+        elif seq in self.entries:
+            self._unindex(seq)
+            self._index(seq, mem)
+
+    def rebuild(self, memories: List[Dict]):
+        self.clear()
+        for mem in memories:
+            self.add(mem)
+
+    def attach(self, ring):
+        """
+        Like rebuild(ring), but without touching the records now: they are
+        read from the ring on the first query. Used for restored rings,
+        whose records are only materialized on access.
+        """
+        self.clear()
+        self._ring = ring
+        self.next_seq = self._ring_until = len(ring)
+
+    def top(self, query_tokens: List[str], top_n: int, now_ts: int) -> List[Dict]:
+        """
+        Highest scoring memories for the query, best first.
+
+        Identical to scoring every memory and stable-sorting by score:
+        ties keep memory order (older first). Memories that share no
+        token with the query can only score importance * 0.3, so they are
+        visited in importance order and the scan stops once that bound
+        falls below the current N-th best score.
+        """
+        if top_n <= 0:
+            return []
+        self._flush()
+
+        overlaps: Dict[int, int] = {}
+        for t in VOCAB.known_ids(query_tokens):
+            for seq in self.postings.get(t, ()):
+                overlaps[seq] = overlaps.get(seq, 0) + 1
+
+        heap = []  # min-heap of (score, -seq)
+
+        def offer(seq, overlap):
+            _, _, norm, importance, ts = self.entries[seq]
+            age = max(0, now_ts - ts) if ts is not None else 0
+            sc = memory_score(overlap, norm, importance, age)
+            if sc <= 0:
+                return
+            item = (sc, -seq)
+            if len(heap) < top_n:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        for seq, overlap in overlaps.items():
+            offer(seq, overlap)
+
+        for neg_importance, seq in self.by_importance:
+            if len(heap) >= top_n and -neg_importance * 0.3 < heap[0][0]:
+                break
+            if seq not in overlaps:
+                offer(seq, 0)
+
+        return [self.entries[-neg_seq][0] for _, neg_seq in sorted(heap, reverse=True)]
@@ -0,0 +1,174 @@
+import math
+import heapq
+import sqlite3
+import threading
+from typing import List, Optional
+from memory_index import memory_score
+from memory_store import MemoryRecord
+
+
+class MemoryJournal:
+    """
+    Append-only SQLite store of every memory every agent ever had, for
+    retrieval beyond the in-memory MEMORY_CAP window.
+
+    Adds are buffered and written by commit(), which World.step calls
+    once per tick, so a tick costs one transaction. The database runs in
+    WAL mode. An FTS5 index over each memory's tokens finds overlap
+    candidates; scoring is the same as MemoryIndex.top (memory_score),
+    so with a window big enough to hold everything both give the same
+    results.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pending = []  # (agent_id, text, ts, importance, source, tokens)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS memories (
+                id INTEGER PRIMARY KEY,
+                agent_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                importance REAL NOT NULL,
+                source TEXT NOT NULL,
+                tokens TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS memories_by_importance
+                ON memories (agent_id, importance DESC, id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS memory_fts
+                USING fts5(agent_id, tokens, content='memories', content_rowid='id');
+        """)
+        self._db.commit()
+
+    # -------------------------------------------------------------
+    # WRITING
+    # -------------------------------------------------------------
+    def append(self, agent_id: str, mem: MemoryRecord):
+        with self._lock:
+            self._pending.append((agent_id, mem.text, int(mem.ts), float(mem.importance),
+                                  mem.source, " ".join(mem.tokens)))
+
+    def commit(self):
+        """Write everything appended since the last commit in one transaction."""
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        with self._db:
+            first = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM memories").fetchone()[0]
+            ids = range(first, first + len(rows))
+            self._db.executemany(
+                "INSERT INTO memories (id, agent_id, text, ts, importance, source, tokens) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(i, *r) for i, r in zip(ids, rows)]
+            )
+            self._db.executemany(
+                "INSERT INTO memory_fts (rowid, agent_id, tokens) VALUES (?, ?, ?)",
+                [(i, r[0], r[5]) for i, r in zip(ids, rows)]
+            )
+
+    def last_id(self) -> int:
+        """Id of the newest committed memory (0 if empty)."""
+        with self._lock:
+            self._commit()
+            return self._db.execute("SELECT COALESCE(MAX(id), 0) FROM memories").fetchone()[0]
+
+    def truncate(self, last_id: int):
+        """Forget memories newer than `last_id`, e.g. when a checkpoint is restored."""
+        with self._lock:
+            self._pending.clear()
+            with self._db:
+                for (rowid, agent_id, tokens) in self._db.execute(
+                        "SELECT id, agent_id, tokens FROM memories WHERE id > ?", (last_id,)).fetchall():
+                    self._db.execute(
+                        "INSERT INTO memory_fts (memory_fts, rowid, agent_id, tokens) VALUES ('delete', ?, ?, ?)",
+                        (rowid, agent_id, tokens)
+                    )
+                self._db.execute("DELETE FROM memories WHERE id > ?", (last_id,))
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            with self._db:
+                self._db.execute("DELETE FROM memories")
+                self._db.execute("INSERT INTO memory_fts (memory_fts) VALUES ('delete-all')")
+
+    def count(self, agent_id: Optional[str] = None) -> int:
+        with self._lock:
+            self._commit()
+            if agent_id is None:
+                return self._db.execute("SELECT COUNT(*) FROM memories").fetchone()[0]
+            return self._db.execute("SELECT COUNT(*) FROM memories WHERE agent_id = ?", (agent_id,)).fetchone()[0]
+
+    # -------------------------------------------------------------
+    # RETRIEVAL
+    # -------------------------------------------------------------
+    def top(self, agent_id: str, query_tokens: List[str], top_n: int, now_ts: int) -> List[MemoryRecord]:
+        """
+        Highest scoring memories of one agent's whole history, best first.
+
+        Same algorithm as MemoryIndex.top: every memory sharing a token
+        with the query is scored, then the rest are visited in importance
+        order until importance * 0.3 can no longer beat the N-th best.
+        Ties keep memory order (older first).
+        """
+        if top_n <= 0:
+            return []
+        query = set(query_tokens)
+
+        with self._lock:
+            self._commit()
+            heap = []  # min-heap of (score, -id, row)
+
+            def offer(row, overlap, tokens):
+                rowid, _, ts, importance, _, _ = row
+                norm = 1 + math.log(1 + len(tokens))
+                sc = memory_score(overlap, norm, importance, max(0, now_ts - ts))
+                if sc <= 0:
+                    return
+                item = (sc, -rowid, row)
+                if len(heap) < top_n:
+                    heapq.heappush(heap, item)
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+
+            matched = set()
+            if query:
+                match = "agent_id:{} AND tokens:({})".format(
+                    _fts_quote(agent_id), " OR ".join(_fts_quote(t) for t in sorted(query)))
+                for row in self._db.execute(
+                        "SELECT m.id, m.text, m.ts, m.importance, m.source, m.tokens FROM memory_fts "
+                        "JOIN memories m ON m.id = memory_fts.rowid "
+                        "WHERE memory_fts MATCH ? AND m.agent_id = ?", (match, agent_id)):
+                    # FTS only narrows the candidates; overlap is counted on our own tokens
+                    tokens = set(row[5].split())
+                    matched.add(row[0])
+                    offer(row, len(tokens & query), tokens)
+
+            for row in self._db.execute(
+                    "SELECT id, text, ts, importance, source, tokens FROM memories "
+                    "WHERE agent_id = ? ORDER BY importance DESC, id", (agent_id,)):
+                if len(heap) >= top_n and row[3] * 0.3 < heap[0][0]:
+                    break
+                if row[0] not in matched:
+                    offer(row, 0, set(row[5].split()))
+
+        return [
+            MemoryRecord(text, ts, importance, tokens.split(), source)
+            for _, _, (_, text, ts, importance, source, tokens) in sorted(heap, key=lambda h: h[:2], reverse=True)
+        ]
+
+    def close(self):
+        with self._lock:
+            self._commit()
+            self._db.close()
+
+
+def _fts_quote(term: str) -> str:
+    return '"' + str(term).replace('"', '""') + '"'
@@ -0,0 +1,222 @@
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from vocab import VOCAB
+
+
+class MemoryRecord:
+    """
+    One agent memory. Slotted replacement for the old memory dict; still
+    supports mem["text"] / mem.get("tokens") so callers are unchanged.
+
+    A tokens tuple is kept as given, so records made from a TokenCache
+    entry share it; other iterables are copied with every token interned.
+    token_ids are the sorted vocabulary ids of the tokens (see vocab.py).
+    """
+
+    __slots__ = ("text", "ts", "importance", "tokens", "source", "_token_ids")
+    FIELDS = ("text", "ts", "importance", "tokens", "source")
+
+    def __init__(self, text: str, ts: int, importance: float, tokens: Iterable[str], source: str,
+                 token_ids: Optional[Tuple[int, ...]] = None):
+        self.text = text
+        self.ts = ts
+        self.importance = importance
+        # interned, so repeated words ("moved", agent ids, POIs) are stored once
+        self.tokens = tokens if type(tokens) is tuple else tuple(map(sys.intern, tokens))
+        self.source = sys.intern(source)
+        self._token_ids = token_ids
+
+    @property
+    def token_ids(self) -> Tuple[int, ...]:
+        if self._token_ids is None:
+            self._token_ids = VOCAB.ids(self.tokens)
+        return self._token_ids
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "MemoryRecord":
+        return cls(d["text"], d["ts"], d["importance"], d.get("tokens", ()), d.get("source", "self"))
+
+    def to_dict(self) -> Dict:
+        return {
+            "text": self.text,
+            "ts": self.ts,
+            "importance": self.importance,
+            "tokens": list(self.tokens),
+            "source": self.source
+        }
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        if key == "tokens":
+            value = tuple(map(sys.intern, value))
+            self._token_ids = None
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __eq__(self, other):
+        if isinstance(other, MemoryRecord):
+            return all(getattr(self, f) == getattr(other, f) for f in self.FIELDS)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+
+class MemoryColumns:
+    """
+    Packed, read-only memory rows shared by many rings (see checkpoint.py).
+
+    Each row is a text id, ts, importance and source id. Texts are stored
+    once in a UTF-8 blob together with their token ids, so rows with the
+    same text share them and nothing is decoded or tokenized until a
+    record is actually read. A text is decoded once; every record of it
+    gets the same text, tokens and vocabulary id objects.
+    """
+
+    __slots__ = ("blob", "text_offsets", "token_offsets", "token_ids", "vocab",
+                 "sources", "text_ids", "ts", "importance", "source_ids", "_decoded")
+
+    def __init__(self, blob, text_offsets, token_offsets, token_ids, vocab,
+                 sources, text_ids, ts, importance, source_ids):
+        self.blob = blob
+        self.text_offsets = text_offsets
+        self.token_offsets = token_offsets
+        self.token_ids = token_ids
+        self.vocab = [sys.intern(t) for t in vocab]
+        self.sources = [sys.intern(s) for s in sources]
+        self.text_ids = text_ids
+        self.ts = ts
+        self.importance = importance
+        self.source_ids = source_ids
+        self._decoded = {}  # text id -> (text, tokens, vocabulary ids)
+
+    def _text(self, t: int) -> tuple:
+        entry = self._decoded.get(t)
+        if entry is None:
+            vocab = self.vocab
+            text = self.blob[self.text_offsets[t]:self.text_offsets[t + 1]].decode("utf-8")
+            tokens = tuple(vocab[i] for i in self.token_ids[self.token_offsets[t]:self.token_offsets[t + 1]])
+            entry = self._decoded[t] = (text, tokens, VOCAB.ids(tokens))
+        return entry
+
+    def record(self, row: int) -> MemoryRecord:
+        text, tokens, ids = self._text(self.text_ids[row])
+        return MemoryRecord(text, self.ts[row], self.importance[row], tokens,
+                            self.sources[self.source_ids[row]], ids)
+
+
+class MemoryRing:
+    """
+    Fixed-capacity ring buffer of MemoryRecords, oldest first.
+
+    append() is O(1) and overwrites the oldest record once full, instead
+    of re-slicing a list on every add. Indexing and slicing follow list
+    semantics, so memory[-5:] and reversed(memory[-n:]) keep working.
+
+    A ring restored with from_columns() starts with empty slots that are
+    filled from the packed rows the first time they are read.
+    """
+
+    __slots__ = ("capacity", "_buf", "_start", "_len", "_cold", "_cold_row")
+
+    def __init__(self, capacity: int, records: Iterable[MemoryRecord] = ()):
+        self.capacity = capacity
+        # grows up to capacity, then wraps around
+        self._buf: List[MemoryRecord] = []
+        self._start = 0
+        self._len = 0
+        # slot i holding None = row _cold_row + i of _cold, not read yet
+        self._cold: Optional[MemoryColumns] = None
+        self._cold_row = 0
+        for rec in records:
+            self.append(rec)
+
+    @classmethod
+    def from_columns(cls, capacity: int, columns: MemoryColumns, first_row: int, count: int) -> "MemoryRing":
+        """Ring over rows [first_row, first_row + count) of `columns` (newest `capacity` kept)."""
+        ring = cls(capacity)
+        if count > capacity:
+            first_row += count - capacity
+            count = capacity
+        if count > 0:
+            ring._buf = [None] * count
+            ring._len = count
+            ring._cold = columns
+            ring._cold_row = first_row
+        return ring
+
+    def _slot(self, i: int) -> MemoryRecord:
+        rec = self._buf[i]
+        if rec is None:
+            rec = self._buf[i] = self._cold.record(self._cold_row + i)
+        return rec
+
+    def append(self, rec: MemoryRecord) -> Optional[MemoryRecord]:
+        """Add a record; returns the evicted oldest record when full."""
+        if self.capacity <= 0:
+            return rec
+        if self._len < self.capacity:
+            self._buf.append(rec)
+            self._len += 1
+            return None
+
+        evicted = self._slot(self._start)
+        self._buf[self._start] = rec
+        self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    def replace_last(self, rec: MemoryRecord):
+        """Swap the newest record for `rec` in place."""
+        if not self._len:
+            raise IndexError("replace_last on an empty ring")
+        self._buf[(self._start + self._len - 1) % self.capacity] = rec
+
+    def resize(self, capacity: int) -> int:
+        """Change capacity, keeping the newest records. Returns how many were dropped."""
+        records = list(self)
+        dropped = max(0, len(records) - capacity)
+        self.capacity = capacity
+        self.clear()
+        for rec in records[dropped:]:
+            self.append(rec)
+        return dropped
+
+    def clear(self):
+        self._buf = []
+        self._start = 0
+        self._len = 0
+        self._cold = None
+        self._cold_row = 0
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._slot((self._start + i) % self.capacity)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("memory index out of range")
+        return self._slot((self._start + index) % self.capacity)
+
+    def __repr__(self):
+        return repr(list(self))
@@ -0,0 +1,146 @@
+# metrics.py
+import os
+import math
+import threading
+from bisect import bisect_left
+
+# METRICS_ENABLED=0 turns every observe/inc into a no-op
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+# seconds; tick phases and routes are mostly well under a second
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _fmt(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> value
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for values, value in items:
+            lines.append(f"{self.name}{_label_str(self.labels, values)} {_fmt(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count; label values are passed positionally, in `labels` order."""
+    kind = "counter"
+
+    def inc(self, *values, amount=1):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *values):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[values] = value
+
+    def clear(self):
+        """Forget every label set, e.g. before a collector re-sets the live ones."""
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with _sum and _count, per label set."""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *values):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            entry = self._values.get(values)
+            if entry is None:
+                # per-bucket (not yet cumulative) counts, the last one is +Inf; then sum
+                entry = self._values[values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1])) for k, v in self._values.items())
+        for values, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                running += count
+                le = f'le="{_fmt(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_label_str(self.labels, values, le)} {running}")
+            lines.append(f"{self.name}_sum{_label_str(self.labels, values)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.labels, values)} {running}")
+        return lines
+
+
+class Registry:
+    """
+    Process-wide set of metrics, rendered in the Prometheus text format.
+    Collectors run right before rendering, e.g. to refresh gauges.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def _add(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self._add(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
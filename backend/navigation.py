@@ -0,0 +1,227 @@
+import heapq
+from array import array
+import numpy as np
+
+# 8-connected moves, same as move_towards (a diagonal step costs one tick)
+MOVES = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+# Map legend: cost of entering a tile, 0 = blocked. Unlisted characters cost 1.
+DEFAULT_LEGEND = {"#": 0, ".": 1}
+
+
+class NavGrid:
+    """
+    Walkable campus map for POI navigation, built from the seed's "map"
+    layer (rows of characters, see DEFAULT_LEGEND).
+
+    For every target the grid computes a distance field once (BFS, or
+    Dijkstra when some tiles cost more than 1) and turns it into a
+    next-tile table, so an agent's step is a single lookup. Tables are
+    cached per target and dropped whenever a tile changes.
+
+    Diagonal steps may not cut a blocked corner. Among equally short
+    moves the straight-line one wins, so on an open map agents walk
+    exactly like Agent.move_towards.
+    """
+
+    def __init__(self, width, height, cost=None, legend=None):
+        self.width = width
+        self.height = height
+        self.legend = dict(legend or DEFAULT_LEGEND)
+        # row-major tile costs: index = y * width + x
+        self.cost = np.ones(width * height, dtype=np.int32) if cost is None else np.asarray(cost, dtype=np.int32)
+        self.version = 0
+        self._fields = {}  # (tx, ty) -> (numpy table, array table)
+        self._masks = None
+        self._neighbors = None
+
+    @classmethod
+    def from_seed(cls, spec):
+        """{"rows": ["..#..", ...], "legend": {"~": 3}} -> NavGrid."""
+        rows = spec["rows"]
+        legend = {**DEFAULT_LEGEND, **spec.get("legend", {})}
+        width = max((len(r) for r in rows), default=0)
+        height = len(rows)
+
+        cost = np.ones(width * height, dtype=np.int32)
+        for y, row in enumerate(rows):
+            for x, ch in enumerate(row):
+                cost[y * width + x] = int(legend.get(ch, 1))
+        return cls(width, height, cost, legend)
+
+    @property
+    def bounds(self):
+        return (0, 0, self.width - 1, self.height - 1)
+
+    # -------------------------------------------------------------
+    # TILES
+    # -------------------------------------------------------------
+    def in_bounds(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def passable(self, x, y):
+        return self.in_bounds(x, y) and self.cost[y * self.width + x] > 0
+
+    def can_step(self, x, y, nx, ny):
+        """
+        Move from (x, y) to (nx, ny) allowed? Diagonals need both side
+        tiles open; agents off the map may step onto any open tile.
+        """
+        if not self.passable(nx, ny):
+            return False
+        if nx == x or ny == y or not self.in_bounds(x, y):
+            return True
+        return self.passable(nx, y) and self.passable(x, ny)
+
+    def set_cost(self, x, y, cost):
+        """Change one tile (0 = wall); cached fields are rebuilt on next use."""
+        self.cost[y * self.width + x] = int(cost)
+        self._fields.clear()
+        self._masks = None
+        self._neighbors = None
+        self.version += 1
+
+    def rows(self):
+        """The map as seed rows (costs written back through the legend)."""
+        by_cost = {}
+        for ch, c in self.legend.items():
+            by_cost.setdefault(int(c), ch)
+        grid = self.cost.reshape(self.height, self.width)
+        return ["".join(by_cost.get(int(c), "?") for c in row) for row in grid]
+
+    # -------------------------------------------------------------
+    # DISTANCE FIELDS
+    # -------------------------------------------------------------
+    def _step_masks(self):
+        """For each move, which tiles it can be taken from (bounds, walls, corners)."""
+        if self._masks is None:
+            self._masks = self._build_step_masks()
+        return self._masks
+
+    def _build_step_masks(self):
+        h, w = self.height, self.width
+        open_ = np.zeros((h + 2, w + 2), dtype=bool)
+        open_[1:-1, 1:-1] = self.cost.reshape(h, w) > 0
+
+        masks = []
+        for dx, dy in MOVES:
+            ok = open_[1 + dy:1 + dy + h, 1 + dx:1 + dx + w].copy()
+            if dx and dy:
+                ok &= open_[1:-1, 1 + dx:1 + dx + w] & open_[1 + dy:1 + dy + h, 1:-1]
+            masks.append(ok.ravel())
+        return masks
+
+    def _neighbor_lists(self):
+        # moves are symmetric, so "tiles that can step into i" = "tiles i can step to"
+        if self._neighbors is None:
+            w = self.width
+            offsets = [dy * w + dx for dx, dy in MOVES]
+            nbrs = [[] for _ in range(self.width * self.height)]
+            for off, mask in zip(offsets, self._step_masks()):
+                for i in np.flatnonzero(mask).tolist():
+                    nbrs[i].append(i + off)
+            self._neighbors = nbrs
+        return self._neighbors
+
+    def distances(self, tx, ty):
+        """Cost to reach (tx, ty) from every tile; inf where unreachable."""
+        if not self.passable(tx, ty):
+            return np.full(self.width * self.height, np.inf)
+        start = ty * self.width + tx
+        if self.cost.max() <= 1:
+            return self._bfs(start)
+        return self._dijkstra(start)
+
+    def _dijkstra(self, start):
+        """Weighted distances; stepping from j into i costs cost[i]."""
+        nbrs = self._neighbor_lists()
+        cost = self.cost.tolist()
+        dist = [float("inf")] * len(cost)
+        dist[start] = 0
+        heap = [(0, start)]
+        while heap:
+            d, i = heapq.heappop(heap)
+            if d > dist[i]:
+                continue
+            d += cost[i]
+            for j in nbrs[i]:
+                if cost[j] > 0 and d < dist[j]:
+                    dist[j] = d
+                    heapq.heappush(heap, (d, j))
+        return np.array(dist)
+
+    def _bfs(self, start):
+        """Unit-cost distances, one whole frontier per numpy pass."""
+        w = self.width
+        dist = np.full(self.width * self.height, np.inf)
+        dist[start] = 0
+        moves = [(dy * w + dx, mask) for (dx, dy), mask in zip(MOVES, self._step_masks())]
+
+        frontier = np.array([start])
+        d = 0
+        while frontier.size:
+            d += 1
+            # masks only allow steps onto open tiles, and steps are symmetric
+            reached = np.concatenate([frontier[mask[frontier]] + off for off, mask in moves])
+            reached = np.unique(reached[np.isinf(dist[reached])])
+            dist[reached] = d
+            frontier = reached
+        return dist
+
+    def _build_table(self, tx, ty):
+        h, w = self.height, self.width
+        dist = self.distances(tx, ty)
+        # moving into a tile costs its distance plus its own entry cost
+        key = np.full((h + 2, w + 2), np.inf)
+        key[1:-1, 1:-1] = (dist + np.where(self.cost > 0, self.cost, 0)).reshape(h, w)
+
+        idx = np.arange(h * w)
+        xs, ys = idx % w, idx // w
+        greedy = (np.sign(tx - xs) + 1) * 3 + (np.sign(ty - ys) + 1)  # index into the dx/dy grid
+        move_of = {(dx + 1) * 3 + (dy + 1): k for k, (dx, dy) in enumerate(MOVES)}
+
+        keys = np.full((len(MOVES), h * w), np.inf)
+        for k, ((dx, dy), mask) in enumerate(zip(MOVES, self._step_masks())):
+            keys[k] = np.where(mask, key[1 + dy:1 + dy + h, 1 + dx:1 + dx + w].ravel(), np.inf)
+
+        best = keys.argmin(axis=0)
+        greedy_k = np.array([move_of.get(g, 0) for g in range(9)])[greedy]
+        use_greedy = (greedy != 4) & (keys[greedy_k, idx] == keys[best, idx])
+        choice = np.where(use_greedy, greedy_k, best)
+
+        offsets = np.array([dy * w + dx for dx, dy in MOVES])
+        table = idx + offsets[choice]
+        # stay put at the target and wherever the target can't be reached
+        stay = ~np.isfinite(keys[choice, idx]) | (idx == ty * w + tx)
+        table[stay] = idx[stay]
+        return table.astype(np.int32)
+
+    def table(self, tx, ty):
+        """Next-tile table for target (tx, ty): numpy int32, tile index -> tile index."""
+        return self._cached(tx, ty)[0]
+
+    def _cached(self, tx, ty):
+        entry = self._fields.get((tx, ty))
+        if entry is None:
+            table = self._build_table(tx, ty)
+            entry = self._fields[(tx, ty)] = (table, array("i", table.tobytes()))
+        return entry
+
+    def precompute(self, targets):
+        for tx, ty in targets:
+            self._cached(tx, ty)
+
+    def next_step(self, x, y, tx, ty):
+        """
+        Best neighbouring tile from (x, y) towards (tx, ty). Agents off
+        the map head straight for the target, waiting if that would put
+        them on a blocked tile.
+        """
+        if not self.in_bounds(x, y):
+            nx = x + (tx > x) - (tx < x)
+            ny = y + (ty > y) - (ty < y)
+            if self.in_bounds(nx, ny) and not self.passable(nx, ny):
+                return x, y
+            return nx, ny
+        i = self._cached(tx, ty)[1][y * self.width + x]
+        return i % self.width, i // self.width
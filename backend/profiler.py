@@ -0,0 +1,124 @@
+# profiler.py
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+# step() frames of these files mark a thread as "inside a tick"
+_STEP_FILES = ("world.py", "bulk_world.py")
+
+
+def _frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class TickProfiler:
+    """
+    Opt-in sampling profiler for the next N ticks.
+
+    While armed, a background thread reads every other thread's Python
+    stack (sys._current_frames) each `interval` seconds and keeps the
+    stacks that are inside World.step / BulkWorld.step. The world calls
+    tick() after each step; after N ticks the samples are written as
+    collapsed stacks ("a;b;c count", for flamegraph.pl or speedscope)
+    and summarized. When not armed it costs one attribute check a tick.
+    """
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.active = False
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, ticks, interval=0.005):
+        with self._lock:
+            if self.active:
+                return False
+            self._remaining = max(1, int(ticks))
+            self._ticks = 0
+            self._interval = max(0.001, float(interval))
+            self._stacks = Counter()
+            self._samples = 0
+            self._started = time.time()
+            self._stop.clear()
+            self.active = True
+            self._thread = threading.Thread(target=self._run, name="tick-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def tick(self):
+        if not self.active:
+            return
+        with self._lock:
+            self._ticks += 1
+            self._remaining -= 1
+            done = self._remaining <= 0
+        if done:
+            self.stop()
+
+    def stop(self):
+        with self._lock:
+            if not self.active:
+                return self.last_result
+            self.active = False
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.last_result = self._dump()
+        return self.last_result
+
+    def status(self):
+        if self.active:
+            return {"active": True, "ticks_left": self._remaining, "samples": self._samples}
+        return {"active": False, "last": self.last_result}
+
+    # -------------------------------------------------------------
+    # SAMPLING
+    # -------------------------------------------------------------
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self._interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                in_step = False
+                while frame is not None:
+                    code = frame.f_code
+                    if code.co_filename == __file__:
+                        in_step = False  # our own tick()/stop() at the end of a step
+                        break
+                    if code.co_name == "step" and code.co_filename.endswith(_STEP_FILES):
+                        in_step = True
+                    stack.append(_frame_name(code))
+                    frame = frame.f_back
+                if in_step:
+                    self._stacks[";".join(reversed(stack))] += 1
+                    self._samples += 1
+
+    def _dump(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = os.path.join(self.out_dir, f"ticks-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started))}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        # self time = leaf frame, total time = anywhere on the stack
+        own, total = Counter(), Counter()
+        for stack, count in self._stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for name in set(frames):
+                total[name] += count
+        n = max(1, self._samples)
+        return {
+            "file": path,
+            "ticks": self._ticks,
+            "samples": self._samples,
+            "interval_ms": self._interval * 1000,
+            "top_self": [{"frame": k, "share": round(v / n, 4)} for k, v in own.most_common(15)],
+            "top_total": [{"frame": k, "share": round(v / n, 4)} for k, v in total.most_common(15)],
+        }
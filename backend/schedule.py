@@ -0,0 +1,107 @@
+from agent import DEFAULT_SCHEDULES
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def _hour_table(spec):
+    """{"9": ["library"], ...} -> {9: ["library"], ...}, hours checked."""
+    table = {}
+    for hour, goals in (spec or {}).items():
+        h = int(hour)
+        if not 0 <= h < 24:
+            raise ValueError(f"schedule hour {hour!r} is not in 0..23")
+        table[h] = list(goals or [])
+    return table
+
+
+def _weekday(day):
+    if isinstance(day, int) or str(day).isdigit():
+        d = int(day)
+        if not 0 <= d < 7:
+            raise ValueError(f"weekday {day!r} is not in 0..6")
+        return d
+    name = str(day).lower()[:3]
+    if name not in WEEKDAYS:
+        raise ValueError(f"unknown weekday {day!r}")
+    return WEEKDAYS.index(name)
+
+
+class ScheduleEngine:
+    """
+    Daily schedules shared by every agent of a type, as an event queue.
+
+    `schedules` are per-type tables (hour -> goals) over DEFAULT_SCHEDULES,
+    `calendar` replaces a type's table on given weekdays
+    ({"student": {"sat": {...}, "sun": {}}}) and agents may override
+    single hours. Tick t is hour t % 24 of weekday (t // 24) % 7.
+
+    assign() groups agents with the same type and overrides and compiles,
+    for every (weekday, hour), the (group, goals) events that fire then,
+    so a tick only touches agents whose schedule has an entry that hour.
+    """
+
+    def __init__(self, schedules=None, calendar=None):
+        self.schedules = {t: _hour_table(table) for t, table in DEFAULT_SCHEDULES.items()}
+        for t, table in (schedules or {}).items():
+            self.schedules[t] = _hour_table(table)
+        self.calendar = {
+            t: {_weekday(day): _hour_table(table) for day, table in days.items()}
+            for t, days in (calendar or {}).items()
+        }
+        self.groups = []  # member (agent position) lists
+        self._events = [[[] for _ in range(24)] for _ in range(7)]
+
+    def spec(self):
+        """The seed form ("schedules", "calendar") of this engine, for checkpoints."""
+        return {
+            "schedules": self.schedules,
+            "calendar": {t: {WEEKDAYS[d]: table for d, table in days.items()} for t, days in self.calendar.items()}
+        }
+
+    def table(self, type_name, weekday=0, overrides=None):
+        """Effective hour -> goals table for one agent on a weekday."""
+        table = self.calendar.get(type_name, {}).get(weekday)
+        if table is None:
+            table = self.schedules.get(type_name, {})
+        if overrides:
+            table = {**table, **_hour_table(overrides)}
+        return table
+
+    # -------------------------------------------------------------
+    # EVENTS
+    # -------------------------------------------------------------
+    def assign(self, types, overrides):
+        """
+        Group members (agents by list position) by type and per-agent
+        overrides, then compile the event queue for those groups.
+        """
+        keys = {}
+        # overrides from a seed template are one shared dict: normalize it once
+        # (keeping a reference, so its id() stays unique during the loop)
+        normalized = {}
+        self.groups = []
+        group_specs = []
+        for i, (type_name, ov) in enumerate(zip(types, overrides)):
+            if ov:
+                norm = normalized.get(id(ov))
+                if norm is None:
+                    norm = normalized[id(ov)] = (tuple(sorted((int(h), tuple(g or [])) for h, g in ov.items())), ov)
+                key = (type_name, norm[0])
+            else:
+                key = (type_name, ())
+            g = keys.get(key)
+            if g is None:
+                g = keys[key] = len(self.groups)
+                self.groups.append([])
+                group_specs.append((type_name, ov))
+            self.groups[g].append(i)
+
+        self._events = [[[] for _ in range(24)] for _ in range(7)]
+        for g, (type_name, ov) in enumerate(group_specs):
+            for day in range(7):
+                for hour, goals in self.table(type_name, day, ov).items():
+                    self._events[day][hour].append((g, goals))
+
+    def events(self, tick):
+        """(group, goals) pairs firing at this tick."""
+        return self._events[(tick // 24) % 7][tick % 24]
@@ -0,0 +1,168 @@
+# seed_io.py
+import gc
+import gzip
+import json
+from itertools import accumulate
+from contextlib import contextmanager
+
+# Seeds whose name ends in one of these are JSON Lines (optionally .gz):
+# the first line is the header (everything but the agents), then one agent
+# object per line, so agents are built while the file is read instead of
+# after the whole file is parsed.
+LINE_SUFFIXES = (".jsonl", ".ndjson")
+
+# per-agent fields a template can provide (see agent_records)
+TEMPLATE_FIELDS = ("traits", "goals", "schedule")
+
+
+def is_line_seed(path):
+    name = str(path).lower()
+    if name.endswith(".gz"):
+        name = name[:-3]
+    return name.endswith(LINE_SUFFIXES)
+
+
+def _open(path, mode="rt"):
+    if str(path).lower().endswith(".gz"):
+        return gzip.open(path, mode, compresslevel=6, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_seed(path):
+    """
+    (header, agent records) of a seed file. The header holds pois,
+    poi_capacity, map, grid, schedules, calendar and templates; the records
+    are raw agent dicts, a list for a .json seed and a generator reading the
+    file for a .jsonl one. Pass both to agent_records().
+    """
+    if not is_line_seed(path):
+        with _open(path) as f:
+            data = json.load(f)
+        return data, data.get("agents", [])
+
+    f = _open(path)
+    first = f.readline()
+    if not first.strip():
+        f.close()
+        raise ValueError(f"{path}: empty seed")
+    header = json.loads(first)
+    if not isinstance(header, dict) or "id" in header:
+        f.close()
+        raise ValueError(f"{path}: the first line must be the seed header, not an agent")
+
+    def records():
+        with f:
+            for n, line in enumerate(f, start=2):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{n}: {e}") from None
+
+    return header, records()
+
+
+def agent_records(header, records):
+    """
+    Agent dicts with template fields filled in. A seed's "templates" maps a
+    name to default traits/goals/schedule; an agent uses the template named
+    by its "template" key, else the one named like its type, and its own
+    fields win. Template values are shared, not copied, between the agents
+    that use them, so a million students carry one traits dict.
+    """
+    templates = header.get("templates") or {}
+    for a in records:
+        t = templates.get(a.get("template", a["type"]))
+        if t:
+            for field in TEMPLATE_FIELDS:
+                if field not in a and field in t:
+                    a[field] = t[field]
+        yield a
+
+
+@contextmanager
+def gc_paused():
+    """
+    Cyclic GC off while a loader builds millions of long-lived objects:
+    otherwise every few hundred allocations trigger a collection that walks
+    the growing heap (nearly half of a large load).
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def write_seed(path, header, agents):
+    """Write a seed: JSON Lines for .jsonl/.ndjson names (optionally .gz), else one JSON object."""
+    with _open(path, "wt") as f:
+        if is_line_seed(path):
+            f.write(json.dumps(header, separators=(",", ":")) + "\n")
+            for a in agents:
+                f.write(json.dumps(a, separators=(",", ":")) + "\n")
+        else:
+            json.dump({**header, "agents": list(agents)}, f)
+
+
+# -------------------------------------------------------------
+# SYNTHETIC SEEDS (tools/gen_seed.py, the benchmarks)
+# -------------------------------------------------------------
+# POI names the default schedules refer to come first
+SCHEDULE_POIS = ["hostel", "library", "canteen", "lab", "admin", "ground", "office"]
+
+DEFAULT_MIX = "student=6,professor=2,vendor=1"
+
+TYPE_TEMPLATES = {
+    "student": {"traits": {"personality": "curious"}},
+    "professor": {"traits": {"personality": "methodical"}},
+    "vendor": {"traits": {"personality": "chatty"}},
+}
+
+
+def poi_names(n_pois):
+    """The schedule POIs, then poi7, poi8, ... up to n_pois names."""
+    return (SCHEDULE_POIS + [f"poi{i}" for i in range(len(SCHEDULE_POIS), n_pois)])[:n_pois]
+
+
+def parse_mix(spec):
+    """"student=6,professor=2" -> (["student", "professor"], [6.0, 2.0])."""
+    names, weights = [], []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        names.append(name.strip())
+        weights.append(float(weight or 1))
+    if not names or min(weights) < 0 or sum(weights) <= 0:
+        raise ValueError(f"bad type mix {spec!r}")
+    return names, weights
+
+
+def synthetic_header(n_pois, width, height, rng, poi_capacity=None, types=()):
+    """Seed header for an open width x height grid with n_pois POIs on distinct random tiles."""
+    if n_pois > width * height:
+        raise ValueError(f"{n_pois} POIs do not fit on a {width}x{height} grid")
+    tiles = rng.sample(range(width * height), n_pois)
+    header = {
+        "grid": [width, height],
+        "pois": {name: [t % width, t // width] for name, t in zip(poi_names(n_pois), tiles)},
+        "templates": {t: TYPE_TEMPLATES[t] for t in types if t in TYPE_TEMPLATES},
+    }
+    if poi_capacity is not None:
+        header["poi_capacity"] = poi_capacity
+    return header
+
+
+def synthetic_agents(n_agents, types, weights, pois, width, height, rng):
+    """Agents of the weighted type mix scattered uniformly, one goal each; generated lazily in id order."""
+    cum = list(accumulate(weights))
+    for i in range(n_agents):
+        yield {
+            "id": f"a{i}",
+            "type": rng.choices(types, cum_weights=cum)[0],
+            "x": rng.randrange(width),
+            "y": rng.randrange(height),
+            "goals": [rng.choice(pois)],
+        }
@@ -0,0 +1,284 @@
+# sharded_world.py
+import os
+import time
+import signal
+import weakref
+import traceback
+from multiprocessing import Pipe, shared_memory
+
+import numpy as np
+
+from bulk_world import BulkWorld, NO_GOAL
+from world import INTERACTION_COOLDOWN_TICKS
+
+# one shard per core unless told otherwise
+DEFAULT_SHARDS = os.cpu_count() or 1
+
+# seconds a shard gets to exit after close() before it is killed
+SHARD_EXIT_GRACE = 5.0
+
+_NO_AGENTS = np.empty(0, dtype=np.int64)
+
+
+def shard_grid(shards):
+    """(columns, rows) of tiles for `shards` shards: the squarest factorization."""
+    rows = max(r for r in range(1, int(shards ** 0.5) + 1) if shards % r == 0)
+    return shards // rows, rows
+
+
+def _release(blocks):
+    for shm in blocks:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # an array still points into it; the mapping goes with that array
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+    blocks.clear()
+
+
+def _fork_shard(world, shard, own):
+    """
+    Fork one shard process; returns (pid, connection). A bare fork rather
+    than multiprocessing.Process, whose child closes sys.stdin: that hangs
+    when another thread is blocked reading it (sim_jobs watches stdin).
+    """
+    parent, child = Pipe()
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            parent.close()
+            _shard_main(world, shard, own, child)
+            code = 0
+        finally:
+            os._exit(code)
+    child.close()
+    return pid, parent
+
+
+def _stop(workers):
+    for pid, conn in workers:
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+    deadline = time.monotonic() + SHARD_EXIT_GRACE
+    for pid, conn in workers:
+        while not os.waitpid(pid, os.WNOHANG)[0]:
+            if time.monotonic() > deadline:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                break
+            time.sleep(0.01)
+        conn.close()
+    workers.clear()
+
+
+def _shutdown(workers, blocks):
+    _stop(workers)
+    _release(blocks)
+
+
+class ShardedWorld(BulkWorld):
+    """
+    BulkWorld split over worker processes by position.
+
+    The grid (World.bounds) is cut into one tile per shard; each shard
+    process moves, pairs up and counts the agents standing on its tile.
+    Position, goal, cooldown and random-step columns live in shared
+    memory, so nothing per agent is pickled: the coordinator runs the
+    global parts of a tick on the shared columns (schedule, vendors, the
+    crowd redirects, which go in agent order, and the random-walk draws,
+    which keep the rng stream of the other engines), then each shard
+    moves its agents and reports the ones that crossed onto another
+    tile, the coordinator hands them over, and each shard resolves
+    interactions and POI occupancy on its tile. Agents only meet on a
+    shared tile and a tile has one owner, so no halo is needed and the
+    summed occupancy and the pairs are exactly BulkWorld's: the same
+    seed and rng_seed give the same stats as the other engines.
+
+    Shards are forked copies of this object (the static tables come
+    along for free) started on the first step after a load, so this
+    needs os.fork (Linux, macOS). With shards=1 every
+    phase runs in-process. close() stops the shards and frees the
+    shared memory.
+    """
+
+    def __init__(self, seed_file, stats_retention=None, stats_spill_dir=None, rng_seed=None, event_log_dir=None,
+                 event_log_retention=None, shards=None):
+        self.shards = max(1, int(shards or DEFAULT_SHARDS))
+        self.grid = shard_grid(self.shards)
+        self._workers = []  # (pid, connection) per shard, while running
+        self._blocks = []   # SharedMemory behind the current columns
+        self._incoming = None
+        self._finalizer = weakref.finalize(self, _shutdown, self._workers, self._blocks)
+        super().__init__(seed_file, stats_retention, stats_spill_dir, rng_seed, event_log_dir, event_log_retention)
+
+    @property
+    def parallel(self):
+        return self.shards > 1 and bool(self._blocks)
+
+    # -------------------------------------------------------------
+    # SHARED COLUMNS
+    # -------------------------------------------------------------
+    def _shared(self, shape, dtype, fill):
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self._blocks.append(shm)
+        a = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        a.fill(fill)
+        return a
+
+    def _reset_columns(self, n):
+        self._stop_shards()
+        old = list(self._blocks)
+        self._blocks.clear()
+        if self.shards == 1:
+            super()._reset_columns(n)
+        else:
+            self.x = self._shared(n, np.int64, 0)
+            self.y = self._shared(n, np.int64, 0)
+            self.type = np.zeros(n, dtype=np.int32)  # fixed after a load; shards get a copy
+            self.goal = self._shared(n, np.int32, NO_GOAL)
+            self.last_interaction = self._shared(n, np.int64, -999)
+            self._steps = self._shared((n, 2), np.int8, 0)
+            self._agent_views = None
+        _release(old)
+
+    def _shard_of(self, x, y):
+        """Owning shard of each (x, y): the tile it falls in, edge tiles taking whatever lies outside the bounds."""
+        min_x, min_y, max_x, max_y = self.bounds
+        cols, rows = self.grid
+        cx = np.clip((x - min_x) * cols // (max_x - min_x + 1), 0, cols - 1)
+        cy = np.clip((y - min_y) * rows // (max_y - min_y + 1), 0, rows - 1)
+        return cy * cols + cx
+
+    # -------------------------------------------------------------
+    # SHARD PROCESSES
+    # -------------------------------------------------------------
+    def _start_shards(self):
+        # split here: a shard that starts late must not see moves the first ones already made
+        owner = self._shard_of(self.x, self.y)
+        for shard in range(self.shards):
+            self._workers.append(_fork_shard(self, shard, np.flatnonzero(owner == shard)))
+
+    def _stop_shards(self):
+        _stop(self._workers)
+        self._incoming = None
+
+    def _ask(self, messages):
+        """Send one message per shard and gather the replies, in shard order."""
+        if not self._workers:
+            self._start_shards()
+        for (_, conn), msg in zip(self._workers, messages):
+            conn.send(msg)
+        replies = []
+        for shard, (_, conn) in enumerate(self._workers):
+            try:
+                reply = conn.recv()
+            except EOFError:
+                self._stop_shards()
+                raise RuntimeError(f"shard {shard} exited") from None
+            if isinstance(reply, str):
+                self._stop_shards()
+                raise RuntimeError(f"shard {shard} failed:\n{reply}")
+            replies.append(reply)
+        return replies
+
+    def set_tile(self, x, y, cost):
+        """Change one map tile; the running shards have the old map, so they are forked again on the next step."""
+        super().set_tile(x, y, cost)
+        self._stop_shards()
+
+    def close(self):
+        """Stop the shard processes and free the shared columns (they become private copies)."""
+        self._stop_shards()
+        if self._blocks:
+            self.x, self.y = np.array(self.x), np.array(self.y)
+            self.goal, self.last_interaction = np.array(self.goal), np.array(self.last_interaction)
+            self._steps = np.array(self._steps)
+            _release(self._blocks)
+        if self.events is not None:
+            self.events.close()
+
+    # -------------------------------------------------------------
+    # STEP PHASES (see BulkWorld.step)
+    # -------------------------------------------------------------
+    def _move(self, seeking, walkers, steps):
+        if not self.parallel:
+            return super()._move(seeking, walkers, steps)
+        # shards pick their own seekers/walkers off the shared goal column
+        self._steps[walkers] = steps
+        self._hand_over(moving=True)
+
+    def _hand_over(self, moving):
+        """Shards move (if `moving`) and report agents now on another tile; queue them for their new owners."""
+        replies = self._ask([("move", self.tick_count, moving)] * self.shards)
+        incoming = [[] for _ in range(self.shards)]
+        for leaving, dest in replies:
+            for shard in np.unique(dest):
+                incoming[shard].append(leaving[dest == shard])
+        self._incoming = [np.concatenate(parts) if parts else _NO_AGENTS for parts in incoming]
+
+    def _meet(self):
+        if not self.parallel:
+            return super()._meet()
+        if self._incoming is None:
+            self._hand_over(moving=False)  # no_movement: vendors may still have jumped
+        incoming, self._incoming = self._incoming, None
+        replies = self._ask([("meet", self.tick_count, inc) for inc in incoming])
+
+        pairs = np.concatenate([p for p, _ in replies])
+        occ = np.zeros(len(self.pois), dtype=np.int64)
+        for _, shard_occ in replies:
+            occ += shard_occ
+        # BulkWorld order: by tile, then agent
+        first = pairs[:, 0]
+        pairs = pairs[np.lexsort((first, (self.x[first] << 32) + self.y[first]))]
+        return pairs, occ
+
+
+def _shard_main(world, shard, own, conn):
+    """
+    One shard process. `world` is the coordinator forked at start: its
+    columns are the shared ones and its tables are a private copy.
+    """
+    for _, other in world._workers:
+        other.close()  # earlier shards' pipe ends, copied by the fork
+    try:
+        n_pois = len(world.pois)
+        while True:
+            msg = conn.recv()
+            if msg is None:
+                break
+            cmd, world.tick_count = msg[0], msg[1]
+
+            if cmd == "move":
+                if msg[2]:
+                    movers = own[~world._is_vendor[own]]
+                    goal = world.goal[movers]
+                    valid = (goal >= 0) & (goal < n_pois)
+                    world._seek(movers[valid])
+                    walkers = movers[~valid]
+                    if walkers.size:
+                        world._walk(walkers, world._steps[walkers].astype(np.int64))
+                dest = world._shard_of(world.x[own], world.y[own])
+                leaving = dest != shard
+                conn.send((own[leaving], dest[leaving]))
+                own = own[~leaving]
+
+            elif cmd == "meet":
+                if msg[2].size:
+                    own = np.concatenate((own, msg[2]))  # order does not matter, _pair_up sorts
+                ready = own[world.tick_count - world.last_interaction[own] >= INTERACTION_COOLDOWN_TICKS]
+                pairs = world._pair_up(ready)
+                conn.send((pairs, world._occupancy((world.x[own] << 32) + world.y[own])))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    except Exception:
+        conn.send(traceback.format_exc())
+    finally:
+        conn.close()
@@ -0,0 +1,301 @@
+# sim_jobs.py
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# jobs that do not stop within this long after cancel() are killed
+CANCEL_GRACE = 10.0  # seconds
+# a job process reports its tick count at most this often
+PROGRESS_EVERY = 0.2  # seconds
+
+FINISHED = ("done", "failed", "cancelled")
+
+
+class UnknownJob(KeyError):
+    pass
+
+
+# -------------------------------------------------------------
+# JOB PROCESS (python sim_jobs.py '<spec json>')
+# -------------------------------------------------------------
+def run_job(spec, cancel, report):
+    """
+    Build the world from the seed (object, bulk or sharded engine) or from a
+    checkpoint of a live world, step it until `ticks` or `cancel` is set,
+    calling report(ticks_done) now and then, and write the stats rows of
+    this run to spec["out_csv"].
+    """
+    from world import World
+    from bulk_world import BulkWorld
+    from sharded_world import ShardedWorld
+
+    if spec.get("checkpoint"):
+        world = World(None, spec["stats_retention"], spec["spill_dir"])
+        world.load_checkpoint(spec["checkpoint"])
+        if spec.get("rng_seed") is not None:
+            world.set_rng_seed(spec["rng_seed"])
+    elif spec["engine"] == "sharded":
+        world = ShardedWorld(spec["seed_file"], spec["stats_retention"], spec["spill_dir"],
+                             rng_seed=spec.get("rng_seed"), shards=spec.get("shards"))
+    else:
+        engine = BulkWorld if spec["engine"] == "bulk" else World
+        world = engine(spec["seed_file"], spec["stats_retention"], spec["spill_dir"], rng_seed=spec.get("rng_seed"))
+    # rows up to here are the live world's history, not part of this run
+    history_until = world.stats.last_tick
+
+    done = 0
+    last_report = time.monotonic()
+    try:
+        for _ in range(spec["ticks"]):
+            if cancel.is_set():
+                break
+            world.step()
+            done += 1
+            if time.monotonic() - last_report >= PROGRESS_EVERY:
+                report(done)
+                last_report = time.monotonic()
+    finally:
+        if isinstance(world, ShardedWorld):
+            world.close()
+    report(done)
+
+    tmp = spec["out_csv"] + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["tick", "hour"] + world.stats.poi_names)
+        writer.writerows(world.stats.iter_rows(since_tick=history_until))
+    os.replace(tmp, spec["out_csv"])
+
+
+def _job_main(spec_json):
+    cancel = threading.Event()
+
+    def watch_stdin():
+        # "cancel" (or the server going away) on stdin stops the run
+        for line in sys.stdin:
+            if line.strip() == "cancel":
+                break
+        cancel.set()
+
+    threading.Thread(target=watch_stdin, daemon=True).start()
+    run_job(json.loads(spec_json), cancel, lambda n: print(f"progress {n}", flush=True))
+
+
+class SimJob:
+    """One batch run: its parameters, state, progress and result files under `root`."""
+
+    def __init__(self, job_id, root, spec, params):
+        self.id = job_id
+        self.root = root
+        self.spec = spec
+        self.params = params
+        self.ticks = spec["ticks"]
+        self.state = "queued"
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.ticks_done = 0
+        self.process = None
+        self.cancel_requested = False
+        self.done_event = threading.Event()
+
+    @property
+    def result_csv(self):
+        return self.spec["out_csv"]
+
+    def info(self):
+        done = self.ticks_done
+        out = {
+            "id": self.id,
+            "state": self.state,
+            "ticks": self.ticks,
+            "ticks_done": done,
+            "progress": round(done / self.ticks, 4) if self.ticks else 1.0,
+            "created": int(self.created),
+            **self.params,
+        }
+        if self.started is not None:
+            elapsed = (self.finished or time.time()) - self.started
+            out["elapsed_s"] = round(elapsed, 3)
+            if done and elapsed > 0:
+                rate = done / elapsed
+                out["ticks_per_second"] = round(rate, 1)
+                if self.state == "running":
+                    out["eta_s"] = round((self.ticks - done) / rate, 1)
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class JobQueue:
+    """
+    Background batch runs on a pool of `workers` job processes.
+
+    Every job runs in its own Python process, so a long study neither
+    holds the server's GIL nor touches a live world: it starts from a
+    seed file or from a checkpoint taken when it was submitted. The
+    process reports progress on stdout and stops after the current tick
+    when cancel() writes "cancel" to its stdin; the stats of the run
+    (also of a cancelled one, up to where it stopped) end up in one CSV
+    per job. The last `history` finished
+    jobs are kept; older ones are deleted with their files.
+    """
+
+    def __init__(self, root, workers=2, history=100):
+        self.root = root
+        self.history = history
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sim-job")
+        self._jobs = OrderedDict()  # id -> job, oldest first
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def new_job(self):
+        """An id and directory for a run about to be submitted (e.g. to save a start checkpoint in)."""
+        with self._lock:
+            self._next_id += 1
+            job_id = f"{time.strftime('%Y%m%d%H%M%S')}-{self._next_id}"
+        root = os.path.join(self.root, job_id)
+        os.makedirs(root, exist_ok=True)
+        return job_id, root
+
+    def submit(self, job_id, root, spec, params):
+        """
+        Queue a run. spec: engine, ticks, stats_retention and either
+        seed_file or checkpoint, plus an optional rng_seed.
+        """
+        spec = {
+            **spec,
+            "spill_dir": os.path.join(root, "stats_spill"),
+            "out_csv": os.path.join(root, "stats.csv"),
+            "error_file": os.path.join(root, "error.txt"),
+        }
+        job = SimJob(job_id, root, spec, params)
+        with self._lock:
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job)
+        self._prune()
+        return job
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise UnknownJob(job_id)
+        return job
+
+    def list(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j.info() for j in jobs]
+
+    def counts(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        out = {}
+        for j in jobs:
+            out[j.state] = out.get(j.state, 0) + 1
+        return out
+
+    def cancel(self, job_id):
+        """Stop a queued or running job; its results so far are kept."""
+        job = self.get(job_id)
+        job.cancel_requested = True
+        self._signal_cancel(job)
+        return job
+
+    def _signal_cancel(self, job):
+        proc = job.process
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.stdin.write("cancel\n")
+            proc.stdin.flush()
+        except (OSError, ValueError):
+            return  # already exiting
+        killer = threading.Timer(CANCEL_GRACE, lambda: proc.poll() is None and proc.kill())
+        killer.daemon = True
+        killer.start()
+
+    def wait(self, job_id, timeout=None):
+        job = self.get(job_id)
+        job.done_event.wait(timeout)
+        return job
+
+    def delete(self, job_id):
+        """Cancel if needed and forget a job with its files."""
+        job = self.cancel(job_id)
+        with self._lock:
+            self._jobs.pop(job_id, None)
+        if job.state in FINISHED:
+            shutil.rmtree(job.root, ignore_errors=True)
+        return job
+
+    def _prune(self):
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.state in FINISHED]
+            drop = finished[:max(0, len(finished) - self.history)]
+            for j in drop:
+                del self._jobs[j.id]
+        for j in drop:
+            shutil.rmtree(j.root, ignore_errors=True)
+
+    # -------------------------------------------------------------
+    # WORKER
+    # -------------------------------------------------------------
+    def _run(self, job):
+        if job.cancel_requested:
+            self._finish(job, "cancelled")
+            return
+
+        job.state = "running"
+        job.started = time.time()
+        with open(job.spec["error_file"], "w", encoding="utf-8") as stderr:
+            proc = job.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), json.dumps(job.spec)],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                text=True, bufsize=1, cwd=os.path.dirname(os.path.abspath(__file__)))
+            if job.cancel_requested:  # cancelled while starting
+                self._signal_cancel(job)
+            for line in proc.stdout:
+                if line.startswith("progress "):
+                    job.ticks_done = int(line.split()[1])
+            proc.wait()
+            for pipe in (proc.stdin, proc.stdout):
+                pipe.close()
+
+        if proc.returncode == 0:
+            self._finish(job, "cancelled" if job.cancel_requested and job.ticks_done < job.ticks else "done")
+        elif job.cancel_requested:
+            self._finish(job, "cancelled")
+        else:
+            try:
+                with open(job.spec["error_file"], encoding="utf-8") as f:
+                    job.error = f.read().strip().splitlines()[-1]
+            except (OSError, IndexError):
+                job.error = f"job process exited with code {proc.returncode}"
+            self._finish(job, "failed")
+
+    def _finish(self, job, state):
+        job.state = state
+        job.finished = time.time()
+        # the start checkpoint and spilled segments are not needed any more
+        checkpoint = job.spec.get("checkpoint")
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        shutil.rmtree(job.spec["spill_dir"], ignore_errors=True)
+        if state != "failed" and os.path.exists(job.spec["error_file"]):
+            os.remove(job.spec["error_file"])
+        job.done_event.set()
+        if job.id not in self._jobs:  # deleted while running
+            shutil.rmtree(job.root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    _job_main(sys.argv[1])
@@ -0,0 +1,126 @@
+# sim_loop.py
+import queue
+import logging
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class SimulationLoop:
+    """
+    Server-owned tick loop. Advances a world on its own thread and pushes
+    one pre-serialized update per tick to every subscriber, so any number
+    of viewers cost one simulation and one serialization per tick.
+
+    `snapshot(since)` is called under `lock` right after each step with
+    the version of the previous update (None for the first) and must
+    return (version, payload string). Subscribers receive
+    (since, version, payload) tuples; a since newer than what a viewer
+    last saw means it missed an update and needs a full snapshot.
+
+    If a step raises, the loop logs it, keeps the message in `error`
+    (shown by status()) and stops until start() is called again; new
+    viewers do not restart it meanwhile.
+    """
+
+    def __init__(self, world, lock, snapshot, interval=1.8, autostart=True):
+        self.world = world
+        self.lock = lock
+        self.snapshot = snapshot
+        self.interval = interval
+        # start on the first subscriber unless someone stopped it explicitly
+        self.autostart = autostart
+
+        self._subscribers = set()
+        self._subs_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_payload = None
+        self.version = None
+        self.error = None  # last exception that stopped the loop
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def viewers(self):
+        return len(self._subscribers)
+
+    def start(self):
+        with self._subs_lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self.error = None
+            self._thread = threading.Thread(target=self._run, name="sim-loop", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.autostart = False
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+    def set_interval(self, seconds):
+        self.interval = max(0.01, float(seconds))
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "tick": self.world.tick_count,
+            "viewers": self.viewers,
+            "error": self.error
+        }
+
+    # -------------------------------------------------------------
+    # SUBSCRIBERS
+    # -------------------------------------------------------------
+    def subscribe(self, maxsize=8):
+        q = queue.Queue(maxsize=maxsize)
+        with self._subs_lock:
+            self._subscribers.add(q)
+        # an error stop waits for an explicit start()
+        if self.autostart and self.error is None and not self.running:
+            self.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self._subs_lock:
+            self._subscribers.discard(q)
+
+    def publish(self, update):
+        """Fan an update out; a slow viewer drops its oldest update instead of blocking the loop."""
+        self.last_payload = update[2]
+        with self._subs_lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait(update)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def step_and_publish(self, steps=1):
+        with self.lock:
+            for _ in range(steps):
+                self.world.step()
+            since = self.version
+            self.version, payload = self.snapshot(since)
+            self.publish((since, self.version, payload))
+        return payload
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.step_and_publish()
+            except Exception as e:
+                log.exception("simulation loop stopped at tick %s", self.world.tick_count)
+                self.error = f"{type(e).__name__}: {e}"
+                self._stop.set()
@@ -0,0 +1,137 @@
+import os
+import csv
+import bisect
+import shutil
+import tempfile
+import weakref
+from array import array
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+class StatsRecorder:
+    """
+    Columnar per-tick occupancy log: a tick array, an hour array and one
+    int array per POI (in POI order).
+
+    With `retention` set, at most ~retention ticks are kept in memory;
+    older rows are dropped, or written to CSV segments under `spill_dir`
+    so range queries and CSV export still see the full run. Each
+    recorder spills into its own temporary directory, removed by close()
+    or when the recorder is garbage collected.
+    """
+
+    def __init__(self, poi_names: Sequence[str], retention: Optional[int] = None,
+                 spill_dir: Optional[str] = None):
+        self.poi_names = list(poi_names)
+        self.retention = retention
+        self.spill_dir = spill_dir
+        self._segment_dir = None
+        self._cleanup = None
+        self.segments = []  # (first_tick, last_tick, path), oldest first
+
+        self.ticks = array("q")
+        self.hours = array("b")
+        self.counts = [array("i") for _ in self.poi_names]
+
+    @classmethod
+    def from_columns(cls, poi_names: Sequence[str], ticks: array, hours: array, counts: List[array],
+                     retention: Optional[int] = None, spill_dir: Optional[str] = None) -> "StatsRecorder":
+        """Recorder holding the given columns, trimmed/spilled to `retention` like append() would."""
+        rec = cls(poi_names, retention, spill_dir)
+        rec.ticks, rec.hours, rec.counts = ticks, hours, list(counts)
+        if retention is not None and len(ticks) > retention:
+            rec._evict(len(ticks) - retention)
+        return rec
+
+    def __len__(self):
+        return len(self.ticks)
+
+    @property
+    def last_tick(self) -> Optional[int]:
+        if self.ticks:
+            return self.ticks[-1]
+        return self.segments[-1][1] if self.segments else None
+
+    def append(self, tick: int, hour: int, occupancy: Sequence[int]):
+        self.ticks.append(tick)
+        self.hours.append(hour)
+        for col, c in zip(self.counts, occupancy):
+            col.append(c)
+
+        # evict in chunks so the arrays aren't shifted on every tick
+        if self.retention is not None and len(self.ticks) > self.retention + max(1, self.retention // 8):
+            self._evict(len(self.ticks) - self.retention)
+
+    def _evict(self, n: int):
+        if self.spill_dir:
+            if self._segment_dir is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._segment_dir = tempfile.mkdtemp(prefix="stats_", dir=self.spill_dir)
+                self._cleanup = weakref.finalize(self, shutil.rmtree, self._segment_dir, ignore_errors=True)
+            first, last = self.ticks[0], self.ticks[n - 1]
+            path = os.path.join(self._segment_dir, f"{first:010d}_{last:010d}.csv")
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(self._memory_rows(0, n))
+            self.segments.append((first, last, path))
+
+        del self.ticks[:n]
+        del self.hours[:n]
+        for col in self.counts:
+            del col[:n]
+
+    def close(self):
+        """Delete the spilled segments; rows older than the in-memory window are gone after this."""
+        if self._cleanup is not None:
+            self._cleanup()
+        self._segment_dir = self._cleanup = None
+        self.segments = []
+
+    # -------------------------------------------------------------
+    # READING
+    # -------------------------------------------------------------
+    def _memory_rows(self, start: int, stop: int) -> Iterator[List[int]]:
+        for i in range(start, stop):
+            yield [self.ticks[i], self.hours[i]] + [col[i] for col in self.counts]
+
+    def iter_rows(self, since_tick: Optional[int] = None,
+                  until_tick: Optional[int] = None) -> Iterator[List[int]]:
+        """
+        Yield [tick, hour, *poi_counts] rows, oldest first, for
+        since_tick < tick <= until_tick (either bound optional).
+        Spilled segments are streamed from disk as needed.
+        """
+        lo = float("-inf") if since_tick is None else since_tick
+        hi = float("inf") if until_tick is None else until_tick
+
+        for first, last, path in self.segments:
+            if last <= lo or first > hi:
+                continue
+            with open(path, "r", newline="", encoding="utf-8") as f:
+                for row in csv.reader(f):
+                    tick = int(row[0])
+                    if lo < tick <= hi:
+                        yield [int(v) for v in row]
+
+        start = 0 if since_tick is None else bisect.bisect_right(self.ticks, since_tick)
+        stop = len(self.ticks) if until_tick is None else bisect.bisect_right(self.ticks, until_tick)
+        yield from self._memory_rows(start, stop)
+
+    def _to_record(self, row: List[int]) -> Dict:
+        return {
+            "tick": row[0],
+            "hour": row[1],
+            "occupancy": dict(zip(self.poi_names, row[2:]))
+        }
+
+    def records(self, last_n: Optional[int] = None, since_tick: Optional[int] = None,
+                until_tick: Optional[int] = None) -> List[Dict]:
+        """
+        Stats as {"tick", "hour", "occupancy"} dicts. last_n only looks at
+        the in-memory window; since_tick/until_tick also reach spilled rows.
+        """
+        if since_tick is None and until_tick is None:
+            start = max(0, len(self.ticks) - last_n) if last_n else 0
+            return [self._to_record(r) for r in self._memory_rows(start, len(self.ticks))]
+
+        rows = [self._to_record(r) for r in self.iter_rows(since_tick, until_tick)]
+        return rows[-last_n:] if last_n else rows
@@ -0,0 +1,67 @@
+# bench_interactions.py
+# Usage: python bench_interactions.py --sizes 28 100 1000 10000 --ticks 20
+#
+# Times World.step on synthetic worlds of increasing population to show how
+# tick cost scales with the number of agents. Agents are scattered uniformly
+# over the seed grid with the seed POIs, so density grows with N.
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from world import World
+from agent import Agent
+
+AGENT_TYPES = ["student", "student", "student", "professor", "vendor"]
+
+
+def build_world(seed_file, n_agents, rng):
+    w = World(seed_file)
+    min_x, min_y, max_x, max_y = w.bounds
+    poi_names = list(w.pois.keys())
+
+    agents = []
+    for i in range(n_agents):
+        agents.append(
+            Agent(
+                f"a{i}",
+                rng.choice(AGENT_TYPES),
+                x=rng.randint(min_x, max_x),
+                y=rng.randint(min_y, max_y),
+                goals=[rng.choice(poi_names)]
+            )
+        )
+    w.agents = agents  # re-attaches schedule groups and crowd counts
+    return w
+
+
+def time_ticks(w, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        w.step()
+    return (time.perf_counter() - start) / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[28, 100, 1000, 3000, 10000])
+    parser.add_argument("--ticks", type=int, default=20, help="Timed ticks per size")
+    parser.add_argument("--seed", type=str, default="../data/world_seed.json", help="Path to seed JSON (relative to tools/)")
+    args = parser.parse_args()
+
+    seed_file = str((Path(__file__).resolve().parent / args.seed).resolve())
+    rng = random.Random(0)
+
+    print(f"{'agents':>8} {'ms/tick':>10} {'us/agent':>10}")
+    for n in args.sizes:
+        w = build_world(seed_file, n, rng)
+        per_tick = time_ticks(w, args.ticks)
+        print(f"{n:>8} {per_tick * 1000:>10.2f} {per_tick * 1e6 / n:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# bench_memory.py
+# Usage: python bench_memory.py --agents 200 --memories 500 --queries 20
+#
+# Microbenchmark for Agent.retrieve_memories. Fills agents with a realistic
+# mix of movement / interaction / LLM memories spread over the last days,
+# then times indexed retrieval against the original full-scan scorer and
+# checks that both return the same ranking.
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agent import Agent, tokenize
+
+QUERIES = [
+    "where did I meet s3",
+    "canteen lunch with friends",
+    "moved to library",
+    "professor lab office hours",
+    "met vendor near ground",
+]
+
+LLM_NOTES = [
+    "Planning to study at the library before the exam",
+    "The canteen was crowded so I went to the ground",
+    "Discussed the lab assignment with a professor",
+    "Bought tea from the vendor near the canteen",
+]
+
+
+def fill_agent(agent, n_memories, rng, now_ts):
+    for i in range(n_memories):
+        roll = rng.random()
+        if roll < 0.7:
+            agent.add_memory(f"Moved to {rng.randint(0, 24)},{rng.randint(0, 24)}", source="movement")
+        elif roll < 0.9:
+            agent.add_memory(f"Met s{rng.randint(1, 40)} at tick {i}", "interaction")
+        else:
+            agent.add_memory(rng.choice(LLM_NOTES), source="llm")
+        # spread memories over the past 3 days so recency matters
+        agent.memory[-1]["ts"] = now_ts - rng.randint(0, 3 * 24 * 3600)
+    agent._memory_index.rebuild(agent.memory)
+
+
+def full_scan(agent, query, top_n=5):
+    """The original retrieve_memories: score every memory, sort, fill with recent."""
+    query_tokens = tokenize(query)
+    if not query_tokens:
+        return agent.get_recent_memories(top_n)
+
+    now_ts = int(time.time())
+    scored = []
+    for mem in agent.memory:
+        sc = agent.score_memory_for_query(mem, query_tokens, now_ts)
+        if sc > 0:
+            scored.append((sc, mem))
+
+    scored.sort(key=lambda x: x[0], reverse=True)
+    top = [m for _, m in scored[:top_n]]
+
+    if len(top) < top_n:
+        for r in agent.get_recent_memories(top_n):
+            if r not in top:
+                top.append(r)
+                if len(top) >= top_n:
+                    break
+    return top
+
+
+def time_queries(fn, agents, queries):
+    start = time.perf_counter()
+    for a in agents:
+        for q in queries:
+            fn(a, q)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=200)
+    parser.add_argument("--memories", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=20, help="Queries per agent")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    now_ts = int(time.time())
+    agents = []
+    for i in range(args.agents):
+        a = Agent(f"s{i}", "student")
+        fill_agent(a, args.memories, rng, now_ts)
+        agents.append(a)
+    queries = [rng.choice(QUERIES) for _ in range(args.queries)]
+
+    for a in agents:
+        for q in QUERIES:
+            got = [id(m) for m in a.retrieve_memories(q)]
+            assert got == [id(m) for m in full_scan(a, q)], f"ranking mismatch for {a.id!r} / {q!r}"
+
+    total = args.agents * args.queries
+    t_scan = time_queries(full_scan, agents, queries)
+    t_index = time_queries(lambda a, q: a.retrieve_memories(q), agents, queries)
+
+    print(f"{total} queries over {args.agents} agents x {args.memories} memories")
+    print(f"  full scan : {t_scan * 1e6 / total:8.1f} us/query")
+    print(f"  indexed   : {t_index * 1e6 / total:8.1f} us/query  ({t_scan / t_index:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
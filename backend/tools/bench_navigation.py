@@ -0,0 +1,160 @@
+# bench_navigation.py
+# Usage: python bench_navigation.py --size 256 --pois 50 --agents 10000 --ticks 20
+#
+# Benchmark for obstacle-aware POI navigation. Generates a campus map with
+# rectangular buildings (walls) and, with --terrain, cheap roads on costlier
+# grass, then times:
+#   - building the per-POI distance fields / next-tile tables at seed load
+#   - ticks of World and BulkWorld on that map vs World on an open map
+#   - a naive per-agent A* step, for comparison with the table lookup
+
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from world import World
+from bulk_world import BulkWorld
+from navigation import MOVES
+from seed_io import poi_names
+
+
+def make_seed(size, n_pois, n_agents, terrain, rng):
+    grid = [["." for _ in range(size)] for _ in range(size)]
+
+    # buildings: hollow rectangles with one door each
+    for _ in range(size * size // 400):
+        w, h = rng.randint(4, 14), rng.randint(4, 14)
+        x0, y0 = rng.randint(1, size - w - 1), rng.randint(1, size - h - 1)
+        for x in range(x0, x0 + w):
+            grid[y0][x] = grid[y0 + h - 1][x] = "#"
+        for y in range(y0, y0 + h):
+            grid[y][x0] = grid[y][x0 + w - 1] = "#"
+        grid[y0 + h - 1][x0 + w // 2] = "."
+
+    if terrain:
+        for k in range(8, size, 32):
+            for i in range(size):
+                if grid[k][i] == ".":
+                    grid[k][i] = "="
+                if grid[i][k] == ".":
+                    grid[i][k] = "="
+
+    open_tiles = [(x, y) for y in range(size) for x in range(size) if grid[y][x] != "#"]
+    names = poi_names(n_pois)
+    pois = {name: list(xy) for name, xy in zip(names, rng.sample(open_tiles, n_pois))}
+
+    types = ["student"] * 6 + ["professor"] * 2 + ["vendor"]
+    agents = []
+    for i in range(n_agents):
+        x, y = rng.choice(open_tiles)
+        agents.append({"id": f"a{i}", "type": rng.choice(types), "x": x, "y": y, "goals": [rng.choice(names)]})
+
+    spec = {"rows": ["".join(r) for r in grid]}
+    if terrain:
+        spec["legend"] = {".": 3, "=": 1}
+    return {"pois": pois, "agents": agents, "map": spec}
+
+
+def astar_step(nav, x, y, tx, ty):
+    """Naive per-agent A* to the target, returning the first step (Chebyshev heuristic)."""
+    start, goal = (x, y), (tx, ty)
+    came = {start: None}
+    g = {start: 0}
+    frontier = [(max(abs(tx - x), abs(ty - y)), 0, start)]
+    while frontier:
+        _, cost, cur = heapq.heappop(frontier)
+        if cur == goal:
+            break
+        if cost > g[cur]:
+            continue
+        cx, cy = cur
+        for dx, dy in MOVES:
+            nxt = (cx + dx, cy + dy)
+            if not nav.can_step(cx, cy, *nxt):
+                continue
+            nc = cost + int(nav.cost[nxt[1] * nav.width + nxt[0]])
+            if nc < g.get(nxt, float("inf")):
+                g[nxt] = nc
+                came[nxt] = cur
+                heapq.heappush(frontier, (nc + max(abs(tx - nxt[0]), abs(ty - nxt[1])), nc, nxt))
+    if goal not in came:
+        return start
+    step = goal
+    while came[step] not in (start, None):
+        step = came[step]
+    return step
+
+
+def time_ticks(world, ticks):
+    start = time.perf_counter()
+    for _ in range(ticks):
+        world.step()
+    return (time.perf_counter() - start) / ticks * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=256)
+    parser.add_argument("--pois", type=int, default=50)
+    parser.add_argument("--agents", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--astar-samples", type=int, default=200, help="Agents timed with per-agent A*")
+    parser.add_argument("--terrain", action="store_true", help="Weighted roads/grass (Dijkstra instead of BFS)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seed = make_seed(args.size, args.pois, args.agents, args.terrain, rng)
+    open_seed = dict(seed, map={"rows": ["." * args.size] * args.size})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_path = os.path.join(tmp, "map_seed.json")
+        open_path = os.path.join(tmp, "open_seed.json")
+        with open(seed_path, "w") as f:
+            json.dump(seed, f)
+        with open(open_path, "w") as f:
+            json.dump(open_seed, f)
+
+        walls = sum(row.count("#") for row in seed["map"]["rows"])
+        print(f"{args.size}x{args.size} map, {walls} wall tiles, {args.pois} POIs, {args.agents} agents"
+              f"{', weighted terrain' if args.terrain else ''}")
+
+        start = time.perf_counter()
+        world = World(seed_path, rng_seed=args.seed)
+        load = time.perf_counter() - start
+        print(f"  World load incl. {args.pois} fields: {load:.2f} s ({load / args.pois * 1000:.1f} ms per POI)")
+
+        table_bytes = sum(t.nbytes for t, _ in world.nav._fields.values())
+        print(f"  next-tile tables: {table_bytes / 2**20:.1f} MiB")
+
+        print(f"  World tick (map):     {time_ticks(world, args.ticks):8.1f} ms")
+        print(f"  World tick (open):    {time_ticks(World(open_path, rng_seed=args.seed), args.ticks):8.1f} ms")
+        print(f"  BulkWorld tick (map): {time_ticks(BulkWorld(seed_path, rng_seed=args.seed), args.ticks):8.1f} ms")
+
+        # table lookup vs A* for the same agents and targets
+        nav = world.nav
+        sample = [a for a in world.agents if a.goals and a.goals[0] in world.pois][:args.astar_samples]
+        start = time.perf_counter()
+        for a in sample:
+            nav.next_step(a.x, a.y, *world.pois[a.goals[0]])
+        lookup = (time.perf_counter() - start) / max(1, len(sample))
+
+        start = time.perf_counter()
+        for a in sample:
+            astar_step(nav, a.x, a.y, *world.pois[a.goals[0]])
+        astar = (time.perf_counter() - start) / max(1, len(sample))
+
+        print(f"  per agent step: table {lookup * 1e6:.2f} us, A* {astar * 1e3:.2f} ms "
+              f"(~{astar * args.agents:.1f} s per tick for {args.agents} agents)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+# bench_suite.py
+# Usage: python bench_suite.py --out results.json
+#        python bench_suite.py --sizes 10 1000 --baseline baseline.json --threshold 0.2
+#
+# Headless benchmark suite for the simulation core. For every combination of
+# agent count, POI count and memory fill level it generates a synthetic seed,
+# then, in a fresh subprocess (so peak RSS is per scenario), measures:
+#   - seed load time
+#   - World.step per phase (schedule, vendor, movement, interactions, stats),
+#     for the object, bulk or sharded engine (--engine, --shards)
+#   - add_memory and retrieve_memories latency percentiles
+#   - export_stats_csv
+#   - peak RSS
+# Memories are filled for the first --fill-agents agents only, so the memory
+# fill level stays affordable at 100k agents.
+#
+# Results are written as JSON (--repeat N keeps each metric's best of N runs,
+# which steadies noisy machines). With --baseline, every metric is compared to a
+# stored run and the exit code is 1 if one got slower by more than
+# --threshold (ignoring p99/max tails and differences below a per-unit noise
+# floor), or if a baseline scenario or metric is missing or was run with a
+# different config.
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from world import World, PHASES
+from bulk_world import BulkWorld
+from sharded_world import ShardedWorld
+from seed_io import synthetic_header, synthetic_agents, parse_mix, DEFAULT_MIX
+from bench_memory import QUERIES, LLM_NOTES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# differences below these are noise, whatever the ratio
+NOISE_FLOOR = {"_ms": 0.25, "_us": 5.0, "_s": 0.05, "_mb": 5.0}
+# tails of a few dozen samples are too noisy to gate on
+NOT_COMPARED = {"p99", "max"}
+
+
+def make_seed(n_agents, n_pois, rng):
+    """Uniformly scattered agents of the default type mix on the default 25x25 grid (as gen_seed.py)."""
+    types, weights = parse_mix(DEFAULT_MIX)
+    header = synthetic_header(n_pois, 25, 25, rng, types=types)
+    return {**header, "agents": list(synthetic_agents(n_agents, types, weights, list(header["pois"]), 25, 25, rng))}
+
+
+def percentiles(samples, scale):
+    if not samples:
+        return None
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))] * scale
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99), "max": s[-1] * scale,
+            "mean": sum(s) / len(s) * scale}
+
+
+def peak_rss_mb():
+    if resource is None:
+        try:
+            import psutil
+            info = psutil.Process().memory_info()
+            return getattr(info, "peak_wset", info.rss) / 2**20
+        except ImportError:
+            return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+# -------------------------------------------------------------
+# ONE SCENARIO (runs in its own process)
+# -------------------------------------------------------------
+def fill_memories(agents, level, rng):
+    """Fill agents to `level` x MEMORY_CAP; returns add_memory latencies (s)."""
+    clock = time.perf_counter
+    now_ts = int(time.time())
+    samples = []
+    for a in agents:
+        for i in range(int(level * a.MEMORY_CAP)):
+            roll = rng.random()
+            if roll < 0.7:
+                text, source = f"Moved to {rng.randint(0, 24)},{rng.randint(0, 24)}", "movement"
+            elif roll < 0.9:
+                text, source = f"Met a{rng.randint(0, 999)} at tick {i}", "interaction"
+            else:
+                text, source = rng.choice(LLM_NOTES), "llm"
+            start = clock()
+            a.add_memory(text, source=source)
+            samples.append(clock() - start)
+            # spread over the past 3 days so recency matters
+            a.memory[-1]["ts"] = now_ts - rng.randint(0, 3 * 24 * 3600)
+        a._memory_index.rebuild(a.memory)
+    return samples
+
+
+def run_scenario(cfg):
+    rng = random.Random(cfg["seed"])
+    engine = {"object": World, "bulk": BulkWorld, "sharded": ShardedWorld}[cfg["engine"]]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_path = os.path.join(tmp, "seed.json")
+        with open(seed_path, "w") as f:
+            json.dump(make_seed(cfg["agents"], cfg["pois"], rng), f)
+
+        start = time.perf_counter()
+        if engine is ShardedWorld:
+            world = engine(seed_path, rng_seed=cfg["seed"], shards=cfg["shards"])
+        else:
+            world = engine(seed_path, rng_seed=cfg["seed"])
+        load_s = time.perf_counter() - start
+
+        result = {"load_s": load_s}
+        if engine is World:
+            filled = world.agents[:cfg["fill_agents"]]
+            add = fill_memories(filled, cfg["fill"], rng)
+            result["add_memory_us"] = percentiles(add, 1e6)
+
+        for _ in range(cfg["warmup"]):
+            world.step()
+
+        phases = {phase: [] for phase in PHASES}
+        totals = []
+        for _ in range(cfg["ticks"]):
+            start = time.perf_counter()
+            world.step()
+            totals.append(time.perf_counter() - start)
+            for phase, seconds in world.phase_times.items():
+                phases[phase].append(seconds)
+        result["tick_ms"] = {phase: percentiles(samples, 1e3) for phase, samples in phases.items()}
+        result["tick_ms"]["total"] = percentiles(totals, 1e3)
+
+        if engine is World and filled:
+            samples = []
+            for _ in range(cfg["queries"]):
+                a = rng.choice(filled)
+                q = rng.choice(QUERIES)
+                start = time.perf_counter()
+                a.retrieve_memories(q)
+                samples.append(time.perf_counter() - start)
+            result["retrieval_us"] = percentiles(samples, 1e6)
+
+        start = time.perf_counter()
+        world.export_stats_csv(os.path.join(tmp, "stats.csv"))
+        result["export_csv_ms"] = (time.perf_counter() - start) * 1e3
+        if engine is ShardedWorld:
+            world.close()
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def best_of(a, b):
+    """Element-wise minimum of two metric trees (for --repeat)."""
+    if isinstance(a, dict):
+        return {k: best_of(v, b.get(k)) if k in b else v for k, v in a.items()}
+    if a is None or b is None:
+        return a if b is None else b
+    return min(a, b)
+
+
+# -------------------------------------------------------------
+# BASELINE COMPARISON
+# -------------------------------------------------------------
+def flatten(metrics):
+    """{...nested metrics...} -> {"tick_ms.total.p50": value}."""
+    flat = {}
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for k, v in value.items():
+                walk(f"{prefix}.{k}" if prefix else k, v)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix] = value
+
+    walk("", metrics)
+    return flat
+
+
+def noise_floor(key):
+    metric = key.split(".")[0]  # "tick_ms.total.p50" -> "tick_ms"
+    for unit, floor in NOISE_FLOOR.items():
+        if metric.endswith(unit):
+            return floor
+    return 0.0
+
+
+def compare(current, baseline, threshold):
+    """
+    Failure lines for `current` vs `baseline`; lower is better for every
+    metric. A baseline scenario or metric the current run lacks fails, and
+    so does a scenario run with a different config (its metrics are not
+    compared). Otherwise a metric fails if it got worse than
+    baseline * (1 + threshold) by more than its noise floor.
+    """
+    failures = []
+    for name, scenario in sorted(baseline.items()):
+        if name not in current:
+            failures.append(f"MISSING scenario {name}")
+            continue
+        old_cfg, new_cfg = scenario.get("config", {}), current[name].get("config", {})
+        changed = [f"{k} {old_cfg.get(k)!r} -> {new_cfg.get(k)!r}"
+                   for k in sorted(set(old_cfg) | set(new_cfg)) if old_cfg.get(k) != new_cfg.get(k)]
+        if changed:
+            failures.append(f"CONFIG {name}: {', '.join(changed)}; not compared")
+            continue
+        now = flatten(current[name]["metrics"])
+        for key, old in sorted(flatten(scenario["metrics"]).items()):
+            new = now.get(key)
+            if new is None:
+                failures.append(f"MISSING metric {name}.{key}")
+            elif old > 0 and key.rsplit(".", 1)[-1] not in NOT_COMPARED \
+                    and new > old * (1 + threshold) and new - old > noise_floor(key):
+                failures.append(f"REGRESSION {name}.{key}: {old:.3f} -> {new:.3f} (+{(new / old - 1) * 100:.0f}%)")
+    return failures
+
+
+# -------------------------------------------------------------
+# MAIN
+# -------------------------------------------------------------
+def scenario_name(cfg):
+    engine = f"sharded{cfg['shards']}" if cfg["engine"] == "sharded" else cfg["engine"]
+    return f"{engine}_n{cfg['agents']}_p{cfg['pois']}_fill{cfg['fill']:g}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--pois", type=int, nargs="+", default=[6, 50])
+    parser.add_argument("--fill", type=float, nargs="+", default=[0.0, 1.0], help="Memory fill, fraction of MEMORY_CAP")
+    parser.add_argument("--fill-agents", type=int, default=500, help="Agents whose memories are filled")
+    parser.add_argument("--engine", choices=["object", "bulk", "sharded"], default="object")
+    parser.add_argument("--shards", type=int, default=4, help="Shard processes for --engine sharded")
+    parser.add_argument("--ticks", type=int, default=24, help="Timed ticks per scenario (24 = one day)")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=2000, help="Timed retrieve_memories calls")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per scenario; the best value of each metric is kept")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", type=str, default="bench_results.json")
+    parser.add_argument("--baseline", type=str, default=None, help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    parser.add_argument("--run-one", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_scenario(json.loads(args.run_one))))
+        return
+
+    results = {}
+    for n in args.sizes:
+        for n_pois in args.pois:
+            for fill in args.fill:
+                cfg = {"engine": args.engine, "shards": args.shards, "agents": n, "pois": n_pois, "fill": fill,
+                       "fill_agents": args.fill_agents, "ticks": args.ticks, "warmup": args.warmup,
+                       "queries": args.queries, "seed": args.seed, "repeat": args.repeat}
+                name = scenario_name(cfg)
+                metrics = None
+                for _ in range(args.repeat):
+                    proc = subprocess.run([sys.executable, __file__, "--run-one", json.dumps(cfg)],
+                                          capture_output=True, text=True)
+                    if proc.returncode != 0:
+                        print(proc.stderr, file=sys.stderr)
+                        sys.exit(f"scenario {name} failed")
+                    run = json.loads(proc.stdout.strip().splitlines()[-1])
+                    metrics = run if metrics is None else best_of(metrics, run)
+                results[name] = {"config": cfg, "metrics": metrics}
+
+                tick = metrics["tick_ms"]
+                line = f"{name:<28} tick mean {tick['total']['mean']:8.2f} / p50 {tick['total']['p50']:8.2f} ms | " + "  ".join(
+                    f"{phase} {tick[phase]['mean']:.2f}" for phase in PHASES)
+                if "retrieval_us" in metrics:
+                    line += f"  | retrieve p99 {metrics['retrieval_us']['p99']:.1f} us"
+                if metrics["peak_rss_mb"] is not None:
+                    line += f"  | rss {metrics['peak_rss_mb']:.0f} MiB"
+                print(line, flush=True)
+
+    with open(args.out, "w") as f:
+        json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+                   "scenarios": results}, f, indent=2)
+    print(f"results -> {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["scenarios"]
+        failures = compare(results, baseline, args.threshold)
+        for line in failures:
+            print(line)
+        if failures:
+            sys.exit(1)
+        print(f"no regressions over {args.threshold:.0%} vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# check_engines.py
+# Usage: python check_engines.py
+#        python check_engines.py --seed ../data/world_seed.json /tmp/s2000.json --ticks 300 --shards 1 4 16
+#
+# Checks that the engines are interchangeable: World, BulkWorld and ShardedWorld
+# (once per --shards count) run side by side from the same seed with the same
+# --rng-seed, with a no_movement tick every --pause-every ticks. After the run
+# every engine must produce a byte-identical stats CSV and the same position,
+# goals and last interaction tick for every agent. A World with rng_seed + 1
+# is run as a control and must differ, which shows the comparison can fail.
+#
+# Prints one line per seed and engine; the exit code is 1 on any mismatch.
+
+import os
+import sys
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from world import World
+from bulk_world import BulkWorld
+from sharded_world import ShardedWorld
+
+DEFAULT_SEED = Path(__file__).resolve().parent.parent / "data" / "world_seed.json"
+
+
+def agent_state(world):
+    """(id, x, y, goals, last interaction tick) per agent, in agent order."""
+    return [(a.id, a.x, a.y, list(a.goals), getattr(a, "last_interaction_tick", None)) for a in world.agents]
+
+
+def stats_csv(world, out_dir, name):
+    path = world.export_stats_csv(os.path.join(out_dir, f"{name}.csv"))
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def first_difference(expected, actual):
+    """Describe the first agent whose state differs (or a count mismatch)."""
+    if len(expected) != len(actual):
+        return f"{len(actual)} agents, expected {len(expected)}"
+    for want, got in zip(expected, actual):
+        if want != got:
+            return f"agent {want[0]}: {got[1:]} != {want[1:]}"
+    return None
+
+
+def check_seed(seed_file, args):
+    """Run every engine on one seed; returns the number of mismatches."""
+    engines = [("object", World(seed_file, rng_seed=args.rng_seed)),
+               ("bulk", BulkWorld(seed_file, rng_seed=args.rng_seed))]
+    engines += [(f"sharded{n}", ShardedWorld(seed_file, rng_seed=args.rng_seed, shards=n)) for n in args.shards]
+    control = World(seed_file, rng_seed=args.rng_seed + 1)
+
+    try:
+        for t in range(args.ticks):
+            pause = args.pause_every > 0 and t % args.pause_every == args.pause_every - 1
+            for _, world in engines:
+                world.step(no_movement=pause)
+            control.step(no_movement=pause)
+
+        failures = 0
+        with tempfile.TemporaryDirectory() as out_dir:
+            reference = engines[0][1]
+            want_csv, want_agents = stats_csv(reference, out_dir, "object"), agent_state(reference)
+            for name, world in engines[1:]:
+                problems = []
+                if stats_csv(world, out_dir, name) != want_csv:
+                    problems.append("stats CSV differs")
+                diff = first_difference(want_agents, agent_state(world))
+                if diff:
+                    problems.append(diff)
+                failures += bool(problems)
+                print(f"  {name:<10} {'MISMATCH ' + '; '.join(problems) if problems else 'identical to object'}")
+
+            if stats_csv(control, out_dir, "control") == want_csv and agent_state(control) == want_agents:
+                failures += 1
+                print(f"  control    MISMATCH rng_seed {args.rng_seed + 1} gave the same run")
+            else:
+                print(f"  control    differs (rng_seed {args.rng_seed + 1})")
+        return failures
+    finally:
+        for _, world in engines:
+            if isinstance(world, ShardedWorld):
+                world.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=str, nargs="+", default=[str(DEFAULT_SEED)], help="Seed files to check")
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--rng-seed", type=int, default=42)
+    parser.add_argument("--pause-every", type=int, default=50, help="Every Nth tick is a no_movement tick (0 = never)")
+    parser.add_argument("--shards", type=int, nargs="*", default=[1, 4], help="ShardedWorld shard counts to check")
+    args = parser.parse_args()
+
+    failures = 0
+    for seed_file in args.seed:
+        print(f"{seed_file}: {args.ticks} ticks, rng_seed {args.rng_seed}")
+        failures += check_seed(seed_file, args)
+
+    if failures:
+        sys.exit(f"{failures} mismatch(es)")
+    print("all engines identical")
+
+
+if __name__ == "__main__":
+    main()
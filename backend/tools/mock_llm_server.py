@@ -0,0 +1,81 @@
+# mock_llm_server.py
+# Usage: python mock_llm_server.py --port 8001 --latency 0.2 --fail-rate 0.1
+#        GROQ_URL=http://127.0.0.1:8001/v1/chat/completions python ../app.py
+#
+# Minimal OpenAI-compatible chat completions server for exercising the LLM
+# routes without a real provider. Every request gets a deterministic "move"
+# decision derived from the prompt, after --latency seconds. With --fail-rate
+# a share of requests answer 503 so retry/backoff can be observed.
+
+import json
+import time
+import random
+import hashlib
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def decision_for(prompt):
+    h = hashlib.sha256(prompt.encode("utf-8")).digest()
+    return {
+        "thought": "mock decision",
+        "action": "move",
+        "dx": h[0] % 3 - 1,
+        "dy": h[1] % 3 - 1,
+        "memory": f"Mock thought {h[2] % 10}"
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    requests_seen = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        Handler.requests_seen += 1
+        time.sleep(self.latency)
+
+        if random.random() < self.fail_rate:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        content = json.dumps(decision_for(prompt))
+        payload = json.dumps({
+            "id": f"mock-{Handler.requests_seen}",
+            "object": "chat.completion",
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": (len(prompt) + len(content)) // 4}
+        }).encode("utf-8")
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, fmt, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    args = parser.parse_args()
+
+    Handler.latency = args.latency
+    Handler.fail_rate = args.fail_rate
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), Handler)
+    print(f"Mock LLM at http://127.0.0.1:{args.port}/v1/chat/completions")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
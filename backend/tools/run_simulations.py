@@ -1,45 +1,72 @@
 # run_simulations.py
 # Usage: python run_simulations.py --runs 10 --ticks 200 --outdir ../data/sim_runs
+#        python run_simulations.py --runs 1000 --workers 32 --engine bulk --aggregate --summary
 #
 # This script loads backend/data/world_seed.json, runs the simulation headless N times,
-# saves a stats CSV per run, and optionally writes a combined summary CSV.
+# saves a stats CSV per run, and optionally writes a combined CSV and a per-tick summary
+# (mean / p5 / p95 occupancy per POI across runs).
+#
+# Runs can be fanned out over a process pool (--workers). Each run gets its own RNG
+# stream spawned from --rng-seed, so a study is reproducible regardless of worker count.
+# Stats come back to the parent in memory; nothing is re-read from disk.
 
 import os
+import sys
+import csv
 import argparse
 from pathlib import Path
-import shutil
-import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 from world import World
+from bulk_world import BulkWorld
+
+ENGINES = {"object": World, "bulk": BulkWorld}
 
 def ensure_dir(p):
     os.makedirs(p, exist_ok=True)
 
-def run_single(seed_file, ticks, out_csv_path):
-    w = World(seed_file)
+def run_seeds(rng_seed, runs):
+    """One independent 32-bit seed per run, spawned from the study seed."""
+    children = np.random.SeedSequence(rng_seed).spawn(runs)
+    return [int(c.generate_state(1)[0]) for c in children]
+
+def run_single(seed_file, ticks, engine="object", run_seed=None):
+    """Run one simulation; returns (poi_names, rows) with rows = [tick, hour, *counts]."""
+    w = ENGINES[engine](seed_file, rng_seed=run_seed)
     for _ in range(ticks):
         w.step()
-    # export CSV to out_csv_path
-    w.export_stats_csv(out_file=out_csv_path)
-    return out_csv_path
-
-def aggregate_csvs(csv_paths, out_path):
-    # simple concatenation with headers unified (assumes same header)
-    if not csv_paths:
-        return None
-    header_written = False
-    with open(out_path, "w", encoding="utf-8", newline='') as fw:
-        for i, p in enumerate(csv_paths):
-            with open(p, "r", encoding="utf-8") as fr:
-                lines = fr.readlines()
-            if not lines:
-                continue
-            # header is first line
-            if not header_written:
-                fw.write(lines[0])
-                header_written = True
-            # write body (skip header)
-            fw.writelines(lines[1:])
-    return out_path
+    return w.stats.poi_names, list(w.stats.iter_rows())
+
+def _run_job(job):
+    return run_single(*job)
+
+def write_csv(path, header, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def write_summary(path, poi_names, occupancy, ticks, hours):
+    """occupancy: array (runs, ticks, pois) -> mean/p5/p95 per tick and POI."""
+    mean = occupancy.mean(axis=0)
+    p5, p95 = np.percentile(occupancy, [5, 95], axis=0)
+
+    header = ["tick", "hour"]
+    for p in poi_names:
+        header += [f"{p}_mean", f"{p}_p5", f"{p}_p95"]
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for t in range(len(ticks)):
+            row = [ticks[t], hours[t]]
+            for j in range(len(poi_names)):
+                row += [round(float(mean[t, j]), 4), round(float(p5[t, j]), 4), round(float(p95[t, j]), 4)]
+            writer.writerow(row)
 
 def main():
     parser = argparse.ArgumentParser()
@@ -47,7 +74,12 @@ def main():
     parser.add_argument("--ticks", type=int, default=240, help="Ticks per run (e.g., 240 = 10 days if 24 ticks/day)")
     parser.add_argument("--seed", type=str, default="../data/world_seed.json", help="Path to seed JSON (relative to tools/)")
     parser.add_argument("--outdir", type=str, default="../data/sim_runs", help="Output directory for CSVs (relative to tools/)")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="object", help="object = per-Agent World, bulk = NumPy BulkWorld")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (1 = run in this process)")
+    parser.add_argument("--rng-seed", type=int, default=None, help="Study RNG seed; per-run streams are spawned from it")
+    parser.add_argument("--no-run-csvs", action="store_true", help="Skip writing one CSV per run")
     parser.add_argument("--aggregate", action="store_true", help="Create aggregated CSV of all runs")
+    parser.add_argument("--summary", action="store_true", help="Create per-tick mean/p5/p95 summary CSV")
     args = parser.parse_args()
 
     tools_dir = Path(__file__).resolve().parent
@@ -55,23 +87,57 @@ def main():
     out_dir = (tools_dir / args.outdir).resolve()
     ensure_dir(out_dir)
 
+    rng_seed = args.rng_seed if args.rng_seed is not None else np.random.SeedSequence().entropy
+    jobs = [(str(seed_file), args.ticks, args.engine, s) for s in run_seeds(rng_seed, args.runs)]
+
     csv_paths = []
-    print(f"Running {args.runs} runs, each {args.ticks} ticks. Seed: {seed_file}")
-    for i in range(1, args.runs + 1):
-        out_csv = out_dir / f"sim_run_{i}.csv"
-        if out_csv.exists():
-            out_csv.unlink()
-        print(f" Run {i} ...", end="", flush=True)
-        run_single(str(seed_file), args.ticks, str(out_csv))
-        csv_paths.append(str(out_csv))
-        print(" done.")
+    agg_file = agg_writer = None
+    occupancy = ticks = hours = None
+
+    print(f"Running {args.runs} runs, each {args.ticks} ticks, {args.workers} worker(s). "
+          f"Seed: {seed_file}  RNG seed: {rng_seed}")
+
+    pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        results = pool.map(_run_job, jobs, chunksize=max(1, len(jobs) // (args.workers * 4))) if pool else map(_run_job, jobs)
+
+        # results arrive in run order, so everything below is a single streaming pass
+        for i, (poi_names, rows) in enumerate(results, start=1):
+            header = ["tick", "hour"] + poi_names
+
+            if not args.no_run_csvs:
+                out_csv = out_dir / f"sim_run_{i}.csv"
+                write_csv(out_csv, header, rows)
+                csv_paths.append(str(out_csv))
+
+            if args.aggregate:
+                if agg_writer is None:
+                    agg_file = open(out_dir / "aggregated.csv", "w", encoding="utf-8", newline="")
+                    agg_writer = csv.writer(agg_file)
+                    agg_writer.writerow(header)
+                agg_writer.writerows(rows)
+
+            if args.summary:
+                if occupancy is None:
+                    occupancy = np.zeros((args.runs, len(rows), len(poi_names)), dtype=np.int32)
+                    ticks = [r[0] for r in rows]
+                    hours = [r[1] for r in rows]
+                occupancy[i - 1] = [r[2:] for r in rows]
+
+            print(f" Run {i} done.")
+    finally:
+        if pool:
+            pool.shutdown()
+        if agg_file:
+            agg_file.close()
 
     if args.aggregate:
-        agg_path = out_dir / "aggregated.csv"
-        if agg_path.exists():
-            agg_path.unlink()
-        aggregate_csvs(csv_paths, str(agg_path))
-        print(f"Aggregated CSV created at {agg_path}")
+        print(f"Aggregated CSV created at {out_dir / 'aggregated.csv'}")
+
+    if args.summary and occupancy is not None:
+        summary_path = out_dir / "summary.csv"
+        write_summary(summary_path, poi_names, occupancy, ticks, hours)
+        print(f"Summary CSV created at {summary_path}")
 
     print("All runs finished. CSVs:", csv_paths)
 
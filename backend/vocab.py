@@ -0,0 +1,122 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+class Vocabulary:
+    """
+    Process-wide token <-> integer id table.
+
+    Ids are handed out in first-seen order and never reused, so id tuples
+    stay valid for the life of the process (they are never persisted;
+    checkpoints and the journal keep the tokens). Plain decimal numbers
+    ("17", "2048", tick numbers) are not stored at all: they map to
+    -1 - value, so an ever-growing tick count cannot grow the table.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        self._lock = threading.Lock()  # adds only; lookups of known tokens skip it
+        # a full scan resolves the same query once per memory; keyed with
+        # the table size, since unseen query tokens may be added later
+        self._last_query = (None, ())
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def id(self, token: str) -> int:
+        i = self._ids.get(token)
+        if i is None:
+            if token.isdigit() and (token[0] != "0" or len(token) == 1):
+                return -1 - int(token)
+            with self._lock:
+                i = self._ids.get(token)  # another thread may have added it meanwhile
+                if i is None:
+                    token = sys.intern(token)
+                    self.tokens.append(token)
+                    i = self._ids[token] = len(self.tokens) - 1
+        return i
+
+    def token(self, i: int) -> str:
+        return self.tokens[i] if i >= 0 else str(-1 - i)
+
+    def ids(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        """Sorted, de-duplicated ids of `tokens`, adding unseen ones."""
+        return tuple(sorted({self.id(t) for t in tokens}))
+
+    def known_ids(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        """ids() for queries: tokens no memory ever had are dropped instead of added."""
+        key = (tuple(tokens), len(self.tokens))
+        last = self._last_query
+        if last[0] == key:
+            return last[1]
+        out = set()
+        for t in key[0]:
+            i = self._ids.get(t)
+            if i is None and t.isdigit() and (t[0] != "0" or len(t) == 1):
+                i = -1 - int(t)
+            if i is not None:
+                out.add(i)
+        ids = tuple(sorted(out))
+        self._last_query = (key, ids)
+        return ids
+
+
+VOCAB = Vocabulary()
+
+
+def sorted_overlap(a: Tuple[int, ...], b: Tuple[int, ...]) -> int:
+    """Number of ids shared by two sorted, de-duplicated id tuples (one merge pass)."""
+    i = j = n = 0
+    la, lb = len(a), len(b)
+    while i < la and j < lb:
+        x, y = a[i], b[j]
+        if x == y:
+            n += 1
+            i += 1
+            j += 1
+        elif x < y:
+            i += 1
+        else:
+            j += 1
+    return n
+
+
+class TokenCache:
+    """
+    LRU cache of text -> (text, tokens, ids).
+
+    Texts repeat a lot ("Moved to 3,4" has 625 variants on the default
+    grid), and every hit hands out the same str and tuple objects, so
+    memories with equal texts share them instead of each keeping a copy,
+    and the tokenizer regex only runs for texts not seen lately.
+    """
+
+    def __init__(self, tokenize: Callable[[str], List[str]], vocab: Vocabulary = VOCAB, capacity: int = 8192):
+        self.tokenize = tokenize
+        self.vocab = vocab
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> tuple:
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is not None:
+                self._entries.move_to_end(text)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            tokens = tuple(map(sys.intern, self.tokenize(text)))
+            entry = self._entries[text] = (text, tokens, self.vocab.ids(tokens))
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+            return entry
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "capacity": self.capacity, "hits": self.hits,
+                "misses": self.misses, "vocabulary": len(self.vocab)}
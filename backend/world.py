@@ -1,23 +1,83 @@
 import os
-import json
+import time
 import csv
-from agent import Agent
+import random
+from bisect import bisect_right
+from agent import Agent, RANDOM_STEPS, CHANGE_CLOCK
+from stats_store import StatsRecorder
+from memory_journal import MemoryJournal
+from event_log import EventLog
+from navigation import NavGrid
+from crowd import CrowdTracker
+from schedule import ScheduleEngine
+from seed_io import read_seed, agent_records, gc_paused
+import checkpoint
 
 INTERACTION_COOLDOWN_TICKS = 20
 
+# Agents a POI takes before newcomers are redirected (seed "poi_capacity" overrides)
+DEFAULT_POI_CAPACITY = 3
+
+# Phases of step(), in order; phase_times holds the last tick's seconds per phase
+PHASES = ("schedule", "vendor", "movement", "interactions", "stats")
+
+# Grid used when the seed has no "map" layer
+DEFAULT_BOUNDS = (0, 0, 24, 24)  # (min_x, min_y, max_x, max_y)
+
+# Ticks whose change version is remembered for delta snapshots; a client
+# further behind than this gets a full snapshot instead.
+SNAPSHOT_HISTORY_TICKS = 1024
+
 
 class World:
-    def __init__(self, seed_file):
-        self.agents = []
+    def __init__(self, seed_file, stats_retention=None, stats_spill_dir=None, rng_seed=None, memory_db=None,
+                 event_log_dir=None, event_log_retention=None):
+        self._agents = []
         self.pois = {}
-        self.bounds = (0, 0, 24, 24)  # (min_x, min_y, max_x, max_y)
+        self.poi_capacity = {}
+        self.bounds = DEFAULT_BOUNDS
+        self.nav = None  # NavGrid when the seed has a "map" layer
+        self.scheduler = ScheduleEngine()
+        self.attach_crowd()
         self.tick_count = 0
-        self.stats = []
+        self.phase_times = {}
+        self.on_step = None  # optional callable(world) run after every step (metrics, profiling)
+        self.stats_retention = stats_retention
+        self.stats_spill_dir = stats_spill_dir
+        self.stats = self._new_stats_recorder()
         self.seed_file = seed_file
+        self.set_rng_seed(rng_seed)
+        self.mark_reset()
+        self.memory_journal = None
+        self.events = None
 
         if seed_file:
             self.load_seed(seed_file)
 
+        # Optional SQLite journal of every memory (see memory_journal.py).
+        # Opened after the initial seed load so a restart keeps the history
+        # for load_checkpoint; later load_seed calls start it over.
+        if memory_db:
+            self.memory_journal = MemoryJournal(memory_db)
+            self.attach_journal()
+
+        # Optional binary log of every tick's changes, for replay (see
+        # event_log.py). Without a seed the world is empty until
+        # load_checkpoint, which keeps the log up to the restored tick.
+        # event_log_retention bounds the ticks kept on disk.
+        if event_log_dir:
+            self.events = EventLog(event_log_dir, retention=event_log_retention)
+            if seed_file:
+                self.attach_events()
+
+    def set_rng_seed(self, rng_seed):
+        """
+        Seed this world's random stream (None = fresh entropy).
+        Same seed + same seed file → identical stats, tick for tick.
+        """
+        self.rng_seed = rng_seed
+        self.rng = random.Random(rng_seed)
+
     # -------------------------------------------------------------
     # WORLD STEP
     # -------------------------------------------------------------
@@ -26,16 +86,16 @@ class World:
         Advance world by one tick.
         If no_movement=True → skip built-in movement (LLM already moved agents).
         """
+        marks = [time.perf_counter()]
         self.tick_count += 1
         current_hour = self.tick_count % 24
 
         # -------- SCHEDULE --------
-        for a in self.agents:
-            try:
-                if hasattr(a, "schedule") and current_hour in a.schedule:
-                    a.goals = a.schedule[current_hour]
-            except Exception:
-                continue
+        # Only agents with a schedule entry at this hour are touched
+        for group, goals in self.scheduler.events(self.tick_count):
+            for i in self.scheduler.groups[group]:
+                self.agents[i].goals = goals
+        marks.append(time.perf_counter())
 
         # ---------------------------------------------------------
         # HARD-CODED VENDOR BEHAVIOUR
@@ -54,20 +114,29 @@ class World:
                     # If vendor is outside zone → snap back to canteen
                     if not (min_x <= a.x <= max_x and min_y <= a.y <= max_y):
                         a.x, a.y = cx, cy
+                        a.mark_dirty()
 
                     # Vendor goals always force to canteen
-                    a.goals = ["canteen"]
+                    if a.goals != ["canteen"]:
+                        a.goals = ["canteen"]
+
+        marks.append(time.perf_counter())
 
         # ---------------------------------------------------------
         # MOVEMENT (SAFE)
         # ---------------------------------------------------------
         if not no_movement:
 
-            # Count crowd at POIs
-            poi_counts = {p: 0 for p in self.pois}
-            for a in self.agents:
-                if a.goals and a.goals[0] in poi_counts:
-                    poi_counts[a.goals[0]] += 1
+            # Live POI counts; every goal change above already updated them
+            crowd = self.crowd
+
+            # Agents without a valid POI target random-walk. Draw all of
+            # this tick's steps in one call, in agent order.
+            n_walkers = sum(
+                1 for a in self.agents
+                if a.type != "vendor" and not (a.goals and a.goals[0] in self.pois)
+            )
+            steps = iter(self.rng.choices(RANDOM_STEPS, k=n_walkers))
 
             # Move agents
             for a in self.agents:
@@ -78,58 +147,64 @@ class World:
 
                 # No goals → random walk
                 if not a.goals:
+                    step = next(steps)
                     if hasattr(a, "random_walk"):
-                        a.random_walk(self.bounds)
+                        a.random_walk(self.bounds, step, self.nav)
                     continue
 
                 target = a.goals[0]
 
-                # If target is a valid POI and crowded, redirect
-                if target in poi_counts and poi_counts[target] > 3:
-                    alts = sorted(self.pois.keys(), key=lambda p: poi_counts[p])
-                    if alts:
-                        a.goals = [alts[0]]
-                        target = alts[0]
+                # If target is a valid POI over capacity, redirect to the
+                # least loaded one (the goals setter moves the count along)
+                i = crowd.index.get(target)
+                if i is not None:
+                    j = crowd.redirect(i)
+                    if j is not None:
+                        target = crowd.names[j]
+                        a.goals = [target]
 
                 # Move towards target if valid POI
                 if target in self.pois and hasattr(a, "move_towards"):
                     tx, ty = self.pois[target]
-                    a.move_towards(tx, ty, speed=1)
+                    a.move_towards(tx, ty, speed=1, nav=self.nav)
 
                 # If invalid target → random walk
                 else:
+                    step = next(steps)
                     if hasattr(a, "random_walk"):
-                        a.random_walk(self.bounds)
+                        a.random_walk(self.bounds, step, self.nav)
+
+        marks.append(time.perf_counter())
 
         # ---------------------------------------------------------
         # INTERACTIONS
+        # Only agents sharing a tile can meet, so pair within each
+        # occupied cell instead of scanning all agent pairs.
         # ---------------------------------------------------------
-        interacted = set()
-        for a in self.agents:
-            for b in self.agents:
-                if a.id == b.id:
-                    continue
-
-                pair = tuple(sorted([a.id, b.id]))
-                if pair in interacted:
-                    continue
+        cells = self._build_cell_index()
+        met = [] if self.events is not None else None
+        for bucket in cells.values():
+            if len(bucket) < 2:
+                continue
 
-                # Same tile → interact
-                if a.x == b.x and a.y == b.y:
+            for k, a in enumerate(bucket):
+                for b in bucket[k + 1:]:
+                    if a.id == b.id:
+                        continue
 
                     last_a = getattr(a, "last_interaction_tick", -999)
                     last_b = getattr(b, "last_interaction_tick", -999)
 
                     if self.tick_count - last_a < INTERACTION_COOLDOWN_TICKS:
-                        interacted.add(pair)
-                        continue
+                        break
                     if self.tick_count - last_b < INTERACTION_COOLDOWN_TICKS:
-                        interacted.add(pair)
                         continue
 
                     # Update stamps
                     a.last_interaction_tick = self.tick_count
                     b.last_interaction_tick = self.tick_count
+                    if met is not None:
+                        met.append((a.id, b.id))
 
                     # Store memory
                     try:
@@ -142,67 +217,259 @@ class World:
                     except:
                         pass
 
-                    interacted.add(pair)
+        marks.append(time.perf_counter())
 
         # ---------------------------------------------------------
         # STATS
+        # Occupancy is just the size of each POI's tile bucket.
         # ---------------------------------------------------------
-        occ = {p: 0 for p in self.pois}
+        occ = [len(cells.get(pos, ())) for pos in self.pois.values()]
+        self.stats.append(self.tick_count, current_hour, occ)
+        self._mark_tick()
+
+        # one journal transaction per tick
+        if self.memory_journal is not None:
+            self.memory_journal.commit()
+        if self.events is not None:
+            self.events.record_agents(self.tick_count, self.agents, met)
+
+        marks.append(time.perf_counter())
+        self.phase_times = {phase: marks[k + 1] - marks[k] for k, phase in enumerate(PHASES)}
+        if self.on_step is not None:
+            self.on_step(self)
+
+    # -------------------------------------------------------------
+    # SPATIAL INDEX
+    # -------------------------------------------------------------
+    def _build_cell_index(self):
+        """
+        Map each occupied tile to the agents standing on it, in list order.
+        Rebuilt after movement each tick, so it always reflects positions
+        set by move_towards / random_walk (or directly by the LLM path).
+        """
+        cells = {}
         for a in self.agents:
-            for poi, pos in self.pois.items():
-                if (a.x, a.y) == pos:
-                    occ[poi] += 1
+            cells.setdefault((a.x, a.y), []).append(a)
+        return cells
+
+    # -------------------------------------------------------------
+    # SNAPSHOTS
+    # -------------------------------------------------------------
+    def mark_reset(self):
+        """Invalidate every delta cursor, e.g. after agents or stats were replaced."""
+        self.reset_version = CHANGE_CLOCK.next()
+        self._tick_versions = []  # (change version, tick) per step, oldest first
+        self._history_floor = self.reset_version
+
+    def _mark_tick(self):
+        self._tick_versions.append((CHANGE_CLOCK.next(), self.tick_count))
+        if len(self._tick_versions) > 2 * SNAPSHOT_HISTORY_TICKS:
+            dropped = self._tick_versions[:-SNAPSHOT_HISTORY_TICKS]
+            del self._tick_versions[:-SNAPSHOT_HISTORY_TICKS]
+            self._history_floor = dropped[-1][0]
+
+    def snapshot(self, since=None):
+        """
+        Client view of the world, tagged with the current change version.
 
-        self.stats.append({
+        Without `since` (or when it predates the last reset or the kept
+        tick history) this is a full snapshot including POIs and static
+        agent fields. Otherwise only agents changed after `since` are sent
+        (Agent.to_delta_dict), plus the stats rows recorded after it.
+        """
+        version = CHANGE_CLOCK.current
+        if since is None or since < self._history_floor:
+            latest = self.get_stats(1)
+            return {
+                "version": version,
+                "full": True,
+                "tick": self.tick_count,
+                "pois": self.pois,
+                "map": self.nav.rows() if self.nav is not None else None,
+                "agents": [a.to_dict() for a in self.agents],
+                "stats": latest
+            }
+
+        first = bisect_right(self._tick_versions, (since, float("inf")))
+        if first < len(self._tick_versions):
+            stats = self.get_stats(since_tick=self._tick_versions[first][1] - 1)
+        else:
+            stats = []
+
+        return {
+            "version": version,
+            "full": False,
+            "since": since,
             "tick": self.tick_count,
-            "hour": current_hour,
-            "occupancy": occ
-        })
+            "agents": [a.to_delta_dict(since) for a in self.agents if a.version > since],
+            "stats": stats
+        }
 
     # -------------------------------------------------------------
     # STATS
     # -------------------------------------------------------------
-    def get_stats(self, last_n=None):
-        if last_n:
-            return self.stats[-last_n:]
-        return self.stats
+    def _new_stats_recorder(self):
+        return StatsRecorder(self.pois.keys(), self.stats_retention, self.stats_spill_dir)
+
+    def replace_stats(self, stats):
+        """Swap in a new StatsRecorder, deleting the old one's spill directory."""
+        self.stats.close()
+        self.stats = stats
+
+    def get_stats(self, last_n=None, since_tick=None, until_tick=None):
+        return self.stats.records(last_n, since_tick, until_tick)
 
     def export_stats_csv(self, out_file=None):
         if not out_file:
             out_file = os.path.join(os.path.dirname(self.seed_file), "stats.csv")
 
-        headers = ["tick", "hour"] + list(self.pois.keys())
+        headers = ["tick", "hour"] + self.stats.poi_names
         with open(out_file, "w", newline="", encoding="utf-8") as f:
             writer = csv.writer(f)
             writer.writerow(headers)
-            for rec in self.stats:
-                row = [rec["tick"], rec["hour"]]
-                row.extend(rec["occupancy"].get(p, 0) for p in self.pois)
-                writer.writerow(row)
+            writer.writerows(self.stats.iter_rows())
 
         return out_file
 
+    # -------------------------------------------------------------
+    # MAP
+    # -------------------------------------------------------------
+    def _load_map(self, spec, grid=None):
+        """
+        Set up navigation from a seed "map" layer (None = an open grid of
+        the seed's "grid": [width, height], else 25x25). Distance fields for
+        every POI are computed here, once per map.
+        """
+        if not spec:
+            self.nav = None
+            self.bounds = (0, 0, int(grid[0]) - 1, int(grid[1]) - 1) if grid else DEFAULT_BOUNDS
+            return
+
+        self.nav = NavGrid.from_seed(spec)
+        self.bounds = self.nav.bounds
+        for name, (x, y) in self.pois.items():
+            if not self.nav.passable(x, y):
+                raise ValueError(f"POI {name!r} at {x},{y} is not on a walkable tile")
+        self.nav.precompute(self.pois.values())
+
+    def set_tile(self, x, y, cost):
+        """Change one map tile (0 = wall); POI fields are rebuilt when next needed."""
+        if self.nav is None:
+            raise ValueError("this world has no map layer")
+        self.nav.set_cost(x, y, cost)
+
+    # -------------------------------------------------------------
+    # CROWDS
+    # -------------------------------------------------------------
+    def _poi_capacities(self, spec):
+        """
+        Seed "poi_capacity": one number for every POI or {name: number};
+        POIs not listed get DEFAULT_POI_CAPACITY.
+        """
+        if not isinstance(spec, dict):
+            spec = {} if spec is None else {name: spec for name in self.pois}
+        capacity = {name: int(spec.get(name, DEFAULT_POI_CAPACITY)) for name in self.pois}
+        for name, cap in capacity.items():
+            if cap < 1:
+                raise ValueError(f"POI {name!r} needs a capacity of at least 1")
+        return capacity
+
+    @property
+    def agents(self):
+        return self._agents
+
+    @agents.setter
+    def agents(self, agents):
+        """Replacing the agent list re-attaches it, so schedule groups and crowd counts never go stale."""
+        self._agents = agents
+        self.attach_agents()
+
+    def attach_agents(self):
+        """Hook the clock, crowd counts, schedule groups, journal and event log up to the current agent list."""
+        for a in self.agents:
+            a.clock = self  # memory consolidation reads tick_count
+        self.attach_crowd()
+        self.scheduler.assign([a.type for a in self.agents], [a.schedule_overrides for a in self.agents])
+        self.attach_journal()
+        self.attach_events()
+
+    def attach_events(self):
+        """
+        Point every agent at the event log and start it at the current tick,
+        dropping anything it holds after that tick.
+        """
+        if self.events is None:
+            return
+        for a in self.agents:
+            a.events = self.events
+        self.events.start_agents(self.tick_count, self.agents)
+
+    def attach_crowd(self):
+        """New CrowdTracker counted from the current agents, which then keep it up to date."""
+        self.crowd = CrowdTracker(self.pois, self.poi_capacity)
+        self.crowd.recount(a.goals for a in self.agents)
+        for a in self.agents:
+            a.crowd = self.crowd
+
+    def set_poi_capacity(self, name, capacity):
+        capacity = int(capacity)
+        if name not in self.pois:
+            raise KeyError(name)
+        if capacity < 1:
+            raise ValueError(f"POI {name!r} needs a capacity of at least 1")
+        self.poi_capacity[name] = capacity
+        self.crowd.capacity[self.crowd.index[name]] = capacity
+        self.crowd.set_counts(self.crowd.counts)
+
+    # -------------------------------------------------------------
+    # CHECKPOINTS
+    # -------------------------------------------------------------
+    def save_checkpoint(self, path, compress=False):
+        """Write tick, agents, memories, stats and RNG state to one binary file."""
+        return checkpoint.save_checkpoint(self, path, compress)
+
+    def load_checkpoint(self, path):
+        """Restore a save_checkpoint file; the run continues exactly where it was saved."""
+        return checkpoint.load_checkpoint(self, path)
+
     # -------------------------------------------------------------
     # LOAD SEED
     # -------------------------------------------------------------
+    def attach_journal(self):
+        """Point every agent at this world's memory journal (or detach with None)."""
+        for a in self.agents:
+            a.journal = self.memory_journal
+
     def load_seed(self, seed_file):
-        with open(seed_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        self.pois = {k: (int(v[0]), int(v[1])) for k, v in data.get("pois", {}).items()}
-
-        self.agents = []
-        for a in data.get("agents", []):
-            self.agents.append(
-                Agent(
-                    a["id"],
-                    a["type"],
-                    x=a.get("x", 0),
-                    y=a.get("y", 0),
-                    goals=a.get("goals", []),
-                    traits=a.get("traits", {})
+        """Load a .json seed, or a .jsonl one agent by agent (see seed_io)."""
+        header, records = read_seed(seed_file)
+
+        self.pois = {k: (int(v[0]), int(v[1])) for k, v in header.get("pois", {}).items()}
+        self.poi_capacity = self._poi_capacities(header.get("poi_capacity"))
+        self._load_map(header.get("map"), header.get("grid"))
+        self.scheduler = ScheduleEngine(header.get("schedules"), header.get("calendar"))
+
+        agents = []
+        with gc_paused():
+            for a in agent_records(header, records):
+                agents.append(
+                    Agent(
+                        a["id"],
+                        a["type"],
+                        x=a.get("x", 0),
+                        y=a.get("y", 0),
+                        goals=a.get("goals", []),
+                        traits=a.get("traits", {}),
+                        schedule_overrides=a.get("schedule")
+                    )
                 )
-            )
 
-        self.stats = []
+        self.replace_stats(self._new_stats_recorder())
         self.tick_count = 0
+        self.set_rng_seed(self.rng_seed)
+        self.mark_reset()
+
+        # a fresh run starts a fresh history
+        if self.memory_journal is not None:
+            self.memory_journal.clear()
+        self.agents = agents  # attaches them
@@ -0,0 +1,313 @@
+# world_registry.py
+import os
+import re
+import time
+import shutil
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+WORLD_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Rough resident cost of a loaded world, for the memory budget: an agent
+# with its index and bookkeeping, and one memory entry with its postings
+# (fitted to RSS of a 10k-agent world after one simulated day: ~113 MiB)
+AGENT_BYTES = 1024
+MEMORY_BYTES = 448
+
+# the budget walks every agent's memory list, so check it at most this often
+BUDGET_CHECK_INTERVAL = 1.0  # seconds
+
+
+class UnknownWorld(KeyError):
+    pass
+
+
+class WorldSession:
+    """
+    One hosted world: its lock, its tick loop and where it lives on disk.
+    `world` is None while the world is evicted to `checkpoint_path`; the
+    loop (and its rate) is kept and gets the restored world back.
+    """
+
+    def __init__(self, world_id, seed_file, root, rng_seed=None):
+        self.id = world_id
+        self.seed_file = seed_file
+        self.root = root
+        self.rng_seed = rng_seed
+        self.lock = threading.RLock()
+        self.world = None
+        self.loop = None
+        self.pins = 0  # requests that need the world to stay loaded
+        self.created = time.time()
+        self.last_used = self.created
+        self.evictions = 0
+
+    @property
+    def checkpoint_path(self):
+        return os.path.join(self.root, "evicted.ckpt")
+
+    @property
+    def loaded(self):
+        return self.world is not None
+
+    def busy(self):
+        """Running, watched or in use by a request; never evicted then."""
+        return self.pins > 0 or (self.loop is not None and (self.loop.running or self.loop.viewers > 0))
+
+    def estimate_bytes(self):
+        world = self.world  # read once: an eviction may drop it meanwhile
+        return 0 if world is None else self._world_bytes(world)
+
+    @staticmethod
+    def _world_bytes(world):
+        agents = world.agents
+        return len(agents) * AGENT_BYTES + sum(len(a.memory) for a in agents) * MEMORY_BYTES
+
+    def info(self):
+        world = self.world  # read once: an eviction may drop it meanwhile
+        out = {
+            "id": self.id,
+            "loaded": world is not None,
+            "created": int(self.created),
+            "last_used": int(self.last_used),
+            "evictions": self.evictions,
+        }
+        if world is not None:
+            out.update({
+                "tick": world.tick_count,
+                "agents": len(world.agents),
+                "running": bool(self.loop and self.loop.running),
+                "viewers": self.loop.viewers if self.loop else 0,
+                "estimated_mb": round(self._world_bytes(world) / 2**20, 2),
+            })
+        return out
+
+
+class WorldRegistry:
+    """
+    Worlds by id, each with its own lock.
+
+    Loaded worlds are kept in least-recently-used order. When more than
+    `max_loaded` are loaded, or their estimated size passes
+    `memory_budget` bytes, the least recently used idle ones are written
+    to a checkpoint under their session root and dropped; the next use()
+    restores them exactly where they were. Requests only ask for that
+    check; it runs on the registry's eviction thread, so no request pays
+    for another world's checkpoint.
+
+    `build_world(session, seed_file)` makes a World (seed_file None = an
+    empty one to restore into) and `on_load(session)` runs after a world
+    is built or restored, e.g. to give it a tick loop.
+    """
+
+    def __init__(self, root, build_world, on_load=None, max_worlds=64, max_loaded=None, memory_budget=None):
+        self.root = root
+        self.build_world = build_world
+        self.on_load = on_load
+        self.max_worlds = max_worlds
+        self.max_loaded = max_loaded
+        self.memory_budget = memory_budget
+        self._sessions = OrderedDict()  # id -> session, least recently used first
+        self._lock = threading.Lock()
+        self._budget_lock = threading.Lock()  # one enforce_budget at a time
+        self._last_budget_check = 0.0
+        self._budget_wanted = threading.Event()
+        self._budget_force = False
+        self._evictor = None
+
+    def __contains__(self, world_id):
+        return world_id in self._sessions
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # -------------------------------------------------------------
+    # CREATE / LIST / DELETE
+    # -------------------------------------------------------------
+    def create(self, world_id, seed_file, rng_seed=None, root=None):
+        """
+        Register and load a new world from `seed_file`. Raises ValueError
+        for a bad or taken id, or when max_worlds are already registered.
+        """
+        if not isinstance(world_id, str) or not WORLD_ID.match(world_id):
+            raise ValueError("world id must be 1-64 letters, digits, _ or -")
+        session = WorldSession(world_id, seed_file, root or os.path.join(self.root, world_id), rng_seed)
+        with self._lock:
+            if world_id in self._sessions:
+                raise ValueError(f"world {world_id!r} already exists")
+            if self.max_worlds is not None and len(self._sessions) >= self.max_worlds:
+                raise ValueError(f"at most {self.max_worlds} worlds")
+            self._sessions[world_id] = session
+            session.pins = 1  # not evictable before it is built
+        try:
+            with session.lock:
+                os.makedirs(session.root, exist_ok=True)
+                session.world = self.build_world(session, seed_file)
+                if self.on_load:
+                    self.on_load(session)
+        except Exception:
+            with self._lock:
+                self._sessions.pop(world_id, None)
+            raise
+        finally:
+            self._unpin(session)
+        self.request_budget_check(force=True)
+        return session
+
+    def list(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [s.info() for s in sessions]
+
+    def delete(self, world_id, remove_files=True):
+        """Stop and drop a world. Raises UnknownWorld if there is no such world."""
+        with self._lock:
+            session = self._sessions.pop(world_id, None)
+        if session is None:
+            raise UnknownWorld(world_id)
+        if session.loop is not None:
+            session.loop.stop()
+        with session.lock:
+            self._unload(session)
+        if remove_files and session.root.startswith(self.root):
+            shutil.rmtree(session.root, ignore_errors=True)
+        return session
+
+    # -------------------------------------------------------------
+    # ACCESS
+    # -------------------------------------------------------------
+    def get(self, world_id):
+        """The session, loaded or not, without touching its LRU position."""
+        session = self._sessions.get(world_id)
+        if session is None:
+            raise UnknownWorld(world_id)
+        return session
+
+    def _touch(self, world_id):
+        with self._lock:
+            session = self._sessions.get(world_id)
+            if session is None:
+                raise UnknownWorld(world_id)
+            self._sessions.move_to_end(world_id)
+            session.last_used = time.time()
+            session.pins += 1
+            return session
+
+    def _unpin(self, session):
+        with self._lock:
+            session.pins -= 1
+
+    @contextmanager
+    def pinned(self, world_id):
+        """
+        The session with its world loaded and kept loaded until the block
+        ends, without holding its lock (take session.lock around world
+        access). Raises UnknownWorld for unknown ids.
+        """
+        session = self._touch(world_id)
+        try:
+            with session.lock:
+                if session.world is None:
+                    self._restore(session)
+            yield session
+        finally:
+            self._unpin(session)
+        self.request_budget_check()
+
+    @contextmanager
+    def use(self, world_id):
+        """pinned() with the session lock held for the whole block."""
+        with self.pinned(world_id) as session:
+            with session.lock:
+                yield session
+
+    def _restore(self, session):
+        world = self.build_world(session, None)
+        world.load_checkpoint(session.checkpoint_path)
+        session.world = world
+        if self.on_load:
+            self.on_load(session)
+
+    def _unload(self, session):
+        world = session.world
+        session.world = None
+        if session.loop is not None:
+            session.loop.world = None
+        if world is not None and world.memory_journal is not None:
+            world.memory_journal.close()
+        if world is not None and world.events is not None:
+            world.events.close()
+        if world is not None:
+            world.stats.close()  # evict checkpointed the rows first
+
+    # -------------------------------------------------------------
+    # EVICTION
+    # -------------------------------------------------------------
+    def evict(self, session):
+        """Checkpoint an idle world and drop it; False if it is busy or not loaded."""
+        if not session.lock.acquire(blocking=False):
+            return False
+        try:
+            if session.world is None or session.busy():
+                return False
+            os.makedirs(session.root, exist_ok=True)
+            session.world.save_checkpoint(session.checkpoint_path)
+            self._unload(session)
+            session.evictions += 1
+            return True
+        finally:
+            session.lock.release()
+
+    def request_budget_check(self, force=False):
+        """Have the eviction thread run enforce_budget(force) soon; returns at once."""
+        if self.max_loaded is None and self.memory_budget is None:
+            return
+        with self._lock:
+            self._budget_force = self._budget_force or force
+            if self._evictor is None:
+                self._evictor = threading.Thread(target=self._evict_loop, name="world-evictor", daemon=True)
+                self._evictor.start()
+        self._budget_wanted.set()
+
+    def _evict_loop(self):
+        while True:
+            self._budget_wanted.wait()
+            self._budget_wanted.clear()
+            with self._lock:
+                force, self._budget_force = self._budget_force, False
+            try:
+                self.enforce_budget(force)
+            except Exception:
+                log.exception("enforcing the world budget failed")
+
+    def enforce_budget(self, force=False):
+        """Evict idle worlds, least recently used first, until within max_loaded and memory_budget."""
+        if self.max_loaded is None and self.memory_budget is None:
+            return []
+        with self._budget_lock:
+            now = time.monotonic()
+            if not force and now - self._last_budget_check < BUDGET_CHECK_INTERVAL:
+                return []
+            self._last_budget_check = now
+            return self._evict_over_budget()
+
+    def _evict_over_budget(self):
+        with self._lock:
+            loaded = [s for s in self._sessions.values() if s.loaded]
+        sizes = {s.id: s.estimate_bytes() for s in loaded} if self.memory_budget is not None else {}
+        total = sum(sizes.values())
+
+        evicted = []
+        for session in loaded:
+            over_count = self.max_loaded is not None and len(loaded) - len(evicted) > self.max_loaded
+            over_bytes = self.memory_budget is not None and total > self.memory_budget
+            if not (over_count or over_bytes):
+                break
+            if self.evict(session):
+                evicted.append(session.id)
+                total -= sizes.get(session.id, 0)
+        return evicted
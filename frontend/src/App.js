@@ -1,4 +1,4 @@
-import React, { useEffect, useState, useRef } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import axios from "axios";
 import "./App.css";
 
@@ -157,6 +157,7 @@ const agentIcon = (type) => {
 export default function App() {
   const [agentsRaw, setAgentsRaw] = useState([]);
   const [pois, setPois] = useState({});
+  const [mapRows, setMapRows] = useState(null); // seed "map" layer, "#" = wall
   const [statsLatest, setStatsLatest] = useState(null);
 
   const [selectedAgent, setSelectedAgent] = useState(null);
@@ -165,16 +166,21 @@ export default function App() {
   const [simModalOpen, setSimModalOpen] = useState(false);
   const [simStats, setSimStats] = useState(null);
   const [simRunning, setSimRunning] = useState(false);
+  const [simProgress, setSimProgress] = useState(0); // 0..1 of the running job
   const [simTicksInput, setSimTicksInput] = useState(240);
 
-  const tickRef = useRef(null);
-
   const scale = 20;
-  const gridSize = 25;
+  const gridSize = mapRows ? Math.max(mapRows.length, mapRows[0]?.length || 0) : 25;
   const mapSize = gridSize * scale;
 
   const [positions, setPositions] = useState({});
 
+  // Replay: null = live, else the logged tick shown on the map
+  const [replayRange, setReplayRange] = useState(null);
+  const [replayTick, setReplayTick] = useState(null);
+  const [replayAgents, setReplayAgents] = useState({});
+  const replaySeq = useRef(0);
+
   /* ========================= THINK BUTTON ========================= */
   const handleThink = async (agentId) => {
     try {
@@ -207,6 +213,7 @@ export default function App() {
       const res = await axios.get("http://localhost:5000/api/world");
       setAgentsRaw(res.data.agents);
       setPois(res.data.pois);
+      setMapRows(res.data.map || null);
 
       setPositions((prev) => {
         const next = { ...prev };
@@ -243,27 +250,124 @@ export default function App() {
     } catch {}
   };
 
+  /* ========================= APPLY SERVER UPDATE ========================= */
+  // Full snapshots replace everything; deltas only carry the agents that
+  // changed (position, goals, new memories) and are merged into the cache,
+  // so type/traits/personality and POIs are only sent once. An updated
+  // movement trail replaces the newest cached memory (memory_replaced), and
+  // after a consolidation the delta carries the whole "memory" list.
+  const mergeAgent = (prev, delta) => ({
+    ...prev,
+    ...delta,
+    memory: delta.memory
+      || [...(delta.memory_new || []), ...(prev.memory || []).slice(delta.memory_replaced || 0)].slice(0, 8),
+  });
+
+  const applyUpdate = (data) => {
+    setRunning(data.running);
+    if (data.stats?.length) setStatsLatest(data.stats[data.stats.length - 1]);
+    if (data.full && data.pois) setPois(data.pois);
+    if (data.full) setMapRows(data.map || null);
+
+    const changed = {};
+    data.agents.forEach((a) => (changed[a.id] = a));
+
+    setAgentsRaw((prev) =>
+      data.full
+        ? data.agents
+        : prev.map((a) => (changed[a.id] ? mergeAgent(a, changed[a.id]) : a))
+    );
+
+    setPositions((prev) => {
+      const next = { ...prev };
+      data.agents.forEach((a) => {
+        if (!next[a.id]) next[a.id] = { x: a.x * scale, y: a.y * scale };
+      });
+      return next;
+    });
+
+    // keep the selected agent's panel in sync (and its lastLLM block)
+    setSelectedAgent((prev) => {
+      const updated = prev && changed[prev.id];
+      if (!updated) return prev;
+      return data.full
+        ? { ...updated, lastLLM: prev.lastLLM }
+        : mergeAgent(prev, updated);
+    });
+  };
+
   /* ========================= TICK ========================= */
+  // The server pushes the result over the stream like any other tick
   const doTick = async () => {
     try {
       await axios.post("http://localhost:5000/api/tick", { steps: 1 });
-      await Promise.all([fetchWorld(), fetchStatsLatest()]);
     } catch (err) {
       console.error(err);
     }
   };
 
-  /* ========================= AUTORUN LOOP ========================= */
+  /* ========================= REPLAY ========================= */
+  // The server logs every tick (see event_log.py); scrubbing asks for the
+  // state after one tick and overlays its positions/goals on the agents.
+  const fetchReplayRange = async () => {
+    try {
+      const res = await axios.get("http://localhost:5000/api/replay");
+      setReplayRange(res.data.last_tick != null ? res.data : null);
+    } catch {
+      setReplayRange(null); // event log is off
+    }
+  };
+
+  const scrubTo = async (tick) => {
+    setReplayTick(tick);
+    const seq = ++replaySeq.current;
+    try {
+      const res = await axios.get(`http://localhost:5000/api/replay?tick=${tick}`);
+      if (seq !== replaySeq.current) return; // a later scrub already asked
+      const byId = {};
+      res.data.agents.forEach((a) => (byId[a.id] = a));
+      setReplayAgents(byId);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  const backToLive = () => {
+    replaySeq.current++;
+    setReplayTick(null);
+    setReplayAgents({});
+  };
+
+  const shownAgents =
+    replayTick == null
+      ? agentsRaw
+      : agentsRaw.map((a) => (replayAgents[a.id] ? { ...a, ...replayAgents[a.id] } : a));
+
+  /* ========================= PAUSE / RESUME ========================= */
+  const toggleRunning = async () => {
+    try {
+      const res = await axios.post(
+        `http://localhost:5000/api/sim/${running ? "stop" : "start"}`
+      );
+      setRunning(res.data.running);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  /* ========================= LIVE STREAM ========================= */
+  // The server owns the tick loop; every tab just listens to it.
   useEffect(() => {
     fetchWorld();
     fetchStatsLatest();
+    fetchReplayRange();
 
-    tickRef.current = setInterval(() => {
-      if (running) doTick();
-    }, 1800);
+    const source = new EventSource("http://localhost:5000/api/stream");
+    source.addEventListener("tick", (e) => applyUpdate(JSON.parse(e.data)));
+    source.onerror = (err) => console.error("Stream error:", err);
 
-    return () => clearInterval(tickRef.current);
-  }, [running]);
+    return () => source.close();
+  }, []);
 
   /* ========================= SMOOTH MOVEMENT ========================= */
   useEffect(() => {
@@ -273,7 +377,7 @@ export default function App() {
       setPositions((prev) => {
         const next = { ...prev };
 
-        agentsRaw.forEach((a) => {
+        shownAgents.forEach((a) => {
           const tx = a.x * scale;
           const ty = a.y * scale;
           if (!next[a.id]) next[a.id] = { x: tx, y: ty };
@@ -300,21 +404,56 @@ export default function App() {
 
     raf = requestAnimationFrame(animate);
     return () => cancelAnimationFrame(raf);
-  }, [agentsRaw]);
+  }, [agentsRaw, replayTick, replayAgents]);
 
   /* ========================= RUN SERVER SIM ========================= */
+  // Resolves with the job's final info once its progress stream reports a finished state
+  const followJob = (jobId) =>
+    new Promise((resolve, reject) => {
+      const source = new EventSource(
+        `http://localhost:5000/api/jobs/${jobId}/progress`
+      );
+      source.addEventListener("progress", (e) => {
+        const job = JSON.parse(e.data);
+        setSimProgress(job.progress || 0);
+        if (["done", "failed", "cancelled"].includes(job.state)) {
+          source.close();
+          resolve(job);
+        }
+      });
+      source.onerror = (err) => {
+        source.close();
+        reject(err);
+      };
+    });
+
+  // A finished job's stats, one /result page at a time
+  const fetchJobStats = async (jobId) => {
+    const stats = [];
+    let since = null;
+    do {
+      const res = await axios.get(
+        `http://localhost:5000/api/jobs/${jobId}/result`,
+        { params: since == null ? {} : { since_tick: since } }
+      );
+      stats.push(...res.data.stats);
+      since = res.data.next_since_tick;
+    } while (since != null);
+    return stats;
+  };
+
   const handleRunSimJSON = async () => {
     setSimRunning(true);
+    setSimProgress(0);
     setSimModalOpen(true);
     setSimStats(null);
 
     try {
       const body = { ticks: Number(simTicksInput || 240), reset_seed: true };
-      const res = await axios.post(
-        "http://localhost:5000/api/run_sim_json",
-        body
-      );
-      setSimStats(res.data.stats || []);
+      const submitted = await axios.post("http://localhost:5000/api/jobs", body);
+      const job = await followJob(submitted.data.id);
+      if (job.state !== "done") throw new Error(job.error || `job ${job.state}`);
+      setSimStats(await fetchJobStats(job.id));
     } catch (err) {
       console.error(err);
       setSimStats([]);
@@ -327,13 +466,13 @@ export default function App() {
 
   /* ========================= HEATMAP ========================= */
   const poiCounts = {};
-  agentsRaw.forEach((a) => {
+  shownAgents.forEach((a) => {
     const g = a.goals?.[0];
     if (g) poiCounts[g] = (poiCounts[g] || 0) + 1;
   });
 
   const getOcc = (p) =>
-    statsLatest?.occupancy?.[p] || poiCounts[p] || 0;
+    (replayTick == null && statsLatest?.occupancy?.[p]) || poiCounts[p] || 0;
 
   const maxOcc = Math.max(
     1,
@@ -347,7 +486,7 @@ export default function App() {
         <h1>🌍 WorldSim - Virtual BIT Mesra</h1>
 
         <div className="controls">
-          <button onClick={() => setRunning(!running)}>
+          <button onClick={toggleRunning}>
             {running ? "Pause" : "Resume"}
           </button>
 
@@ -383,7 +522,27 @@ export default function App() {
               onChange={(e) => setSimTicksInput(e.target.value)}
             />
             <button onClick={handleRunSimJSON} disabled={simRunning}>
-              {simRunning ? "Running..." : "Run Simulation"}
+              {simRunning
+                ? `Running... ${Math.round(simProgress * 100)}%`
+                : "Run Simulation"}
+            </button>
+          </div>
+
+          <div className="replay-inline">
+            <input
+              type="range"
+              min={replayRange?.first_tick ?? 0}
+              max={replayRange?.last_tick ?? 0}
+              value={replayTick ?? replayRange?.last_tick ?? 0}
+              disabled={!replayRange}
+              onMouseDown={fetchReplayRange}
+              onChange={(e) => scrubTo(Number(e.target.value))}
+            />
+            <span className="muted">
+              {replayTick == null ? "live" : `tick ${replayTick}`}
+            </span>
+            <button onClick={backToLive} disabled={replayTick == null}>
+              Live
             </button>
           </div>
         </div>
@@ -397,6 +556,30 @@ export default function App() {
             style={{ width: mapSize, height: mapSize }}
             onClick={() => setSelectedAgent(null)}
           >
+            {/* WALLS */}
+            {mapRows && (
+              <svg
+                width={mapSize}
+                height={mapSize}
+                style={{ position: "absolute", left: 0, top: 0, pointerEvents: "none" }}
+              >
+                {mapRows.flatMap((row, y) =>
+                  [...row].map((ch, x) =>
+                    ch === "#" ? (
+                      <rect
+                        key={`${x},${y}`}
+                        x={x * scale - scale / 2}
+                        y={y * scale - scale / 2}
+                        width={scale}
+                        height={scale}
+                        fill="#555"
+                      />
+                    ) : null
+                  )
+                )}
+              </svg>
+            )}
+
             {/* HEAT CIRCLES */}
             {Object.entries(pois).map(([name, coord]) => {
               const [x, y] = coord;
@@ -447,7 +630,7 @@ export default function App() {
             })}
 
             {/* AGENTS */}
-            {agentsRaw.map((a) => {
+            {shownAgents.map((a) => {
               const pos =
                 positions[a.id] || {
                   x: a.x * scale,